@@ -4,6 +4,7 @@ Defines the callable functions that the Gemini AI can use to control the system.
 """
 import uuid
 import asyncio
+from dataclasses import replace
 from typing import List, Dict, Any, Optional
 
 from app.api.routes import get_current_config, update_config, ConfigUpdate, _current_config
@@ -73,7 +74,7 @@ def set_fusion_strategy(strategy: str):
     try:
         strat_enum = FusionStrategy(strategy)
         pm = get_pipeline_manager()
-        pm.fusion_engine.config.strategy = strat_enum
+        pm.update_fusion_config(replace(pm.get_fusion_config(), strategy=strat_enum))
         return {"status": "updated", "strategy": strategy}
     except ValueError:
         return {"error": f"Estrategia inválida. Opciones: {[e.value for e in FusionStrategy]}"}
@@ -11,7 +11,6 @@ from app.detection import (
     BackendType,
     FusionStrategy,
     FusionConfig,
-    PRESETS,
 )
 
 
@@ -59,7 +58,8 @@ async def list_presets() -> list[dict[str, Any]]:
 @router.get("/presets/{preset_id}")
 async def get_preset(preset_id: str) -> dict[str, Any]:
     """Get details of a specific preset"""
-    preset = PRESETS.get(preset_id)
+    manager = get_pipeline_manager()
+    preset = manager.get_preset(preset_id)
     if not preset:
         raise HTTPException(status_code=404, detail=f"Preset '{preset_id}' not found")
     return preset.to_dict()
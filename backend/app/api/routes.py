@@ -48,7 +48,13 @@ class ConfigUpdate(BaseModel):
     show_confidence: bool | None = None
     show_labels: bool | None = None
     box_color: str | None = None
+    render_on_server: bool | None = None
     max_fps: int | None = None
+    imgsz: int | None = None
+    use_tensorrt: bool | None = None
+    gpu_preprocess: bool | None = None
+    torch_compile: bool | None = None
+    warmup_iters: int | None = None
 
 
 class ZoneCreate(BaseModel):
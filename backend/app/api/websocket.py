@@ -6,18 +6,80 @@ import asyncio
 import base64
 import cv2
 import numpy as np
+from dataclasses import dataclass
 from fastapi import WebSocket, WebSocketDisconnect
+from functools import lru_cache
 from typing import Any
 import time
 
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    _HAS_ORJSON = False
+
 from app.detection import YOLODetector, ObjectTracker, TrackingResult, SKELETON_CONNECTIONS
-from app.video import create_video_source, VideoSource
-from app.config import VideoSourceType
+from app.detection.yolo_detector import TEXT_SIZE_CACHE_SIZE, take_warm_detector
+from app.video import create_video_source, encode_jpeg, VideoSource
+from app.config import DetectionConfig, VideoSourceType
 from app.zones import ZoneManager, Zone, ZoneType, ZoneEvent
 from app.alerts import AlertNotifier, AlertConfig, Alert
 from app.api.routes import get_current_config, get_zone_manager, get_alert_notifier, get_mobile_frame
 
 
+# Frames en cola entre etapas del pipeline; con colas llenas se descarta el más viejo
+STAGE_QUEUE_SIZE = 2
+
+
+@lru_cache(maxsize=TEXT_SIZE_CACHE_SIZE)
+def _label_size(label: str, font_scale: float, thickness: int) -> tuple[int, int]:
+    """(ancho, alto) de un label para una fuente dada"""
+    size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+    return size
+
+
+@dataclass(slots=True, frozen=True)
+class DrawStyle:
+    """
+    Ajustes de dibujo congelados en el event loop al encolar un frame.
+    El hilo que dibuja solo lee esta copia, así un update_config a mitad
+    de frame no mezcla ajustes viejos y nuevos.
+    """
+    color_bgr: tuple[int, int, int]
+    font_scale: float
+    thickness: int
+    show_labels: bool
+    show_confidence: bool
+    pose_enabled: bool
+    render_on_server: bool
+    
+    @classmethod
+    def capture(cls, detector: YOLODetector, config: DetectionConfig) -> "DrawStyle":
+        return cls(
+            color_bgr=detector.color_bgr,
+            font_scale=detector.font_scale,
+            thickness=detector.thickness,
+            show_labels=config.show_labels,
+            show_confidence=config.show_confidence,
+            pose_enabled=config.pose_enabled,
+            render_on_server=config.render_on_server,
+        )
+    
+    def text_size(self, label: str) -> tuple[int, int]:
+        return _label_size(label, self.font_scale, self.thickness)
+
+
+def _put_latest(queue: asyncio.Queue, item: Any) -> None:
+    """Encola sin bloquear, descartando el elemento más viejo si la cola está llena"""
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(item)
+
+
 class DetectionStreamer:
     """
     Maneja el streaming de detecciones vía WebSocket.
@@ -34,6 +96,7 @@ class DetectionStreamer:
         self.running = False
         self._last_frame_time: float = 0.0
         self._sent_waiting_notice = False
+        self._frames_captured = 0
         
     async def initialize(self) -> bool:
         """Inicializa detector, tracker, zonas y fuente de video"""
@@ -45,8 +108,7 @@ class DetectionStreamer:
         
         try:
             # Crear detector
-            self.detector = YOLODetector(config)
-            self.detector.load_model()
+            self.detector = take_warm_detector(config)
             
             await self.send_status("Modelo cargado, iniciando tracker...", level="info")
             
@@ -63,9 +125,12 @@ class DetectionStreamer:
                 if not self.video_source.start():
                     # No fallar, puede usar frames del móvil
                     print("⚠️ Video source no disponible, esperando frames del móvil...")
+                    self.video_source.stop()  # Soltar la referencia a la fuente compartida
                     self.video_source = None
             except Exception as e:
                 print(f"⚠️ No se pudo crear video source: {e}")
+                if self.video_source:
+                    self.video_source.stop()
                 self.video_source = None
             
             return True
@@ -75,8 +140,13 @@ class DetectionStreamer:
             return False
     
     async def send_message(self, data: dict[str, Any]) -> None:
-        """Envía mensaje JSON por WebSocket"""
-        await self.websocket.send_json(data)
+        """Envía mensaje JSON por WebSocket (serializado con orjson si está instalado)"""
+        if _HAS_ORJSON:
+            # Frame de texto, igual que send_json, para que el cliente siga usando JSON.parse
+            payload = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+            await self.websocket.send_text(payload.decode())
+        else:
+            await self.websocket.send_json(data)
 
     async def send_status(self, message: str, level: str = "info") -> None:
         """Envía mensaje de estado (info/warning) al cliente"""
@@ -155,17 +225,22 @@ class DetectionStreamer:
         self, 
         frame: np.ndarray, 
         result: TrackingResult,
-        zone_events: list[ZoneEvent]
+        zone_events: list[ZoneEvent],
+        inplace: bool = False,
+        style: DrawStyle | None = None,
     ) -> np.ndarray:
-        """Dibuja frame con bounding boxes, tracking IDs y zonas"""
-        output = frame.copy()
+        """
+        Dibuja frame con bounding boxes, tracking IDs y zonas (in-place si inplace=True).
+        Sin style usa los ajustes actuales; desde un hilo hay que pasar la copia del loop.
+        """
+        output = frame if inplace else frame.copy()
         h, w = output.shape[:2]
         
-        config = get_current_config()
+        if style is None:
+            style = DrawStyle.capture(self.detector, get_current_config())
         
-        # Parsear color del config
-        color_hex = config.box_color.lstrip('#')
-        color_bgr = tuple(int(color_hex[i:i+2], 16) for i in (4, 2, 0))
+        # Color, escala y grosor ya parseados por el detector al cambiar el config
+        color_bgr = style.color_bgr
         
         # NOTE: Zonas ahora se dibujan solo en el frontend para evitar:
         # 1. Duplicación (backend + frontend dibujaban ambos)
@@ -191,8 +266,8 @@ class DetectionStreamer:
         #         )
         
         # Dibujar objetos trackeados
-        font_scale = config.font_size / 32
-        thickness = max(1, config.font_size // 8)
+        font_scale = style.font_scale
+        thickness = style.thickness
         
         # Determinar objetos en zonas peligrosas
         danger_ids = {
@@ -219,15 +294,13 @@ class DetectionStreamer:
             cv2.rectangle(output, (x1, y1), (x2, y2), box_color, thickness + 1)
             
             # Preparar label con ID
-            if config.show_labels:
+            if style.show_labels:
                 label = f"#{obj.tracker_id} {obj.class_name_es}"
-                if config.show_confidence:
+                if style.show_confidence:
                     label += f" {obj.confidence:.0%}"
                 
                 # Background del label
-                (label_w, label_h), _ = cv2.getTextSize(
-                    label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness
-                )
+                label_w, label_h = style.text_size(label)
                 cv2.rectangle(
                     output, (x1, y1 - label_h - 10), (x1 + label_w + 5, y1),
                     box_color, -1
@@ -243,7 +316,7 @@ class DetectionStreamer:
             cv2.circle(output, obj.bottom_center, 4, (0, 255, 255), -1)
             
             # Dibujar esqueleto si hay keypoints (pose estimation)
-            if config.pose_enabled and hasattr(obj, 'keypoints') and obj.keypoints:
+            if style.pose_enabled and hasattr(obj, 'keypoints') and obj.keypoints:
                 # Crear diccionario de keypoints por índice para acceso rápido
                 kp_dict = {}
                 for kp in obj.keypoints:
@@ -275,13 +348,16 @@ class DetectionStreamer:
         return output
     
     async def run_detection_loop(self, include_frames: bool = True) -> None:
-        """Loop principal de detección con tracking y zonas"""
+        """
+        Loop principal de detección con tracking y zonas.
+
+        Corre en tres etapas concurrentes (captura, inferencia, dibujo+envío)
+        unidas por colas pequeñas: mientras el modelo procesa el frame N se
+        decodifica el N+1 y se codifica el N-1, así el FPS queda limitado por
+        la etapa más lenta y no por la suma de todas.
+        """
         self.running = True
         config = get_current_config()
-        loop_counter = 0
-        
-        frame_interval = 1.0 / config.max_fps
-        last_frame_time = 0.0
         self._last_frame_time = time.time()
         
         await self.send_message({
@@ -294,16 +370,51 @@ class DetectionStreamer:
             "zones": [z.to_dict() for z in self.zone_manager.get_zones()] if self.zone_manager else [],
         })
         
+        if not self.detector or not self.tracker:
+            print("❌ Detector o tracker no inicializados, saliendo del loop")
+            self.running = False
+            return
+        
+        frames: asyncio.Queue = asyncio.Queue(maxsize=STAGE_QUEUE_SIZE)
+        results: asyncio.Queue = asyncio.Queue(maxsize=STAGE_QUEUE_SIZE)
+        stages = [
+            asyncio.create_task(self._capture_stage(frames, config)),
+            asyncio.create_task(self._infer_stage(frames, results, config)),
+            asyncio.create_task(self._send_stage(results, include_frames)),
+        ]
+        
+        try:
+            done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()  # Re-lanza el error de la etapa que falló
+                
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            print(f"❌ CRASH en loop de detección: {str(e)}")
+            await self.send_error(f"Error en loop de detección: {str(e)}")
+        finally:
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            print(f"ℹ️ Loop de detección terminado tras {self._frames_captured} frames capturados")
+            self.running = False
+    
+    async def _capture_stage(self, frames: asyncio.Queue, config) -> None:
+        """Etapa 1: lee y decodifica frames (móvil o video source) a ritmo max_fps"""
+        frame_interval = 1.0 / config.max_fps
+        last_frame_time = 0.0
+        self._frames_captured = 0
+        
         try:
             while self.running:
                 # Control de FPS
-                current_time = asyncio.get_event_loop().time()
+                current_time = asyncio.get_running_loop().time()
                 if current_time - last_frame_time < frame_interval:
                     await asyncio.sleep(0.001)
                     continue
                 
                 last_frame_time = current_time
-                loop_counter += 1
                 
                 # Actualizar config si cambió
                 new_config = get_current_config()
@@ -319,8 +430,6 @@ class DetectionStreamer:
                         print(f"🔄 Cambio de configuración de video detectado: {config.video_source} -> {new_config.video_source}")
                     
                     config = new_config
-                    if self.detector:
-                        self.detector.update_config(config)
                     frame_interval = 1.0 / config.max_fps
                     print(f"⚙️ Config en uso: source={config.video_source} url='{config.ip_camera_url}' webcam_index={config.webcam_index}")
                     
@@ -336,7 +445,8 @@ class DetectionStreamer:
                 mobile_frame_bytes = get_mobile_frame()
                 if mobile_frame_bytes:
                     nparr = np.frombuffer(mobile_frame_bytes, np.uint8)
-                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                    frame = await asyncio.to_thread(cv2.imdecode, nparr, cv2.IMREAD_COLOR)
+                    owned = True
                     self._last_frame_time = time.time()
                 
                 # 2. Si no hay frame móvil, intentar video source (IP Cam / Webcam)
@@ -352,17 +462,22 @@ class DetectionStreamer:
                                 print(f"🎥 Iniciando fuente {config.video_source}...")
                                 if not self.video_source.start():
                                     print("⚠️ No se pudo iniciar fuente de video")
+                                    self.video_source.stop()
                                     self.video_source = None
                         except Exception as e:
                             print(f"❌ Error al crear video source: {e}")
+                            if self.video_source:
+                                self.video_source.stop()
                             self.video_source = None
 
                     # Leer del video source si existe
                     if self.video_source:
-                        ret, frame = self.video_source.read()
+                        # read() puede esperar al próximo frame: fuera del event loop
+                        ret, frame = await asyncio.to_thread(self.video_source.read)
                         if not ret:
                             frame = None
                         else:
+                            owned = not self.video_source.reuses_frames
                             self._last_frame_time = time.time()
                 
                 # Si fallaron ambos, esperar y continuar
@@ -379,15 +494,32 @@ class DetectionStreamer:
                     self._sent_waiting_notice = False
                     print("✅ Frames recibidos, saliendo de estado de espera")
                 
-                if not self.detector or not self.tracker:
-                    print("❌ Detector o tracker no inicializados, saliendo del loop")
+                self._frames_captured += 1
+                _put_latest(frames, (frame, config, owned))
+                
+                # Yield para que avancen las otras etapas
+                await asyncio.sleep(0)
+        finally:
+            _put_latest(frames, None)
+    
+    async def _infer_stage(self, frames: asyncio.Queue, results: asyncio.Queue, config) -> None:
+        """Etapa 2: detección en un hilo, luego tracking, zonas y alertas"""
+        style = DrawStyle.capture(self.detector, config)
+        try:
+            while True:
+                item = await frames.get()
+                if item is None:
                     break
+                frame, frame_config, owned = item
+                
+                if frame_config != config:
+                    config = frame_config
+                    self.detector.update_config(config)
+                    style = DrawStyle.capture(self.detector, config)
                 
                 # Detectar (usar pose o detección normal según config)
-                if config.pose_enabled:
-                    detection_result = self.detector.detect_pose(frame)
-                else:
-                    detection_result = self.detector.detect(frame)
+                detect = self.detector.detect_pose if config.pose_enabled else self.detector.detect
+                detection_result = await asyncio.to_thread(detect, frame)
                 
                 # Tracking
                 tracking_result = self.tracker.update(detection_result)
@@ -396,8 +528,18 @@ class DetectionStreamer:
                 zone_events: list[ZoneEvent] = []
                 if self.zone_manager and tracking_result.objects:
                     h, w = frame.shape[:2]
-                    zone_events = self.zone_manager.check_objects(
-                        [o.to_dict() for o in tracking_result.objects],
+                    objects = tracking_result.objects
+                    if tracking_result.bbox_array is not None and tracking_result.center_array is not None:
+                        # Punto inferior central directo de las columnas del tracker
+                        bottom_x = tracking_result.center_array[:, 0]
+                        bottom_y = tracking_result.bbox_array[:, 3]
+                    else:
+                        bottom_x = np.array([o.bottom_center[0] for o in objects])
+                        bottom_y = np.array([o.bottom_center[1] for o in objects])
+                    zone_events = self.zone_manager.check_objects_numpy(
+                        [o.tracker_id for o in objects],
+                        bottom_x, bottom_y,
+                        [o.class_name_es for o in objects],
                         w, h,
                         time.time()
                     )
@@ -410,26 +552,43 @@ class DetectionStreamer:
                     if alerts:
                         asyncio.create_task(self.alert_notifier.send_alerts(alerts))
                 
-                # Enviar resultado
-                if include_frames:
-                    annotated = self.draw_frame_with_zones(frame, tracking_result, zone_events)
-                    _, buffer = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, 75])
-                    frame_b64 = base64.b64encode(buffer).decode('utf-8')
-                    await self.send_tracking_result(tracking_result, zone_events, alerts, frame_b64)
-                else:
-                    await self.send_tracking_result(tracking_result, zone_events, alerts)
-                
-                # Yield para manejar otros eventos
-                await asyncio.sleep(0)
-                
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            print(f"❌ CRASH en loop de detección: {str(e)}")
-            await self.send_error(f"Error en loop de detección: {str(e)}")
+                _put_latest(results, (frame, owned, style, tracking_result, zone_events, alerts))
         finally:
-            print(f"ℹ️ Loop de detección terminado tras {loop_counter} iteraciones")
-            self.running = False
+            _put_latest(results, None)
+    
+    async def _send_stage(self, results: asyncio.Queue, include_frames: bool) -> None:
+        """Etapa 3: dibuja y codifica el frame en un hilo y envía el resultado"""
+        while True:
+            item = await results.get()
+            if item is None:
+                break
+            frame, owned, style, tracking_result, zone_events, alerts = item
+            
+            if include_frames:
+                frame_b64 = await asyncio.to_thread(
+                    self._encode_frame, frame, tracking_result, zone_events, owned, style,
+                )
+                await self.send_tracking_result(tracking_result, zone_events, alerts, frame_b64)
+            else:
+                await self.send_tracking_result(tracking_result, zone_events, alerts)
+    
+    def _encode_frame(
+        self,
+        frame: np.ndarray,
+        result: TrackingResult,
+        zone_events: list[ZoneEvent],
+        owned: bool,
+        style: DrawStyle,
+    ) -> str:
+        """
+        Codifica el frame como JPEG en base64, dibujando antes las detecciones
+        si style.render_on_server. Sin anotar, el cliente dibuja las cajas a
+        partir del JSON y el servidor se ahorra el pase de dibujo.
+        Si el frame es exclusivo de este stream (owned) se dibuja sin copiarlo.
+        """
+        if style.render_on_server:
+            frame = self.draw_frame_with_zones(frame, result, zone_events, inplace=owned, style=style)
+        return base64.b64encode(encode_jpeg(frame)).decode('ascii')
     
     def stop(self) -> None:
         """Detiene el stream"""
@@ -3,11 +3,16 @@ Configuración del sistema de detección de objetos.
 Valores por defecto y esquemas de configuración.
 """
 import os
+from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import Literal
 from enum import Enum
 
 
+# Motores TensorRT y modelos ONNX exportados (YOLO y backends de pose)
+ENGINE_DIR = Path(__file__).parent.parent / "data" / "engines"
+
+
 class ModelSize(str, Enum):
     NANO = "yolo11n.pt"
     SMALL = "yolo11s.pt"
@@ -94,10 +99,19 @@ class DetectionConfig(BaseModel):
     show_labels: bool = True
     box_color: str = Field(default="#00FF00", pattern=r"^#[0-9A-Fa-f]{6}$")
     font_size: int = Field(default=16, ge=8, le=32)
+    render_on_server: bool = Field(
+        default=True,
+        description="Dibujar detecciones en el servidor; si es False el cliente las dibuja sobre el frame crudo",
+    )
     
     # Performance
     max_fps: int = Field(default=30, ge=1, le=60)
     frame_skip: int = Field(default=0, ge=0, le=10, description="Frames a saltar entre inferencias")
+    imgsz: int = Field(default=640, ge=32, le=1920, description="Tamaño de entrada del modelo YOLO")
+    use_tensorrt: bool = Field(default=False, description="Exportar y usar motores TensorRT FP16 (solo GPU NVIDIA)")
+    gpu_preprocess: bool = Field(default=False, description="Subir frames con memoria pinned y preprocesarlos en la GPU")
+    torch_compile: bool = Field(default=False, description="Compilar el grafo PyTorch con torch.compile (solo GPU NVIDIA)")
+    warmup_iters: int = Field(default=3, ge=0, le=10, description="Inferencias de calentamiento al cargar un modelo")
 
 
 # Mapeo de IDs COCO a nombres en español
@@ -219,10 +233,23 @@ def _env_int(name: str, default: int) -> int:
         return default
 
 
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name, "").lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes")
+
+
 # Configuración por defecto global con soporte de variables de entorno
 DEFAULT_CONFIG = DetectionConfig(
     video_source=_env_video_source(),
     webcam_index=_env_int("VM_WEBCAM_INDEX", 0),
     ip_camera_url=os.getenv("VM_IP_CAMERA_URL", ""),
     model_size=_env_model_size(),
+    imgsz=_env_int("VM_IMGSZ", 640),
+    use_tensorrt=_env_bool("VM_USE_TENSORRT", False),
+    gpu_preprocess=_env_bool("VM_GPU_PREPROCESS", False),
+    torch_compile=_env_bool("VM_TORCH_COMPILE", False),
+    warmup_iters=_env_int("VM_WARMUP_ITERS", 3),
+    render_on_server=_env_bool("VM_RENDER_ON_SERVER", True),
 )
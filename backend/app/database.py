@@ -38,10 +38,18 @@ class Base(DeclarativeBase):
     pass
 
 
+def _create_indexes(conn):
+    """Create indexes added to existing tables (create_all skips existing tables)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
 async def init_db():
     """Initialize database and create all tables."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_indexes)
     print("✅ Base de datos inicializada")
 
 
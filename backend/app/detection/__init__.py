@@ -8,6 +8,7 @@ from app.detection.base_detector import (
     BackendRole,
     BackendCapabilities,
     Detection,
+    DetectionBatch,
     DetectionResult,
     FusedDetectionResult,
     Keypoint,
@@ -31,7 +32,8 @@ from app.detection.pipeline_manager import (
     PipelineManager,
     PipelinePreset,
     BackendInstance,
-    PRESETS,
+    PRESET_IDS,
+    get_preset,
     get_pipeline_manager,
 )
 
@@ -46,6 +48,7 @@ __all__ = [
     "BackendRole",
     "BackendCapabilities",
     "Detection",
+    "DetectionBatch",
     "DetectionResult",
     "FusedDetectionResult",
     "Keypoint",
@@ -61,7 +64,8 @@ __all__ = [
     "PipelineManager",
     "PipelinePreset",
     "BackendInstance",
-    "PRESETS",
+    "PRESET_IDS",
+    "get_preset",
     "get_pipeline_manager",
     # Tracking
     "ObjectTracker",
@@ -2,10 +2,13 @@
 Base Detector Interface for Argos.
 Defines abstract base class that all detection backends must implement.
 """
+import asyncio
 from abc import ABC, abstractmethod
+from collections import Counter
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any
+from functools import cached_property
+from typing import Any, Sequence
 import numpy as np
 import time
 
@@ -46,6 +49,16 @@ class BackendCapabilities:
     requires_gpu: bool = False
     
     def to_dict(self) -> dict[str, Any]:
+        # Capabilities are not mutated after construction
+        return self._cached_dict
+    
+    @cached_property
+    def target_values(self) -> frozenset[str]:
+        """Supported target names, for set unions across backends"""
+        return frozenset(t.value for t in self.supported_targets)
+    
+    @cached_property
+    def _cached_dict(self) -> dict[str, Any]:
         return {
             "backend_type": self.backend_type.value,
             "supports_pose": self.supports_pose,
@@ -58,7 +71,7 @@ class BackendCapabilities:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Keypoint:
     """Represents a single keypoint in pose estimation"""
     x: int
@@ -75,17 +88,88 @@ class Keypoint:
         }
 
 
-@dataclass
+@dataclass(slots=True, init=False)
 class Detection:
-    """Represents a single detection from any backend"""
+    """
+    Represents a single detection from any backend.
+    
+    Backends that produce NumPy keypoints pass `keypoints_array` and leave
+    `keypoints` unset; the Keypoint objects are only built, and stored in
+    `_keypoints`, the first time the `keypoints` property is read.
+    """
     class_id: int
     class_name: str
     class_name_es: str
     confidence: float
     bbox: tuple[int, int, int, int]  # x1, y1, x2, y2
-    keypoints: list[Keypoint] = field(default_factory=list)
-    tracker_id: int | None = None  # For multi-object tracking
-    backend_source: BackendType | None = None  # Which backend produced this
+    _keypoints: list[Keypoint] | None  # None: built lazily from keypoints_array
+    tracker_id: int | None  # For multi-object tracking
+    backend_source: BackendType | None  # Which backend produced this
+    keypoints_array: np.ndarray | None = field(repr=False, compare=False)  # (K, 3) x, y, conf
+    keypoint_names: tuple[str, ...] = field(repr=False, compare=False)
+    
+    def __init__(
+        self,
+        class_id: int,
+        class_name: str,
+        class_name_es: str,
+        confidence: float,
+        bbox: tuple[int, int, int, int],
+        keypoints: list[Keypoint] | None = None,
+        tracker_id: int | None = None,
+        backend_source: BackendType | None = None,
+        keypoints_array: np.ndarray | None = None,
+        keypoint_names: tuple[str, ...] = (),
+    ):
+        self.class_id = class_id
+        self.class_name = class_name
+        self.class_name_es = class_name_es
+        self.confidence = confidence
+        self.bbox = bbox
+        self._keypoints = keypoints
+        self.tracker_id = tracker_id
+        self.backend_source = backend_source
+        self.keypoints_array = keypoints_array
+        self.keypoint_names = keypoint_names
+    
+    @property
+    def keypoints(self) -> list[Keypoint]:
+        """Keypoint objects, built from keypoints_array on first access"""
+        if self._keypoints is None:
+            self._keypoints = self._keypoints_from_array()
+        return self._keypoints
+    
+    @keypoints.setter
+    def keypoints(self, value: list[Keypoint] | None) -> None:
+        self._keypoints = value
+    
+    @property
+    def num_keypoints(self) -> int:
+        """Keypoint count without building Keypoint objects"""
+        if self._keypoints is not None:
+            return len(self._keypoints)
+        return 0 if self.keypoints_array is None else len(self.keypoints_array)
+    
+    def translate(self, dx: int, dy: int) -> None:
+        """Shift bbox and keypoints in place, e.g. from crop to frame coordinates"""
+        x1, y1, x2, y2 = self.bbox
+        self.bbox = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+        if self.keypoints_array is not None:
+            self.keypoints_array[:, 0] += dx
+            self.keypoints_array[:, 1] += dy
+        if self._keypoints:
+            for kp in self._keypoints:
+                kp.x += dx
+                kp.y += dy
+    
+    def _keypoints_from_array(self) -> list[Keypoint]:
+        if self.keypoints_array is None:
+            return []
+        names = self.keypoint_names
+        return [
+            Keypoint(x=int(x), y=int(y), confidence=c, name=names[i] if i < len(names) else "")
+            for i, (x, y, c) in enumerate(self.keypoints_array.tolist())
+        ]
     
     def to_dict(self) -> dict[str, Any]:
         result = {
@@ -95,7 +179,7 @@ class Detection:
             "confidence": round(self.confidence, 3),
             "bbox": list(self.bbox),
         }
-        if self.keypoints:
+        if self.num_keypoints:
             result["keypoints"] = [kp.to_dict() for kp in self.keypoints]
         if self.tracker_id is not None:
             result["tracker_id"] = self.tracker_id
@@ -104,10 +188,117 @@ class Detection:
         return result
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
+class DetectionBatch:
+    """
+    Struct-of-arrays detections for one frame.
+    
+    Backends fill the columns straight from model output. It reads like a
+    list of Detection, but a Detection is only built for a row that is
+    indexed or iterated; serialization and tracking use the columns.
+    Compared by identity, since a field-wise == on NumPy columns raises.
+    """
+    xyxy: np.ndarray  # (N, 4) int32 x1, y1, x2, y2
+    confidence: np.ndarray  # (N,) float32
+    class_id: np.ndarray  # (N,) int32
+    names: dict[int, str]  # class_id -> model class name
+    names_es: dict[int, str] = field(default_factory=dict)  # class_id -> display name
+    backend_source: BackendType | None = None
+    _rows: list[Detection | None] = field(init=False, repr=False)
+    
+    def __post_init__(self) -> None:
+        self._rows = [None] * len(self.class_id)
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        det = self._rows[index]
+        if det is None:
+            class_id = int(self.class_id[index])
+            class_name, class_name_es = self._class_names(class_id)
+            x1, y1, x2, y2 = self.xyxy[index].tolist()
+            det = Detection(
+                class_id=class_id,
+                class_name=class_name,
+                class_name_es=class_name_es,
+                confidence=float(self.confidence[index]),
+                bbox=(x1, y1, x2, y2),
+                backend_source=self.backend_source,
+            )
+            self._rows[index] = det
+        return det
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def _class_names(self, class_id: int) -> tuple[str, str]:
+        class_name = self.names.get(class_id, f"class_{class_id}")
+        return class_name, self.names_es.get(class_id, class_name)
+    
+    def class_names(self, rows: Sequence[int]) -> tuple[list[str], list[str]]:
+        """(class_name, class_name_es) columns for the given rows"""
+        lookup = {c: self._class_names(c) for c in set(self.class_id.tolist())}
+        class_ids = self.class_id.tolist()
+        pairs = [lookup[class_ids[j]] for j in rows]
+        return [p[0] for p in pairs], [p[1] for p in pairs]
+    
+    def counts(self) -> dict[str, int]:
+        """Objects per display class name"""
+        counts: dict[str, int] = {}
+        ids, per_id = np.unique(self.class_id, return_counts=True)
+        for class_id, count in zip(ids.tolist(), per_id.tolist()):
+            key = self._class_names(class_id)[1]
+            counts[key] = counts.get(key, 0) + count
+        return counts
+    
+    def to_dicts(self) -> list[dict[str, Any]]:
+        """Serialize every row with bulk tolist() conversions"""
+        rows = self._rows
+        names, names_es = self.class_names(range(len(rows)))
+        # Round in float64 so float32 scores serialize like Detection.to_dict
+        confidences = np.round(self.confidence.astype(np.float64), 3).tolist()
+        source = self.backend_source.value if self.backend_source else None
+        output = []
+        for i, (bbox, conf, class_id) in enumerate(zip(
+            self.xyxy.tolist(), confidences, self.class_id.tolist()
+        )):
+            if rows[i] is not None:
+                # A materialized row may have been edited (tracker_id, translate)
+                output.append(rows[i].to_dict())
+                continue
+            row = {
+                "class_id": class_id,
+                "class_name": names[i],
+                "class_name_es": names_es[i],
+                "confidence": conf,
+                "bbox": bbox,
+            }
+            if source:
+                row["backend_source"] = source
+            output.append(row)
+        return output
+
+
+def _detections_to_dicts(detections) -> list[dict[str, Any]]:
+    if isinstance(detections, DetectionBatch):
+        return detections.to_dicts()
+    return [d.to_dict() for d in detections]
+
+
+def _detection_counts(detections) -> dict[str, int]:
+    if isinstance(detections, DetectionBatch):
+        return detections.counts()
+    return dict(Counter(det.class_name_es for det in detections))
+
+
+@dataclass(slots=True)
 class DetectionResult:
     """Result from a single backend's inference"""
-    detections: list[Detection]
+    detections: list[Detection] | DetectionBatch
     inference_time_ms: float
     frame_width: int
     frame_height: int
@@ -115,15 +306,9 @@ class DetectionResult:
     timestamp: float = field(default_factory=time.time)
     
     def to_dict(self) -> dict[str, Any]:
-        # Count objects by class
-        counts: dict[str, int] = {}
-        for det in self.detections:
-            key = det.class_name_es
-            counts[key] = counts.get(key, 0) + 1
-        
         return {
-            "detections": [d.to_dict() for d in self.detections],
-            "counts": counts,
+            "detections": _detections_to_dicts(self.detections),
+            "counts": _detection_counts(self.detections),
             "total_objects": len(self.detections),
             "inference_time_ms": round(self.inference_time_ms, 2),
             "frame_size": {"width": self.frame_width, "height": self.frame_height},
@@ -132,30 +317,25 @@ class DetectionResult:
         }
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FusedDetectionResult:
     """
     Result from multiple backends merged together.
     Contains enhanced detections with higher confidence and better keypoints.
     """
-    detections: list[Detection]
+    detections: list[Detection] | DetectionBatch
     inference_time_ms: float  # Total time for all backends
     frame_width: int
     frame_height: int
     backends_used: list[BackendType]
     fusion_strategy: str
-    individual_results: list[DetectionResult] = field(default_factory=list)
+    individual_results: tuple[DetectionResult, ...] = ()
     timestamp: float = field(default_factory=time.time)
     
     def to_dict(self) -> dict[str, Any]:
-        counts: dict[str, int] = {}
-        for det in self.detections:
-            key = det.class_name_es
-            counts[key] = counts.get(key, 0) + 1
-        
         return {
-            "detections": [d.to_dict() for d in self.detections],
-            "counts": counts,
+            "detections": _detections_to_dicts(self.detections),
+            "counts": _detection_counts(self.detections),
             "total_objects": len(self.detections),
             "inference_time_ms": round(self.inference_time_ms, 2),
             "frame_size": {"width": self.frame_width, "height": self.frame_height},
@@ -212,12 +392,19 @@ class BaseDetector(ABC):
     async def detect_async(self, frame: np.ndarray) -> DetectionResult:
         """
         Async version of detect for parallel execution.
-        Default implementation wraps sync detect.
+        Default implementation runs the blocking detect() on the default
+        thread pool so inference never stalls the event loop.
         Override for true async backends.
         """
-        import asyncio
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.detect, frame)
+        return await asyncio.to_thread(self.detect, frame)
+    
+    def detect_batch(self, frames: list[np.ndarray]) -> list[DetectionResult]:
+        """
+        Run detection on several frames.
+        Default implementation calls detect() once per frame.
+        Override in backends whose model accepts a batch in one call.
+        """
+        return [self.detect(frame) for frame in frames]
     
     def cleanup(self) -> None:
         """Release resources. Override if backend needs cleanup."""
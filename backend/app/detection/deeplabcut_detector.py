@@ -2,10 +2,25 @@
 DeepLabCut Detector for Argos Pro.
 Integrates DeepLabCut's SuperAnimal models for high-accuracy animal pose estimation.
 """
+import asyncio
+import logging
+import threading
+import cv2
 import numpy as np
 import time
-from typing import Any
+from pathlib import Path
+from typing import Any, Callable
 
+try:
+    import deeplabcut as _dlc
+    import pandas as _pd
+    _HAS_DLC = True
+except ImportError:
+    _dlc = None
+    _pd = None
+    _HAS_DLC = False
+
+from app.config import ENGINE_DIR
 from .base_detector import (
     BaseDetector,
     BackendCapabilities,
@@ -13,8 +28,17 @@ from .base_detector import (
     TargetType,
     Detection,
     DetectionResult,
-    Keypoint,
 )
+from .tensorrt_engine import (
+    PIPELINE_DEPTH,
+    PRECISIONS,
+    TensorRTEngine,
+    engine_tag,
+    export_onnx,
+    tensorrt_available,
+)
+
+logger = logging.getLogger(__name__)
 
 
 # SuperAnimal model configurations
@@ -39,6 +63,131 @@ SUPERANIMAL_MODELS = {
     },
 }
 
+# Frames per batched DLC call; larger batches stop paying off past 16
+DEFAULT_BATCH_SIZE = 8
+MAX_BATCH_SIZE = 16
+BATCH_TIMEOUT_S = 0.005
+
+# Model zoo inference runner settings
+DLC_DETECTOR = "fasterrcnn_resnet50_fpn_v2"
+MAX_INDIVIDUALS = 4
+
+# TensorRT pose network input (square, RGB, ImageNet-normalized)
+TRT_INPUT_SIZE = 256
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape(3, 1, 1)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(3, 1, 1)
+# (rgb / 255 - mean) / std folded into one multiply-subtract
+_NORM_SCALE = 1.0 / (255.0 * IMAGENET_STD)
+_NORM_OFFSET = IMAGENET_MEAN / IMAGENET_STD
+
+# INT8 calibration: representative frames (jpg/png) for each model live in
+# data/engines/calibration/<model_name>/
+CALIBRATION_DIR = ENGINE_DIR / "calibration"
+CALIBRATION_FRAMES = 100
+CALIBRATION_BATCH = 8
+
+# Timed engine runs used to report the TensorRT path's real max_fps
+TRT_BENCHMARK_ITERS = 5
+DEFAULT_MAX_FPS = 15  # PyTorch runner: detector + top-down pose per frame
+
+# Upper bound on bodyparts per individual (SuperAnimal-Quadruped has 39)
+MAX_KEYPOINTS = 64
+
+# Pose post-processing thresholds
+MIN_KEYPOINT_LIKELIHOOD = 0.3
+MIN_VALID_KEYPOINTS = 5
+BBOX_PADDING = 20
+
+
+class FrameBatcher:
+    """
+    Groups frames from concurrent detect_async() calls into one batched call.
+    
+    When no batch is running, pending frames are flushed on the next loop
+    iteration, so a lone caller never waits while callers submitting in
+    the same tick still share a batch. While a batch runs, frames collect
+    until it finishes, the batch reaches `batch_size` frames, or
+    `timeout_s` has passed since the first one arrived. Each caller gets a
+    future resolved with the DetectionResult for its own frame.
+    
+    predict() is the synchronous entry point; it shares the in-flight limit
+    with queued batches so direct calls cannot overrun the model.
+    """
+    
+    def __init__(
+        self,
+        predict_batch: Callable[[list[np.ndarray]], list[DetectionResult]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        timeout_s: float = BATCH_TIMEOUT_S,
+    ):
+        self._predict_batch = predict_batch
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.timeout_s = timeout_s
+        self._pending: list[tuple[np.ndarray, asyncio.Future]] = []
+        self._flush_handle: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.set_max_inflight(1)
+    
+    def set_max_inflight(self, max_inflight: int) -> None:
+        """How many batches may be inside predict_batch at once"""
+        self._inflight = threading.BoundedSemaphore(max(1, max_inflight))
+    
+    def submit(self, frame: np.ndarray) -> asyncio.Future:
+        """Queue a frame and return a future for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((frame, future))
+        
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            if self._tasks:
+                # A batch is running: let frames accumulate behind it
+                self._flush_handle = loop.call_later(self.timeout_s, self._flush)
+            else:
+                self._flush_handle = loop.call_soon(self._flush)
+        
+        return future
+    
+    def _flush(self) -> None:
+        """Hand the pending frames to a background batch task"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: list[tuple[np.ndarray, asyncio.Future]]) -> None:
+        """Run one batch off the event loop and resolve its futures"""
+        frames = [frame for frame, _ in batch]
+        
+        try:
+            results = await asyncio.to_thread(self.predict, frames)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        
+        # Frames that queued behind this batch go next, without waiting out the timer
+        if self._pending:
+            self._flush()
+    
+    def predict(self, frames: list[np.ndarray]) -> list[DetectionResult]:
+        """Run predict_batch now, within the in-flight limit"""
+        with self._inflight:
+            return self._predict_batch(frames)
+
+
 # Quadruped keypoint names (39 keypoints from SuperAnimal)
 QUADRUPED_KEYPOINT_NAMES = [
     "nose", "left_eye", "right_eye", "left_earbase", "right_earbase",
@@ -63,32 +212,54 @@ class DeepLabCutDetector(BaseDetector):
     - High accuracy keypoint detection
     - Supports quadrupeds, birds, and rodents
     
+    The TensorRT path (precision 'fp16'/'int8') runs only the pose network
+    on the whole frame and argmax-decodes one pose, without the SuperAnimal
+    detector stage or locref refinement: it is single-animal and coarser
+    than the PyTorch runner, and get_capabilities() reports it as such.
+    
     Note: DeepLabCut is optional. Install with: pip install deeplabcut[tf]
     """
     
-    def __init__(self):
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, precision: str = "fp32"):
         self._model = None
+        self._runner = None  # In-memory model zoo runner for SuperAnimal models
+        self._trt_engine: TensorRTEngine | None = None
+        self._trt_fps: int | None = None  # Measured when the engine loads
+        self.precision = self._check_precision(precision)
+        self._kp_buf = np.empty((MAX_KEYPOINTS, 3), dtype=np.float32)
+        
+        # TensorRT preprocessing scratch, reused for every frame
+        self._resize_buf = np.empty((TRT_INPUT_SIZE, TRT_INPUT_SIZE, 3), dtype=np.uint8)
+        self._rgb_buf = np.empty((TRT_INPUT_SIZE, TRT_INPUT_SIZE, 3), dtype=np.uint8)
+        self._preprocess_lock = threading.Lock()  # Guards the scratch buffers
         self._model_name: str | None = None
-        self._dlc_available = self._check_dlc_available()
+        self._dlc_available = _HAS_DLC
+        self._batch_size = batch_size
+        self._batcher = FrameBatcher(self._detect_batch, batch_size=batch_size)
         
-    def _check_dlc_available(self) -> bool:
-        """Check if DeepLabCut is installed"""
+        if not _HAS_DLC:
+            print("⚠️ DeepLabCut not installed. Install with: pip install deeplabcut[tf]")
+    
+    @staticmethod
+    def _select_device() -> str:
+        """Pick the first CUDA device when available"""
         try:
-            import deeplabcut
-            return True
+            import torch
+            return "cuda:0" if torch.cuda.is_available() else "cpu"
         except ImportError:
-            print("⚠️ DeepLabCut not installed. Install with: pip install deeplabcut[tf]")
-            return False
+            return "cpu"
     
     def get_capabilities(self) -> BackendCapabilities:
         """Return DeepLabCut backend capabilities"""
+        trt_active = self._trt_engine is not None
         return BackendCapabilities(
             backend_type=BackendType.DEEPLABCUT,
             supports_pose=True,
             supports_tracking=True,
             supports_3d=False,
-            supports_multi_animal=True,
-            max_fps=15,  # DLC is slower but more accurate
+            # The TensorRT engine decodes a single whole-frame pose
+            supports_multi_animal=not trt_active,
+            max_fps=self._trt_fps if trt_active and self._trt_fps else DEFAULT_MAX_FPS,
             supported_targets=[
                 TargetType.QUADRUPED,
                 TargetType.BIRD,
@@ -101,46 +272,162 @@ class DeepLabCutDetector(BaseDetector):
         """Check if a model is currently loaded"""
         return self._model is not None
     
-    def load_model(self, model_name: str = "superanimal_quadruped", **kwargs) -> None:
+    @staticmethod
+    def _check_precision(precision: str) -> str:
+        if precision not in PRECISIONS:
+            raise ValueError(f"Invalid precision: {precision}. Valid: {', '.join(PRECISIONS)}")
+        return precision
+    
+    def load_model(
+        self,
+        model_name: str = "superanimal_quadruped",
+        precision: str | None = None,
+        **kwargs,
+    ) -> None:
         """
         Load a SuperAnimal model.
         
         Args:
             model_name: One of 'superanimal_quadruped', 'superanimal_bird', 
                        'superanimal_topviewmouse', or path to custom model
+            precision: 'fp32' (PyTorch), 'fp16' or 'int8' (TensorRT engine,
+                       single-animal); defaults to the detector's precision
         """
         if not self._dlc_available:
             raise RuntimeError("DeepLabCut not installed. Run: pip install deeplabcut[tf]")
         
-        if self._model_name == model_name and self._model is not None:
+        same_precision = precision is None or precision == self.precision
+        if self._model_name == model_name and self._model is not None and same_precision:
             return
         
+        if precision is not None:
+            self.precision = self._check_precision(precision)
+        
         print(f"🔄 Loading DeepLabCut model: {model_name}...")
         
         try:
-            import deeplabcut
-            
             # Load SuperAnimal model from DLC Model Zoo
             if model_name in SUPERANIMAL_MODELS:
-                # Use DLC's built-in SuperAnimal models
-                self._model = deeplabcut.create_superanimal_project(
-                    model_name,
-                    "/tmp/dlc_temp_project",
-                    videotype="",
-                    copy_videos=False,
+                from deeplabcut.modelzoo import build_inference_runner
+                
+                # Keep only the network + preprocessing in memory; no project on disk
+                self._runner = build_inference_runner(
+                    superanimal_name=model_name,
+                    detector=DLC_DETECTOR,
+                    device=self._select_device(),
+                    batch_size=MAX_BATCH_SIZE,
+                    max_individuals=MAX_INDIVIDUALS,
                 )
+                self._model = self._runner
                 self._model_name = model_name
+                self._batcher.batch_size = self._batch_size
+                
+                self._reset_trt_engine()
+                if self.precision != "fp32":
+                    self._load_trt_engine(model_name)
                 print(f"✅ Loaded SuperAnimal model: {SUPERANIMAL_MODELS[model_name]['name']}")
             else:
                 # Load custom model from path
+                self._runner = None
+                self._reset_trt_engine()
                 self._model = model_name  # Path to config.yaml
                 self._model_name = model_name
+                # Project models are analyzed image by image: nothing to batch
+                self._batcher.batch_size = 1
                 print(f"✅ Loaded custom DLC model: {model_name}")
                 
         except Exception as e:
             print(f"❌ Failed to load DeepLabCut model: {e}")
             raise
     
+    def _load_trt_engine(self, model_name: str) -> None:
+        """
+        Build (or reuse) a TensorRT engine at the configured precision.
+        INT8 falls back to FP16, and any failure keeps the PyTorch runner.
+        """
+        if not tensorrt_available():
+            print("⚠️ TensorRT not installed, using PyTorch DLC runner")
+            return
+        
+        onnx_path = ENGINE_DIR / f"{model_name}.onnx"
+        precisions = ["int8", "fp16"] if self.precision == "int8" else [self.precision]
+        
+        for precision in precisions:
+            try:
+                if not onnx_path.exists():
+                    export_onnx(
+                        self._runner.model.eval(),
+                        onnx_path,
+                        (1, 3, TRT_INPUT_SIZE, TRT_INPUT_SIZE),
+                    )
+                self._trt_engine = self._build_trt_engine(onnx_path, precision)
+                # Let the next batch preprocess/upload while this one computes
+                self._batcher.set_max_inflight(PIPELINE_DEPTH)
+                self._trt_fps = self._measure_trt_fps()
+                print(
+                    f"✅ TensorRT {precision.upper()} engine ready: {self._trt_engine.engine_path.name} "
+                    f"(~{self._trt_fps} FPS, single-animal)"
+                )
+                return
+            except Exception as e:
+                print(f"⚠️ TensorRT {precision.upper()} build failed: {e}")
+        
+        print("⚠️ Using PyTorch DLC runner")
+        self._reset_trt_engine()
+    
+    def _reset_trt_engine(self) -> None:
+        """Drop the engine; the PyTorch runner takes one batch at a time"""
+        self._trt_engine = None
+        self._trt_fps = None
+        self._batcher.set_max_inflight(1)
+    
+    def _measure_trt_fps(self) -> int:
+        """Time single-frame engine runs (after one warm-up) for max_fps"""
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        self._predict_trt([frame])
+        start = time.perf_counter()
+        for _ in range(TRT_BENCHMARK_ITERS):
+            self._predict_trt([frame])
+        per_frame = (time.perf_counter() - start) / TRT_BENCHMARK_ITERS
+        return max(1, int(1.0 / per_frame)) if per_frame > 0 else DEFAULT_MAX_FPS
+    
+    def _build_trt_engine(self, onnx_path: Path, precision: str = "fp16") -> TensorRTEngine:
+        """Build an engine for the pose network, cached next to the ONNX file"""
+        engine_path = onnx_path.with_name(f"{onnx_path.stem}.{precision}.{engine_tag()}.engine")
+        calibration_cache = onnx_path.with_suffix(".calibration.cache")
+        
+        calibration_batches = None
+        if precision == "int8" and not engine_path.exists() and not calibration_cache.exists():
+            calibration_batches = self._calibration_batches(onnx_path.stem)
+        
+        return TensorRTEngine.build(
+            onnx_path,
+            engine_path,
+            max_batch=MAX_BATCH_SIZE,
+            precision=precision,
+            calibration_batches=calibration_batches,
+            calibration_cache=calibration_cache,
+        )
+    
+    def _calibration_batches(self, model_name: str) -> list[np.ndarray]:
+        """Load and preprocess representative frames for INT8 calibration"""
+        paths = sorted(
+            p for p in (CALIBRATION_DIR / model_name).glob("*")
+            if p.suffix.lower() in (".jpg", ".jpeg", ".png")
+        )[:CALIBRATION_FRAMES]
+        
+        frames = [frame for frame in (cv2.imread(str(p)) for p in paths) if frame is not None]
+        n_batches = len(frames) // CALIBRATION_BATCH
+        
+        batches = np.empty(
+            (n_batches, CALIBRATION_BATCH, 3, TRT_INPUT_SIZE, TRT_INPUT_SIZE),
+            dtype=np.float32,
+        )
+        for i, frame in enumerate(frames[:n_batches * CALIBRATION_BATCH]):
+            self._preprocess_into(frame, batches[i // CALIBRATION_BATCH, i % CALIBRATION_BATCH])
+        
+        return list(batches)
+    
     def detect(self, frame: np.ndarray) -> DetectionResult:
         """
         Run pose estimation on a frame.
@@ -151,138 +438,276 @@ class DeepLabCutDetector(BaseDetector):
         Returns:
             DetectionResult with animal detections and keypoints
         """
+        return self.detect_batch([frame])[0]
+    
+    async def detect_async(self, frame: np.ndarray) -> DetectionResult:
+        """
+        Queue the frame on the batcher so concurrent callers share one
+        DLC call instead of paying the per-call setup cost each.
+        """
+        return await self._batcher.submit(frame)
+    
+    def detect_batch(self, frames: list[np.ndarray]) -> list[DetectionResult]:
+        """
+        Run pose estimation on several frames with a single model call.
+        
+        Args:
+            frames: BGR images as numpy arrays
+            
+        Returns:
+            One DetectionResult per input frame, in order
+        """
+        # Same in-flight limit as batches queued through detect_async()
+        return self._batcher.predict(frames)
+    
+    def _detect_batch(self, frames: list[np.ndarray]) -> list[DetectionResult]:
+        if not frames:
+            return []
+        
         if not self._dlc_available:
-            return self._empty_result(frame)
+            return [self._empty_result(frame) for frame in frames]
         
         if self._model is None:
             self.load_model()
         
         start_time = time.perf_counter()
         
-        try:
-            import deeplabcut
-            
-            # Run inference
-            # DLC returns DataFrame with columns: bodypart, x, y, likelihood
-            poses = deeplabcut.analyze_image(
+        # Errors propagate: FusionEngine reports failed backends centrally.
+        # DLC returns one pose table per frame: bodypart, x, y, likelihood
+        batch_poses = self._predict_batch(frames)
+        batch_detections = [
+            self._process_poses(poses, frame.shape)
+            for poses, frame in zip(batch_poses, frames)
+        ]
+        
+        # Batch cost is shared evenly across its frames
+        inference_time = (time.perf_counter() - start_time) * 1000 / len(frames)
+        
+        results = []
+        for frame, detections in zip(frames, batch_detections):
+            h, w = frame.shape[:2]
+            results.append(DetectionResult(
+                detections=detections,
+                inference_time_ms=inference_time,
+                frame_width=w,
+                frame_height=h,
+                backend_type=BackendType.DEEPLABCUT,
+            ))
+        return results
+    
+    def _predict_batch(self, frames: list[np.ndarray]) -> list[Any]:
+        """
+        Run the loaded model over a batch of frames.
+        SuperAnimal runners and TensorRT engines take the whole batch in
+        one call; custom project models only expose a per-image entry
+        point, so load_model() sets their batch size to 1.
+        """
+        if self._trt_engine is not None:
+            return self._predict_trt(frames)
+        
+        if self._runner is not None:
+            return self._runner(frames)
+        
+        return [
+            _dlc.analyze_image(
                 self._model,
                 frame,
                 shuffle=1,
                 trainingsetindex=0,
             )
+            for frame in frames
+        ]
+    
+    def _predict_trt(self, frames: list[np.ndarray]) -> list[dict[str, np.ndarray]]:
+        """
+        Run the TensorRT engine and decode heatmaps into runner-style dicts.
+        CPU preprocessing of this batch overlaps with the GPU work of the
+        batch before it; only the scratch buffers are serialized.
+        """
+        engine = self._trt_engine
+        slot = engine.acquire()
+        try:
+            # Preprocess straight into the slot's pinned input buffer
+            batch = slot.host_input[:len(frames)]
+            with self._preprocess_lock:
+                for i, frame in enumerate(frames):
+                    self._preprocess_into(frame, batch[i])
             
-            detections = self._process_poses(poses, frame.shape)
-            
-        except Exception as e:
-            print(f"⚠️ DLC inference error: {e}")
-            detections = []
+            engine.enqueue(slot, len(frames))
+            heatmaps = engine.wait(slot)
+            return self._decode_batch(heatmaps, frames)
+        finally:
+            engine.release(slot)
+    
+    def _decode_batch(
+        self,
+        heatmaps: np.ndarray,
+        frames: list[np.ndarray],
+    ) -> list[dict[str, np.ndarray]]:
+        """Decode (N, channels, h, w) heatmaps into one pose dict per frame"""
+        n_bodyparts = SUPERANIMAL_MODELS[self._model_name]["keypoints"]
         
-        inference_time = (time.perf_counter() - start_time) * 1000
+        return [
+            {"bodyparts": self._decode_heatmaps(maps[:n_bodyparts], frame.shape)}
+            for maps, frame in zip(heatmaps, frames)
+        ]
+    
+    def _preprocess_into(self, frame: np.ndarray, out: np.ndarray) -> None:
+        """
+        Resize, BGR->RGB, HWC->CHW and normalize one frame into `out`
+        (3, S, S) float32 without allocating per-frame arrays.
+        """
+        cv2.resize(frame, (TRT_INPUT_SIZE, TRT_INPUT_SIZE), dst=self._resize_buf)
+        cv2.cvtColor(self._resize_buf, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+        np.multiply(self._rgb_buf.transpose(2, 0, 1), _NORM_SCALE, out=out)
+        np.subtract(out, _NORM_OFFSET, out=out)
+    
+    @staticmethod
+    def _decode_heatmaps(heatmaps: np.ndarray, frame_shape: tuple) -> np.ndarray:
+        """
+        Argmax-decode (bodyparts, h, w) heatmaps into a (1, bodyparts, 3)
+        array of frame-space x, y, likelihood.
+        """
+        n_bodyparts, hm_h, hm_w = heatmaps.shape
+        flat = heatmaps.reshape(n_bodyparts, -1)
+        peaks = flat.argmax(axis=1)
+        ys, xs = np.divmod(peaks, hm_w)
         
-        h, w = frame.shape[:2]
-        return DetectionResult(
-            detections=detections,
-            inference_time_ms=inference_time,
-            frame_width=w,
-            frame_height=h,
-            backend_type=BackendType.DEEPLABCUT,
-        )
+        poses = np.empty((1, n_bodyparts, 3), dtype=np.float32)
+        poses[0, :, 0] = (xs + 0.5) * (frame_shape[1] / hm_w)
+        poses[0, :, 1] = (ys + 0.5) * (frame_shape[0] / hm_h)
+        poses[0, :, 2] = flat[np.arange(n_bodyparts), peaks]
+        return poses
     
     def _process_poses(
         self,
-        poses: Any,  # pd.DataFrame
+        poses: Any,  # pd.DataFrame or runner dict of arrays
         frame_shape: tuple,
     ) -> list[Detection]:
         """Process DLC pose output into Detection objects"""
+        if isinstance(poses, dict):
+            return self._process_pose_array(poses.get("bodyparts"), frame_shape)
+        
+        if poses is None or (isinstance(poses, _pd.DataFrame) and poses.empty):
+            return []
+        
         detections = []
         
-        try:
-            import pandas as pd
-            
-            if poses is None or (isinstance(poses, pd.DataFrame) and poses.empty):
-                return []
-            
-            # DLC output format varies by model; handle common cases
-            # For SuperAnimal models, output is typically:
-            # MultiIndex columns: (scorer, bodypart, x/y/likelihood)
-            
-            # Group keypoints by individual (for multi-animal)
-            individuals = poses.columns.get_level_values(0).unique() if hasattr(poses.columns, 'get_level_values') else ['individual0']
-            
-            for individual in individuals:
-                try:
-                    if hasattr(poses.columns, 'get_level_values'):
-                        individual_data = poses[individual]
-                    else:
-                        individual_data = poses
-                    
-                    keypoints = []
-                    valid_keypoints = 0
-                    min_x, min_y = float('inf'), float('inf')
-                    max_x, max_y = 0, 0
-                    
-                    # Extract keypoints
-                    bodyparts = individual_data.columns.get_level_values(0).unique() if hasattr(individual_data.columns, 'get_level_values') else []
-                    
-                    for bp_idx, bodypart in enumerate(bodyparts):
-                        try:
-                            if hasattr(individual_data[bodypart], 'x'):
-                                x = float(individual_data[bodypart]['x'].iloc[0])
-                                y = float(individual_data[bodypart]['y'].iloc[0])
-                                likelihood = float(individual_data[bodypart]['likelihood'].iloc[0])
-                            else:
-                                x = float(individual_data[bodypart].iloc[0, 0])
-                                y = float(individual_data[bodypart].iloc[0, 1])
-                                likelihood = float(individual_data[bodypart].iloc[0, 2])
-                            
-                            if likelihood > 0.3:
-                                keypoints.append(Keypoint(
-                                    x=int(x),
-                                    y=int(y),
-                                    confidence=likelihood,
-                                    name=str(bodypart),
-                                ))
-                                valid_keypoints += 1
-                                min_x = min(min_x, x)
-                                min_y = min(min_y, y)
-                                max_x = max(max_x, x)
-                                max_y = max(max_y, y)
-                        except Exception:
-                            continue
-                    
-                    # Only create detection if we have enough keypoints
-                    if valid_keypoints >= 5:
-                        # Create bounding box from keypoints
-                        padding = 20
-                        bbox = (
-                            max(0, int(min_x - padding)),
-                            max(0, int(min_y - padding)),
-                            min(frame_shape[1], int(max_x + padding)),
-                            min(frame_shape[0], int(max_y + padding)),
-                        )
-                        
-                        # Average confidence
-                        avg_conf = sum(kp.confidence for kp in keypoints) / len(keypoints)
-                        
-                        detections.append(Detection(
-                            class_id=16,  # COCO 'dog' as placeholder for quadruped
-                            class_name="animal",
-                            class_name_es="animal",
-                            confidence=avg_conf,
-                            bbox=bbox,
-                            keypoints=keypoints,
-                            backend_source=BackendType.DEEPLABCUT,
-                        ))
-                        
-                except Exception as e:
-                    print(f"⚠️ Error processing individual {individual}: {e}")
-                    continue
+        # DLC output format varies by model; handle common cases
+        # For SuperAnimal models, output is typically:
+        # MultiIndex columns: (scorer, bodypart, x/y/likelihood)
+        
+        # Group keypoints by individual (for multi-animal)
+        individuals = poses.columns.get_level_values(0).unique() if hasattr(poses.columns, 'get_level_values') else ['individual0']
+        
+        for individual in individuals:
+            try:
+                if hasattr(poses.columns, 'get_level_values'):
+                    individual_data = poses[individual]
+                else:
+                    individual_data = poses
+                
+                # Extract keypoints into the reusable (bodyparts, 3) scratch buffer
+                bodyparts = individual_data.columns.get_level_values(0).unique() if hasattr(individual_data.columns, 'get_level_values') else []
+                n_bodyparts = min(len(bodyparts), len(self._kp_buf))
+                points = self._kp_buf[:n_bodyparts]
+                points[:, 2] = 0.0  # Unreadable bodyparts count as not visible
+                
+                for bp_idx, bodypart in enumerate(bodyparts[:n_bodyparts]):
+                    try:
+                        if hasattr(individual_data[bodypart], 'x'):
+                            points[bp_idx, 0] = individual_data[bodypart]['x'].iloc[0]
+                            points[bp_idx, 1] = individual_data[bodypart]['y'].iloc[0]
+                            points[bp_idx, 2] = individual_data[bodypart]['likelihood'].iloc[0]
+                        else:
+                            points[bp_idx] = individual_data[bodypart].iloc[0, :3]
+                    except Exception:
+                        continue
+                
+                detection = self._pose_to_detection(
+                    points,
+                    [str(bp) for bp in bodyparts[:n_bodyparts]],
+                    frame_shape,
+                )
+                if detection is not None:
+                    detections.append(detection)
                     
-        except Exception as e:
-            print(f"⚠️ Error processing poses: {e}")
+            except Exception as e:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Skipping DLC individual %s", individual, exc_info=e)
+                continue
+        
+        return detections
+    
+    def _process_pose_array(
+        self,
+        bodyparts: np.ndarray | None,
+        frame_shape: tuple,
+    ) -> list[Detection]:
+        """
+        Process runner output of shape (individuals, bodyparts, 3) with
+        x, y, likelihood in the last axis.
+        """
+        if bodyparts is None or bodyparts.size == 0:
+            return []
+        
+        bodyparts = np.asarray(bodyparts, dtype=np.float32)
+        n_bodyparts = bodyparts.shape[1]
+        names = (
+            QUADRUPED_KEYPOINT_NAMES
+            if n_bodyparts == len(QUADRUPED_KEYPOINT_NAMES)
+            else [str(i) for i in range(n_bodyparts)]
+        )
+        
+        detections = []
+        for individual in bodyparts:
+            detection = self._pose_to_detection(individual, names, frame_shape)
+            if detection is not None:
+                detections.append(detection)
         
         return detections
     
+    def _pose_to_detection(
+        self,
+        points: np.ndarray,
+        names: list[str],
+        frame_shape: tuple,
+    ) -> Detection | None:
+        """
+        Build a Detection from one individual's (bodyparts, 3) pose.
+        Keypoints stay as a compact array; Keypoint objects are only
+        built if something reads Detection.keypoints.
+        """
+        mask = points[:, 2] > MIN_KEYPOINT_LIKELIHOOD
+        
+        # Only create detection if we have enough keypoints
+        if np.count_nonzero(mask) < MIN_VALID_KEYPOINTS:
+            return None
+        
+        visible = points[mask]  # Boolean indexing copies out of any shared buffer
+        min_x, min_y = visible[:, :2].min(axis=0)
+        max_x, max_y = visible[:, :2].max(axis=0)
+        
+        # Create bounding box from keypoints
+        h, w = frame_shape[:2]
+        bbox = (
+            max(0, int(min_x - BBOX_PADDING)),
+            max(0, int(min_y - BBOX_PADDING)),
+            min(w, int(max_x + BBOX_PADDING)),
+            min(h, int(max_y + BBOX_PADDING)),
+        )
+        
+        return Detection(
+            class_id=16,  # COCO 'dog' as placeholder for quadruped
+            class_name="animal",
+            class_name_es="animal",
+            confidence=float(visible[:, 2].mean()),  # Average confidence
+            bbox=bbox,
+            backend_source=BackendType.DEEPLABCUT,
+            keypoints_array=visible,
+            keypoint_names=tuple(names[i] for i in np.flatnonzero(mask)),
+        )
+    
     def _empty_result(self, frame: np.ndarray) -> DetectionResult:
         """Return empty result when DLC not available"""
         h, w = frame.shape[:2]
@@ -296,5 +721,7 @@ class DeepLabCutDetector(BaseDetector):
     
     def cleanup(self) -> None:
         """Release DeepLabCut resources"""
+        self._reset_trt_engine()
+        self._runner = None
         self._model = None
         self._model_name = None
@@ -3,10 +3,13 @@ Fusion Engine for Argos Pro.
 Runs multiple detection backends in parallel and intelligently merges results.
 """
 import asyncio
+import logging
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any
+from typing import Any, Callable
 import numpy as np
+import shapely
+from shapely import STRtree
 
 from .base_detector import (
     BaseDetector,
@@ -17,6 +20,71 @@ from .base_detector import (
     Keypoint,
 )
 
+logger = logging.getLogger(__name__)
+
+# COCO classes handed to the pose backend in cascade mode (cat .. giraffe)
+QUADRUPED_CLASS_IDS = frozenset(range(15, 24))
+
+# Above this many detections, fusion runs off the event loop thread
+FUSION_OFFLOAD_MIN_DETECTIONS = 32
+
+# Above this many detections, IoU is only computed for boxes an STRtree
+# reports as intersecting instead of for every pair
+SPATIAL_INDEX_MIN_DETECTIONS = 16
+
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+def _greedy_group_py(iou: np.ndarray, cls: np.ndarray, thr: float) -> np.ndarray:
+    """
+    Label detections greedily: each unlabeled detection opens a group and
+    claims every later unlabeled same-class detection with IoU >= thr.
+    """
+    n = iou.shape[0]
+    labels = np.full(n, -1, np.int32)
+    g = 0
+    for i in range(n):
+        if labels[i] != -1:
+            continue
+        members = (labels == -1) & (cls == cls[i]) & (iou[i] >= thr)
+        members[:i] = False
+        labels[members] = g
+        labels[i] = g
+        g += 1
+    return labels
+
+
+if _HAS_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _greedy_group(iou, cls, thr):
+        n = iou.shape[0]
+        labels = np.full(n, -1, np.int32)
+        g = 0
+        for i in range(n):
+            if labels[i] != -1:
+                continue
+            labels[i] = g
+            for j in range(i + 1, n):
+                if labels[j] == -1 and cls[i] == cls[j] and iou[i, j] >= thr:
+                    labels[j] = g
+            g += 1
+        return labels
+else:
+    _greedy_group = _greedy_group_py
+
+
+def _split_groups(labels: np.ndarray) -> list[np.ndarray]:
+    """Indices per group label, groups and members in ascending order"""
+    if not len(labels):
+        return []
+    order = np.argsort(labels, kind="stable")
+    bounds = np.cumsum(np.bincount(labels))[:-1]
+    return np.split(order, bounds)
+
 
 class FusionStrategy(str, Enum):
     """Strategies for combining results from multiple backends"""
@@ -48,6 +116,26 @@ class FusionConfig:
         }
 
 
+@dataclass
+class FlatDetections:
+    """
+    Struct-of-arrays view of every detection in a single fusion call.
+    Built once per frame so strategies work on contiguous arrays instead
+    of walking Detection objects; `detections` keeps the parallel list
+    used to build the final output.
+    """
+    detections: list[Detection]
+    boxes: np.ndarray  # (N, 4) float32 - x1, y1, x2, y2
+    class_ids: np.ndarray  # (N,) int32
+    confs: np.ndarray  # (N,) float32
+    areas: np.ndarray  # (N,) float32
+    src_idx: np.ndarray  # (N,) int32 - index into `backends`
+    backends: list[BackendType]
+    
+    def __len__(self) -> int:
+        return len(self.detections)
+
+
 class FusionEngine:
     """
     Runs multiple detection backends in parallel and fuses their results.
@@ -60,11 +148,25 @@ class FusionEngine:
     """
     
     def __init__(self, config: FusionConfig | None = None):
-        self.config = config or FusionConfig()
+        self._dispatch: dict[FusionStrategy, Callable[[FlatDetections], list[Detection]]] = {
+            FusionStrategy.CONSENSUS: self._consensus_fusion,
+            FusionStrategy.CASCADE: self._cascade_fusion,
+            FusionStrategy.PARALLEL_MERGE: self._parallel_merge,
+            FusionStrategy.WEIGHTED: self._weighted_fusion,
+            FusionStrategy.FIRST_WINS: self._first_wins_fusion,
+        }
+        # Cascade pair for the last backends dict seen. PipelineManager hands out
+        # a new dict whenever backends are added, removed or toggled
+        self._cascade_for: dict[str, BaseDetector] | None = None
+        self._cascade_pair: tuple[BaseDetector | None, BaseDetector | None] = (None, None)
+        # Backends already warned about untagged detections; repeats go to debug
+        self._warned_untagged: set[str] = set()
+        self.update_config(config or FusionConfig())
     
     def update_config(self, config: FusionConfig) -> None:
-        """Update fusion configuration"""
+        """Update fusion configuration and resolve its strategy once"""
         self.config = config
+        self._strategy_fn = self._dispatch.get(config.strategy, self._parallel_merge)
     
     async def process_parallel(
         self,
@@ -92,42 +194,86 @@ class FusionEngine:
                 fusion_strategy=self.config.strategy.value,
             )
         
+        if self.config.strategy == FusionStrategy.CASCADE:
+            yolo, pose = self._cascade_backends(backends)
+            if yolo is not None and pose is not None:
+                return await self.process_cascade(frame, yolo, pose)
+        
+        results, total_time = await self.run_backends(frame, backends)
+        return await self.fuse_results(frame, results, total_time)
+    
+    async def run_backends(
+        self,
+        frame: np.ndarray,
+        backends: dict[str, BaseDetector],
+    ) -> tuple[dict[str, DetectionResult], float]:
+        """
+        Run all backends concurrently without fusing.
+        
+        Returns:
+            (backend_id -> DetectionResult of surviving backends, elapsed ms)
+        """
         import time
         start_time = time.perf_counter()
         
-        # Execute all backends in parallel
-        tasks = {
-            backend_id: asyncio.create_task(backend.detect_async(frame))
-            for backend_id, backend in backends.items()
-        }
+        # Execute all backends in parallel; failures come back as values
+        backend_ids = list(backends.keys())
+        outputs = await asyncio.gather(
+            *(backend.detect_async(frame) for backend in backends.values()),
+            return_exceptions=True,
+        )
         
         results: dict[str, DetectionResult] = {}
-        for backend_id, task in tasks.items():
-            try:
-                results[backend_id] = await task
-            except Exception as e:
-                print(f"⚠️ Backend {backend_id} failed: {e}")
+        for backend_id, output in zip(backend_ids, outputs):
+            if isinstance(output, Exception):
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning("Backend %s failed", backend_id, exc_info=output)
                 continue
+            results[backend_id] = output
         
         total_time = (time.perf_counter() - start_time) * 1000
+        return results, total_time
+    
+    async def fuse_results(
+        self,
+        frame: np.ndarray,
+        results: dict[str, DetectionResult],
+        total_time: float,
+    ) -> FusedDetectionResult:
+        """
+        Fuse detection results that were already computed for a frame.
         
-        # Apply fusion strategy
-        match self.config.strategy:
-            case FusionStrategy.CONSENSUS:
-                fused_detections = self._consensus_fusion(results)
-            case FusionStrategy.CASCADE:
-                fused_detections = self._cascade_fusion(results)
-            case FusionStrategy.PARALLEL_MERGE:
-                fused_detections = self._parallel_merge(results)
-            case FusionStrategy.WEIGHTED:
-                fused_detections = self._weighted_fusion(results)
-            case FusionStrategy.FIRST_WINS:
-                fused_detections = self._first_wins_fusion(results)
-            case _:
-                fused_detections = self._parallel_merge(results)
-        
+        Args:
+            frame: BGR image the results belong to
+            results: Dict of backend_id -> DetectionResult of surviving backends
+            total_time: Inference time to report, in milliseconds
+        """
         h, w = frame.shape[:2]
-        backends_used = [r.backend_type for r in results.values()]
+        
+        # A single surviving backend has nothing to fuse with
+        if len(results) == 1:
+            result = next(iter(results.values()))
+            return FusedDetectionResult(
+                detections=result.detections,
+                inference_time_ms=total_time,
+                frame_width=w,
+                frame_height=h,
+                backends_used=[result.backend_type],
+                fusion_strategy=self.config.strategy.value,
+                individual_results=(result,),
+            )
+        
+        # Flatten once; every strategy reads the same arrays
+        flat = self._flatten_results(results)
+        
+        # Apply fusion strategy (resolved in update_config). Crowded frames
+        # fuse on a worker thread so the loop can start the next frame
+        if len(flat) > FUSION_OFFLOAD_MIN_DETECTIONS:
+            fused_detections = await asyncio.to_thread(self._strategy_fn, flat)
+        else:
+            fused_detections = self._strategy_fn(flat)
+        
+        backends_used = flat.backends
         
         return FusedDetectionResult(
             detections=fused_detections,
@@ -136,7 +282,123 @@ class FusionEngine:
             frame_height=h,
             backends_used=backends_used,
             fusion_strategy=self.config.strategy.value,
-            individual_results=list(results.values()),
+            individual_results=tuple(results.values()),
+        )
+    
+    def _cascade_backends(
+        self,
+        backends: dict[str, BaseDetector],
+    ) -> tuple[BaseDetector | None, BaseDetector | None]:
+        """Pick the first YOLO detector and the first pose backend, once per backends dict"""
+        if backends is self._cascade_for:
+            return self._cascade_pair
+        yolo = None
+        pose = None
+        for backend in backends.values():
+            backend_type = backend.get_capabilities().backend_type
+            if backend_type == BackendType.YOLO and yolo is None:
+                yolo = backend
+            elif backend_type in (BackendType.DEEPLABCUT, BackendType.SLEAP) and pose is None:
+                pose = backend
+        self._cascade_for = backends
+        self._cascade_pair = (yolo, pose)
+        return self._cascade_pair
+    
+    async def process_cascade(
+        self,
+        frame: np.ndarray,
+        yolo: BaseDetector,
+        pose: BaseDetector,
+    ) -> FusedDetectionResult:
+        """
+        Two-stage cascade: YOLO runs on the full frame, then the pose
+        backend only runs on crops of the animals YOLO found.
+        Frames without animals never reach the pose backend.
+        
+        Args:
+            frame: BGR image as numpy array
+            yolo: Fast detector providing bounding boxes
+            pose: Pose backend (DeepLabCut/SLEAP) refining keypoints
+            
+        Returns:
+            FusedDetectionResult with YOLO boxes and pose keypoints
+        """
+        import time
+        start_time = time.perf_counter()
+        
+        h, w = frame.shape[:2]
+        try:
+            yolo_result = await yolo.detect_async(frame)
+        except Exception as e:
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning("Cascade detector failed", exc_info=e)
+            return FusedDetectionResult(
+                detections=[],
+                inference_time_ms=(time.perf_counter() - start_time) * 1000,
+                frame_width=w,
+                frame_height=h,
+                backends_used=[],
+                fusion_strategy=self.config.strategy.value,
+            )
+        
+        # Clip animal boxes to the frame; degenerate crops are skipped
+        rois: list[tuple[Detection, int, int]] = []
+        for det in yolo_result.detections:
+            if det.class_id not in QUADRUPED_CLASS_IDS:
+                continue
+            x1, y1 = max(0, det.bbox[0]), max(0, det.bbox[1])
+            x2, y2 = min(w, det.bbox[2]), min(h, det.bbox[3])
+            if x2 > x1 and y2 > y1:
+                rois.append((det, x1, y1))
+        
+        pose_outputs = await asyncio.gather(
+            *(
+                pose.detect_async(frame[y1:det.bbox[3], x1:det.bbox[2]])
+                for det, x1, y1 in rois
+            ),
+            return_exceptions=True,
+        )
+        
+        backends_used = [yolo_result.backend_type]
+        individual_results = [yolo_result]
+        refined: dict[int, Detection] = {}
+        
+        for (yolo_det, x1, y1), output in zip(rois, pose_outputs):
+            if isinstance(output, Exception):
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning("Pose backend failed on ROI", exc_info=output)
+                continue
+            
+            individual_results.append(output)
+            if output.backend_type not in backends_used:
+                backends_used.append(output.backend_type)
+            if not output.detections:
+                continue
+            
+            # Best pose in the crop refines this YOLO box
+            pose_det = max(output.detections, key=lambda d: d.confidence)
+            pose_det.translate(x1, y1)
+            refined[id(yolo_det)] = Detection(
+                class_id=yolo_det.class_id,
+                class_name=yolo_det.class_name,
+                class_name_es=yolo_det.class_name_es,
+                confidence=self._aggregate_confidence(yolo_det.confidence, pose_det.confidence),
+                bbox=yolo_det.bbox,
+                keypoints=pose_det.keypoints if pose_det.num_keypoints else yolo_det.keypoints,
+                tracker_id=yolo_det.tracker_id,
+                backend_source=BackendType.YOLO,  # Primary source
+            )
+        
+        fused = [refined.get(id(det), det) for det in yolo_result.detections]
+        
+        return FusedDetectionResult(
+            detections=fused,
+            inference_time_ms=(time.perf_counter() - start_time) * 1000,
+            frame_width=w,
+            frame_height=h,
+            backends_used=backends_used,
+            fusion_strategy=self.config.strategy.value,
+            individual_results=tuple(individual_results),
         )
     
     def _calculate_iou(self, box1: tuple, box2: tuple) -> float:
@@ -162,45 +424,154 @@ class FusionEngine:
         
         return intersection / union if union > 0 else 0.0
     
+    def _flatten_results(
+        self,
+        results: dict[str, DetectionResult],
+    ) -> FlatDetections:
+        """
+        Collect detections from every backend into SoA arrays.
+        Areas are computed here once instead of on every IoU evaluation.
+        """
+        backends: list[BackendType] = []
+        detections: list[Detection] = []
+        src: list[int] = []
+        
+        for idx, (backend_id, result) in enumerate(results.items()):
+            backends.append(result.backend_type)
+            missing = 0
+            for det in result.detections:
+                # Detectors stamp their own source; only unstamped ones are backfilled
+                if det.backend_source is None:
+                    det.backend_source = result.backend_type
+                    missing += 1
+                detections.append(det)
+                src.append(idx)
+            if missing:
+                if backend_id in self._warned_untagged:
+                    level = logging.DEBUG
+                else:
+                    self._warned_untagged.add(backend_id)
+                    level = logging.WARNING
+                logger.log(level, "%s returned %d detections without backend_source", backend_id, missing)
+        
+        n = len(detections)
+        boxes = np.array([d.bbox for d in detections], dtype=np.float32).reshape(n, 4)
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        
+        return FlatDetections(
+            detections=detections,
+            boxes=boxes,
+            class_ids=np.fromiter((d.class_id for d in detections), dtype=np.int32, count=n),
+            confs=np.fromiter((d.confidence for d in detections), dtype=np.float32, count=n),
+            areas=areas,
+            src_idx=np.array(src, dtype=np.int32),
+            backends=backends,
+        )
+    
+    @staticmethod
+    def _iou_matrix(
+        boxes1: np.ndarray,
+        areas1: np.ndarray,
+        boxes2: np.ndarray,
+        areas2: np.ndarray,
+    ) -> np.ndarray:
+        """Pairwise IoU between two box sets using precomputed areas"""
+        x1 = np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+        y1 = np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+        x2 = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2])
+        y2 = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3])
+        
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        union = areas1[:, None] + areas2[None, :] - intersection
+        
+        return np.divide(
+            intersection,
+            union,
+            out=np.zeros_like(intersection),
+            where=union > 0,
+        )
+    
+    @staticmethod
+    def _iou_pairs(
+        boxes1: np.ndarray,
+        areas1: np.ndarray,
+        boxes2: np.ndarray,
+        areas2: np.ndarray,
+    ) -> np.ndarray:
+        """Element-wise IoU between aligned rows of two box sets"""
+        x1 = np.maximum(boxes1[:, 0], boxes2[:, 0])
+        y1 = np.maximum(boxes1[:, 1], boxes2[:, 1])
+        x2 = np.minimum(boxes1[:, 2], boxes2[:, 2])
+        y2 = np.minimum(boxes1[:, 3], boxes2[:, 3])
+        
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        union = areas1 + areas2 - intersection
+        
+        return np.divide(
+            intersection,
+            union,
+            out=np.zeros_like(intersection),
+            where=union > 0,
+        )
+    
+    def _pairwise_iou(self, flat: FlatDetections) -> np.ndarray:
+        """
+        IoU between every pair of detections in `flat`.
+        Crowded frames go through a spatial index so only overlapping,
+        same-class pairs are evaluated; the rest stay zero.
+        """
+        n = len(flat)
+        if n <= SPATIAL_INDEX_MIN_DETECTIONS:
+            return self._iou_matrix(flat.boxes, flat.areas, flat.boxes, flat.areas)
+        
+        polys = shapely.box(flat.boxes[:, 0], flat.boxes[:, 1], flat.boxes[:, 2], flat.boxes[:, 3])
+        left, right = STRtree(polys).query(polys, predicate="intersects")
+        
+        keep = (left < right) & (flat.class_ids[left] == flat.class_ids[right])
+        left, right = left[keep], right[keep]
+        
+        pair_iou = self._iou_pairs(
+            flat.boxes[left], flat.areas[left],
+            flat.boxes[right], flat.areas[right],
+        )
+        iou = np.zeros((n, n), dtype=np.float32)
+        iou[left, right] = pair_iou
+        iou[right, left] = pair_iou
+        return iou
+    
     def _match_detections(
         self,
-        detections1: list[Detection],
-        detections2: list[Detection],
-    ) -> list[tuple[Detection | None, Detection | None]]:
+        flat: FlatDetections,
+        idx1: np.ndarray,
+        idx2: np.ndarray,
+    ) -> list[tuple[int | None, int | None]]:
         """
-        Match detections from two backends using IoU.
-        Returns list of (det1, det2) pairs. None means no match.
+        Match two groups of detections (given as indices into `flat`) using IoU.
+        Returns list of (i, j) index pairs. None means no match.
         """
-        matched: list[tuple[Detection | None, Detection | None]] = []
-        used2: set[int] = set()
+        matched: list[tuple[int | None, int | None]] = []
+        used2 = np.zeros(len(idx2), dtype=bool)
         
-        for det1 in detections1:
-            best_match = None
-            best_iou = self.config.iou_threshold
-            best_idx = -1
-            
-            for idx, det2 in enumerate(detections2):
-                if idx in used2:
-                    continue
-                if det1.class_id != det2.class_id:
-                    continue
-                
-                iou = self._calculate_iou(det1.bbox, det2.bbox)
-                if iou > best_iou:
-                    best_iou = iou
-                    best_match = det2
-                    best_idx = idx
+        iou = self._iou_matrix(
+            flat.boxes[idx1], flat.areas[idx1],
+            flat.boxes[idx2], flat.areas[idx2],
+        )
+        same_class = flat.class_ids[idx1][:, None] == flat.class_ids[idx2][None, :]
+        iou = np.where(same_class, iou, 0.0)
+        
+        for row, i in enumerate(idx1):
+            candidates = np.where(used2, 0.0, iou[row])
+            best = int(np.argmax(candidates)) if len(candidates) else -1
             
-            if best_match:
-                matched.append((det1, best_match))
-                used2.add(best_idx)
+            if best >= 0 and candidates[best] > self.config.iou_threshold:
+                matched.append((int(i), int(idx2[best])))
+                used2[best] = True
             else:
-                matched.append((det1, None))
+                matched.append((int(i), None))
         
-        # Add unmatched from detections2
-        for idx, det2 in enumerate(detections2):
-            if idx not in used2:
-                matched.append((None, det2))
+        # Add unmatched from the second group
+        for col in np.flatnonzero(~used2):
+            matched.append((None, int(idx2[col])))
         
         return matched
     
@@ -220,13 +591,13 @@ class FusionEngine:
         
         # Prefer keypoints from specified backend
         if self.config.prefer_pose_from:
-            if det1.backend_source == self.config.prefer_pose_from and det1.keypoints:
+            if det1.backend_source == self.config.prefer_pose_from and det1.num_keypoints:
                 return det1.keypoints
-            if det2.backend_source == self.config.prefer_pose_from and det2.keypoints:
+            if det2.backend_source == self.config.prefer_pose_from and det2.num_keypoints:
                 return det2.keypoints
         
-        # Otherwise prefer the one with more keypoints
-        if len(det1.keypoints) >= len(det2.keypoints):
+        # Otherwise prefer the one with more keypoints (counted, not materialized)
+        if det1.num_keypoints >= det2.num_keypoints:
             return det1.keypoints
         return det2.keypoints
     
@@ -244,116 +615,97 @@ class FusionEngine:
     
     def _consensus_fusion(
         self,
-        results: dict[str, DetectionResult],
+        flat: FlatDetections,
     ) -> list[Detection]:
         """
         Only include detections confirmed by multiple backends.
         Reduces false positives.
         """
-        if len(results) < 2:
+        if len(flat.backends) < 2:
             # With only one backend, just return its detections
-            for result in results.values():
-                return result.detections
-            return []
+            return flat.detections
         
-        # Collect all detections with their source
-        all_detections: list[tuple[Detection, str]] = []
-        for backend_id, result in results.items():
-            for det in result.detections:
-                det.backend_source = result.backend_type
-                all_detections.append((det, backend_id))
+        dets = flat.detections
+        iou = self._pairwise_iou(flat)
+        
+        # Detections from the same backend never confirm each other
+        iou[flat.src_idx[:, None] == flat.src_idx[None, :]] = -1.0
+        labels = _greedy_group(iou, flat.class_ids, self.config.iou_threshold)
         
         # Group detections by matching them across backends
         consensus_detections: list[Detection] = []
-        used: set[int] = set()
         
-        for i, (det1, backend1) in enumerate(all_detections):
-            if i in used:
-                continue
-            
-            matching_count = 1
-            matching_dets = [det1]
-            
-            for j, (det2, backend2) in enumerate(all_detections):
-                if j <= i or j in used or backend1 == backend2:
-                    continue
-                
-                if det1.class_id == det2.class_id:
-                    iou = self._calculate_iou(det1.bbox, det2.bbox)
-                    if iou >= self.config.iou_threshold:
-                        matching_count += 1
-                        matching_dets.append(det2)
-                        used.add(j)
-            
+        for group in _split_groups(labels):
             # Only include if enough backends agree
-            if matching_count >= self.config.min_backends_agree:
-                # Create merged detection
-                avg_conf = sum(d.confidence for d in matching_dets) / len(matching_dets)
+            if len(group) >= self.config.min_backends_agree:
+                det1 = dets[group[0]]
                 merged = Detection(
                     class_id=det1.class_id,
                     class_name=det1.class_name,
                     class_name_es=det1.class_name_es,
-                    confidence=avg_conf,
+                    confidence=float(flat.confs[group].mean()),
                     bbox=det1.bbox,
-                    keypoints=self._merge_keypoints(matching_dets[0], matching_dets[1] if len(matching_dets) > 1 else None),
+                    keypoints=self._merge_keypoints(det1, dets[group[1]] if len(group) > 1 else None),
                     tracker_id=det1.tracker_id,
                     backend_source=BackendType.YOLO,  # Fused
                 )
                 consensus_detections.append(merged)
-                used.add(i)
         
         return consensus_detections
     
     def _cascade_fusion(
         self,
-        results: dict[str, DetectionResult],
+        flat: FlatDetections,
     ) -> list[Detection]:
         """
         Use fast detector (YOLO) for bounding boxes, 
         then refine pose with accurate detector (DeepLabCut).
         """
         # Find YOLO result for bounding boxes
-        yolo_result = None
-        pose_result = None
+        yolo_src = None
+        pose_src = None
         
-        for result in results.values():
-            if result.backend_type == BackendType.YOLO:
-                yolo_result = result
-            elif result.backend_type in (BackendType.DEEPLABCUT, BackendType.SLEAP):
-                pose_result = result
+        for src, backend_type in enumerate(flat.backends):
+            if backend_type == BackendType.YOLO:
+                yolo_src = src
+            elif backend_type in (BackendType.DEEPLABCUT, BackendType.SLEAP):
+                pose_src = src
         
-        if not yolo_result:
+        if yolo_src is None:
             # Fall back to first available
-            for result in results.values():
-                return result.detections
-            return []
+            if not flat.backends:
+                return []
+            return [d for d, s in zip(flat.detections, flat.src_idx) if s == 0]
         
-        if not pose_result:
-            return yolo_result.detections
+        yolo_idx = np.flatnonzero(flat.src_idx == yolo_src)
+        if pose_src is None:
+            return [flat.detections[i] for i in yolo_idx]
         
         # Match YOLO detections with pose results and merge
+        dets = flat.detections
         fused: list[Detection] = []
-        matches = self._match_detections(yolo_result.detections, pose_result.detections)
+        matches = self._match_detections(flat, yolo_idx, np.flatnonzero(flat.src_idx == pose_src))
         
-        for yolo_det, pose_det in matches:
-            if yolo_det is None and pose_det is None:
+        for yolo_i, pose_i in matches:
+            if yolo_i is None and pose_i is None:
                 continue
             
-            if yolo_det is None:
+            if yolo_i is None:
                 # Only pose detected, keep it
-                fused.append(pose_det)
-            elif pose_det is None:
+                fused.append(dets[pose_i])
+            elif pose_i is None:
                 # Only YOLO detected, keep it
-                fused.append(yolo_det)
+                fused.append(dets[yolo_i])
             else:
                 # Both detected - use YOLO bbox, pose keypoints
+                yolo_det, pose_det = dets[yolo_i], dets[pose_i]
                 merged = Detection(
                     class_id=yolo_det.class_id,
                     class_name=yolo_det.class_name,
                     class_name_es=yolo_det.class_name_es,
                     confidence=self._aggregate_confidence(yolo_det.confidence, pose_det.confidence),
                     bbox=yolo_det.bbox,
-                    keypoints=pose_det.keypoints if pose_det.keypoints else yolo_det.keypoints,
+                    keypoints=pose_det.keypoints if pose_det.num_keypoints else yolo_det.keypoints,
                     tracker_id=yolo_det.tracker_id or pose_det.tracker_id,
                     backend_source=BackendType.YOLO,  # Primary source
                 )
@@ -363,58 +715,37 @@ class FusionEngine:
     
     def _parallel_merge(
         self,
-        results: dict[str, DetectionResult],
+        flat: FlatDetections,
     ) -> list[Detection]:
         """
         Merge all detections, deduplicating by IoU.
         Maximizes coverage - if any backend sees it, include it.
         """
-        all_detections: list[Detection] = []
-        
-        for result in results.values():
-            for det in result.detections:
-                det.backend_source = result.backend_type
-                all_detections.append(det)
-        
-        if not all_detections:
+        if not len(flat):
             return []
         
+        dets = flat.detections
+        iou = self._pairwise_iou(flat)
+        labels = _greedy_group(iou, flat.class_ids, self.config.iou_threshold)
+        
         # Deduplicate by IoU
         merged: list[Detection] = []
-        used: set[int] = set()
         
-        for i, det1 in enumerate(all_detections):
-            if i in used:
-                continue
-            
-            # Find all matching detections
-            group = [det1]
-            for j, det2 in enumerate(all_detections):
-                if j <= i or j in used:
-                    continue
-                if det1.class_id == det2.class_id:
-                    iou = self._calculate_iou(det1.bbox, det2.bbox)
-                    if iou >= self.config.iou_threshold:
-                        group.append(det2)
-                        used.add(j)
-            
-            # Merge the group
+        for group in _split_groups(labels):
             if len(group) == 1:
-                merged.append(det1)
+                merged.append(dets[group[0]])
             else:
                 # Use highest confidence detection as base
-                best = max(group, key=lambda d: d.confidence)
-                best.keypoints = self._merge_keypoints(group[0], group[1] if len(group) > 1 else None)
-                best.confidence = max(d.confidence for d in group)
+                best = dets[group[int(np.argmax(flat.confs[group]))]]
+                best.keypoints = self._merge_keypoints(dets[group[0]], dets[group[1]])
+                best.confidence = max(dets[g].confidence for g in group)
                 merged.append(best)
-            
-            used.add(i)
         
         return merged
     
     def _weighted_fusion(
         self,
-        results: dict[str, DetectionResult],
+        flat: FlatDetections,
     ) -> list[Detection]:
         """
         Weight detections by backend reliability.
@@ -429,35 +760,33 @@ class FusionEngine:
         
         weights = self.config.backend_weights or default_weights
         
-        # Apply weights to confidences
-        all_detections: list[Detection] = []
-        for result in results.values():
-            weight = weights.get(result.backend_type, 1.0)
-            for det in result.detections:
-                det.confidence = min(1.0, det.confidence * weight)
-                det.backend_source = result.backend_type
-                all_detections.append(det)
+        # Apply weights to confidences, one weight per source backend
+        source_weights = np.array(
+            [weights.get(b, 1.0) for b in flat.backends], dtype=np.float32
+        )
+        confs = np.minimum(1.0, flat.confs * source_weights[flat.src_idx]) if len(flat) else flat.confs
+        for det, conf in zip(flat.detections, confs.tolist()):
+            det.confidence = conf
         
         # Then merge like parallel
-        return self._parallel_merge({"weighted": DetectionResult(
-            detections=all_detections,
-            inference_time_ms=0,
-            frame_width=0,
-            frame_height=0,
-            backend_type=BackendType.YOLO,
-        )})
+        return self._parallel_merge(FlatDetections(
+            detections=flat.detections,
+            boxes=flat.boxes,
+            class_ids=flat.class_ids,
+            confs=confs,
+            areas=flat.areas,
+            src_idx=flat.src_idx,
+            backends=flat.backends,
+        ))
     
     def _first_wins_fusion(
         self,
-        results: dict[str, DetectionResult],
+        flat: FlatDetections,
     ) -> list[Detection]:
         """
         Use first backend's detections, others just validate.
         Fast but less accurate.
         """
-        for result in results.values():
-            # Tag all detections with source
-            for det in result.detections:
-                det.backend_source = result.backend_type
-            return result.detections
-        return []
+        if not flat.backends:
+            return []
+        return [d for d, s in zip(flat.detections, flat.src_idx) if s == 0]
@@ -3,8 +3,13 @@ Pipeline Manager for Argos.
 Central orchestrator that manages detection backends and presets.
 """
 import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable
 import numpy as np
 
 from .base_detector import (
@@ -17,8 +22,101 @@ from .base_detector import (
 )
 from .fusion_engine import FusionEngine, FusionConfig, FusionStrategy
 
+if TYPE_CHECKING:
+    from app.video.sources import VideoSource
+    from .tracker import ObjectTracker, TrackingResult
 
-@dataclass
+
+logger = logging.getLogger(__name__)
+
+
+# Continuous batching front-end (process_frame_batched)
+MAX_FRAME_BATCH = 8
+FRAME_BATCH_WINDOW_S = 0.008  # How long the first frame waits for company
+
+# Streaming pipeline (run_pipeline): frames buffered between stages
+PIPELINE_QUEUE_SIZE = 2
+
+# Removed detectors with their weights still loaded, keyed by
+# (backend_type, model_name) and evicted least-recently-used first.
+# Presets sharing a model (e.g. yolo11n.pt) switch without reloading it.
+# None picks a size for the device: parked models keep their GPU memory,
+# so CUDA hosts park a single one.
+MODEL_CACHE_SIZE: int | None = None
+CPU_MODEL_CACHE_SIZE = 4
+_model_cache: OrderedDict[tuple[BackendType, str], BaseDetector] = OrderedDict()
+
+
+@lru_cache(maxsize=1)
+def _cuda_available() -> bool:
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def _model_cache_size() -> int:
+    if MODEL_CACHE_SIZE is not None:
+        return MODEL_CACHE_SIZE
+    return 1 if _cuda_available() else CPU_MODEL_CACHE_SIZE
+
+
+def _release_detector(detector: BaseDetector) -> None:
+    """Clean up a detector and hand its freed GPU memory back to the driver"""
+    detector.cleanup()
+    if _cuda_available():
+        import torch
+        torch.cuda.empty_cache()
+
+
+def _cache_detector(key: tuple[BackendType, str], detector: BaseDetector) -> None:
+    """Park a loaded detector in the model cache, cleaning up evicted ones"""
+    stale = _model_cache.pop(key, None)
+    if stale is not None:
+        _release_detector(stale)
+    _model_cache[key] = detector
+    while len(_model_cache) > _model_cache_size():
+        _, evicted = _model_cache.popitem(last=False)
+        _release_detector(evicted)
+
+
+def clear_model_cache() -> None:
+    """Release every cached detector"""
+    while _model_cache:
+        _, detector = _model_cache.popitem()
+        _release_detector(detector)
+
+
+# Detector classes resolved on first use, so backend imports happen once
+_DETECTOR_CLASSES: dict[BackendType, type[BaseDetector]] = {}
+
+
+def _import_detector_class(backend_type: BackendType) -> type[BaseDetector] | None:
+    """Import the detector class for a backend type (optional backends may be missing)"""
+    match backend_type:
+        case BackendType.YOLO:
+            from .yolo_detector import YOLODetector
+            return YOLODetector
+        case BackendType.DEEPLABCUT:
+            try:
+                from .deeplabcut_detector import DeepLabCutDetector
+                return DeepLabCutDetector
+            except ImportError:
+                logger.warning("DeepLabCut not installed. Run: pip install deeplabcut")
+                return None
+        case BackendType.SLEAP:
+            try:
+                from .sleap_detector import SLEAPDetector
+                return SLEAPDetector
+            except ImportError:
+                logger.warning("SLEAP not installed. Run: pip install sleap")
+                return None
+        case _:
+            return None
+
+
+@dataclass(slots=True)
 class BackendInstance:
     """Represents a configured and loaded backend"""
     backend_id: str
@@ -27,18 +125,45 @@ class BackendInstance:
     enabled: bool = True
     model_name: str = ""
     config: dict = field(default_factory=dict)
+    # Capabilities are fixed once the model is loaded; status polling reuses them
+    _caps: BackendCapabilities | None = field(default=None, init=False, repr=False)
+    _dict: dict[str, Any] | None = field(default=None, init=False, repr=False)
+    _dirty: bool = field(default=True, init=False, repr=False)
+    # Model cache key, set only when the requested model actually loaded
+    _cache_key: tuple[BackendType, str] | None = field(default=None, init=False, repr=False)
+    
+    @property
+    def capabilities(self) -> BackendCapabilities:
+        """Capabilities of the loaded detector, queried once"""
+        if self._caps is None:
+            self.refresh_capabilities()
+        return self._caps
+    
+    def refresh_capabilities(self) -> BackendCapabilities:
+        """Re-query the detector's capabilities, e.g. after its model loaded"""
+        self._caps = self.detector.get_capabilities()
+        self._dirty = True
+        return self._caps
+    
+    def mark_dirty(self) -> None:
+        """Invalidate the memoized to_dict() after enabled/model_name change"""
+        self._dirty = True
     
     def to_dict(self) -> dict[str, Any]:
-        return {
-            "backend_id": self.backend_id,
-            "backend_type": self.backend_type.value,
-            "enabled": self.enabled,
-            "model_name": self.model_name,
-            "capabilities": self.detector.get_capabilities().to_dict(),
-        }
+        """Memoized status dict, shared between calls and must not be mutated"""
+        if self._dirty or self._dict is None:
+            self._dict = {
+                "backend_id": self.backend_id,
+                "backend_type": self.backend_type.value,
+                "enabled": self.enabled,
+                "model_name": self.model_name,
+                "capabilities": self.capabilities.to_dict(),
+            }
+            self._dirty = False
+        return self._dict
 
 
-@dataclass
+@dataclass(slots=True)
 class PipelinePreset:
     """Pre-configured pipeline setup for common use cases"""
     id: str
@@ -48,22 +173,26 @@ class PipelinePreset:
     backends: list[dict]
     fusion: FusionConfig
     features: dict = field(default_factory=dict)
+    # Presets are immutable once built, so they serialize once
+    _dict: dict[str, Any] | None = field(default=None, init=False, repr=False, compare=False)
     
     def to_dict(self) -> dict[str, Any]:
-        return {
-            "id": self.id,
-            "name": self.name,
-            "description": self.description,
-            "icon": self.icon,
-            "backends": self.backends,
-            "fusion": self.fusion.to_dict(),
-            "features": self.features,
-        }
+        if self._dict is None:
+            self._dict = {
+                "id": self.id,
+                "name": self.name,
+                "description": self.description,
+                "icon": self.icon,
+                "backends": self.backends,
+                "fusion": self.fusion.to_dict(),
+                "features": self.features,
+            }
+        return self._dict
 
 
-# Pre-defined presets
-PRESETS: dict[str, PipelinePreset] = {
-    "home_security": PipelinePreset(
+# Pre-defined presets, each built on first access (see get_preset)
+_PRESET_BUILDERS: dict[str, Callable[[], PipelinePreset]] = {
+    "home_security": lambda: PipelinePreset(
         id="home_security",
         name="🏠 Seguridad del Hogar",
         description="Detecta personas y mascotas, alertas de intrusión",
@@ -78,7 +207,7 @@ PRESETS: dict[str, PipelinePreset] = {
             "pose_estimation": False,
         }
     ),
-    "pet_monitor": PipelinePreset(
+    "pet_monitor": lambda: PipelinePreset(
         id="pet_monitor",
         name="🐕 Monitor de Mascotas",
         description="Tracking detallado de mascotas con esqueleto",
@@ -97,7 +226,7 @@ PRESETS: dict[str, PipelinePreset] = {
             "activity_tracking": True,
         }
     ),
-    "high_precision": PipelinePreset(
+    "high_precision": lambda: PipelinePreset(
         id="high_precision",
         name="🎯 Alta Precisión",
         description="Máxima precisión combinando múltiples backends",
@@ -116,7 +245,7 @@ PRESETS: dict[str, PipelinePreset] = {
             "reduce_false_positives": True,
         }
     ),
-    "lab_research": PipelinePreset(
+    "lab_research": lambda: PipelinePreset(
         id="lab_research",
         name="🧪 Investigación de Laboratorio",
         description="Multi-animal tracking de alta velocidad",
@@ -131,7 +260,7 @@ PRESETS: dict[str, PipelinePreset] = {
             "frame_by_frame": True,
         }
     ),
-    "wildlife": PipelinePreset(
+    "wildlife": lambda: PipelinePreset(
         id="wildlife",
         name="🦁 Vida Silvestre",
         description="Detección + pose de animales salvajes",
@@ -149,7 +278,7 @@ PRESETS: dict[str, PipelinePreset] = {
             "pose_estimation": True,
         }
     ),
-    "industrial": PipelinePreset(
+    "industrial": lambda: PipelinePreset(
         id="industrial",
         name="🏭 Industrial",
         description="Detección de objetos y seguridad laboral",
@@ -164,7 +293,7 @@ PRESETS: dict[str, PipelinePreset] = {
             "vehicle_tracking": True,
         }
     ),
-    "custom": PipelinePreset(
+    "custom": lambda: PipelinePreset(
         id="custom",
         name="⚙️ Personalizado",
         description="Configuración manual de backends",
@@ -175,6 +304,26 @@ PRESETS: dict[str, PipelinePreset] = {
     ),
 }
 
+PRESET_IDS: tuple[str, ...] = tuple(_PRESET_BUILDERS)
+
+
+@lru_cache(maxsize=None)
+def _build_preset(preset_id: str) -> PipelinePreset:
+    return _PRESET_BUILDERS[preset_id]()
+
+
+def get_preset(preset_id: str) -> PipelinePreset | None:
+    """Get a preset by ID, building it on first access"""
+    if preset_id not in _PRESET_BUILDERS:
+        return None
+    return _build_preset(preset_id)
+
+
+@lru_cache(maxsize=1)
+def _available_preset_dicts() -> tuple[dict[str, Any], ...]:
+    # Preset dicts are memoized on the presets; this only saves the loop
+    return tuple(get_preset(preset_id).to_dict() for preset_id in PRESET_IDS)
+
 
 class PipelineManager:
     """
@@ -192,6 +341,15 @@ class PipelineManager:
         self._fusion_engine = FusionEngine()
         self._active_preset: str | None = None
         self._backend_counter = 0
+        # Enabled backends snapshot reused every frame; reset on any change
+        self._active: dict[str, BaseDetector] | None = None
+        # Reused by process_frame_sync instead of a fresh loop per frame;
+        # created on first use so async-only callers never own a loop
+        self._sync_loop: asyncio.AbstractEventLoop | None = None
+        self._sync_lock = threading.Lock()
+        # Started lazily on the loop of the first process_frame_batched call
+        self._pending: asyncio.Queue | None = None
+        self._batch_task: asyncio.Task | None = None
     
     @property
     def active_preset(self) -> str | None:
@@ -205,23 +363,23 @@ class PipelineManager:
     
     def get_available_presets(self) -> list[dict]:
         """Get list of all available presets"""
-        return [preset.to_dict() for preset in PRESETS.values()]
+        return list(_available_preset_dicts())
     
     def get_preset(self, preset_id: str) -> PipelinePreset | None:
         """Get a specific preset by ID"""
-        return PRESETS.get(preset_id)
+        return get_preset(preset_id)
     
     async def apply_preset(self, preset_id: str) -> bool:
         """
         Apply a preset configuration.
         Loads/unloads backends as needed.
         """
-        preset = PRESETS.get(preset_id)
+        preset = get_preset(preset_id)
         if not preset:
-            print(f"❌ Preset '{preset_id}' not found")
+            logger.error("Preset '%s' not found", preset_id)
             return False
         
-        print(f"🔄 Applying preset: {preset.name}")
+        logger.info("Applying preset: %s", preset.name)
         
         # Clear existing backends
         await self.clear_all_backends()
@@ -241,7 +399,7 @@ class PipelineManager:
             )
         
         self._active_preset = preset_id
-        print(f"✅ Preset '{preset.name}' applied with {len(self._backends)} backends")
+        logger.info("Preset '%s' applied with %d backends", preset.name, len(self._backends))
         return True
     
     async def add_backend(
@@ -257,18 +415,24 @@ class PipelineManager:
         self._backend_counter += 1
         backend_id = f"{backend_type.value}_{self._backend_counter}"
         
-        # Create detector based on type
-        detector = self._create_detector(backend_type)
-        if detector is None:
-            raise ValueError(f"Backend type '{backend_type}' not supported")
+        # Reuse a cached detector with this model already loaded
+        cache_key = (backend_type, model_name)
+        detector = _model_cache.pop(cache_key, None)
         
-        # Load model
-        if model_name:
-            try:
-                detector.load_model(model_name)
-            except Exception as e:
-                print(f"⚠️ Failed to load model '{model_name}': {e}")
-                # Continue with default model
+        if detector is None:
+            # Create detector based on type
+            detector = self._create_detector(backend_type)
+            if detector is None:
+                raise ValueError(f"Backend type '{backend_type}' not supported")
+            
+            # Load model
+            if model_name:
+                try:
+                    detector.load_model(model_name)
+                except Exception as e:
+                    logger.warning("Failed to load model '%s': %s", model_name, e)
+                    # Continue with default model, which must not be cached under this name
+                    cache_key = None
         
         instance = BackendInstance(
             backend_id=backend_id,
@@ -278,49 +442,45 @@ class PipelineManager:
             model_name=model_name,
             config=config or {},
         )
+        instance._cache_key = cache_key
+        instance.refresh_capabilities()  # Snapshot caps now that the model is loaded
         
         self._backends[backend_id] = instance
-        print(f"✅ Added backend: {backend_id} ({model_name or 'default model'})")
+        self._active = None
+        logger.info("Added backend: %s (%s)", backend_id, model_name or "default model")
         return backend_id
     
     def _create_detector(self, backend_type: BackendType) -> BaseDetector | None:
         """Factory method to create detector instances"""
-        match backend_type:
-            case BackendType.YOLO:
-                from .yolo_detector import YOLODetector
-                return YOLODetector()
-            case BackendType.DEEPLABCUT:
-                try:
-                    from .deeplabcut_detector import DeepLabCutDetector
-                    return DeepLabCutDetector()
-                except ImportError:
-                    print("⚠️ DeepLabCut not installed. Run: pip install deeplabcut")
-                    return None
-            case BackendType.SLEAP:
-                try:
-                    from .sleap_detector import SLEAPDetector
-                    return SLEAPDetector()
-                except ImportError:
-                    print("⚠️ SLEAP not installed. Run: pip install sleap")
-                    return None
-            case _:
+        cls = _DETECTOR_CLASSES.get(backend_type)
+        if cls is None:
+            cls = _import_detector_class(backend_type)
+            if cls is None:
                 return None
+            _DETECTOR_CLASSES[backend_type] = cls
+        return cls()
     
     def remove_backend(self, backend_id: str) -> bool:
         """Remove a backend by ID"""
         if backend_id in self._backends:
             instance = self._backends.pop(backend_id)
-            instance.detector.cleanup()
-            print(f"🗑️ Removed backend: {backend_id}")
+            self._active = None
+            if instance._cache_key is not None:
+                _cache_detector(instance._cache_key, instance.detector)
+            else:
+                instance.detector.cleanup()
+            logger.info("Removed backend: %s", backend_id)
             return True
         return False
     
     def enable_backend(self, backend_id: str, enabled: bool = True) -> bool:
         """Enable or disable a backend"""
         if backend_id in self._backends:
-            self._backends[backend_id].enabled = enabled
-            status = "enabled" if enabled else "disabled"
-            print(f"{'✅' if enabled else '⏸️'} Backend {backend_id} {status}")
+            instance = self._backends[backend_id]
+            instance.enabled = enabled
+            instance.mark_dirty()
+            self._active = None
+            logger.info("Backend %s %s", backend_id, "enabled" if enabled else "disabled")
             return True
         return False
     
@@ -329,14 +489,20 @@ class PipelineManager:
         for backend_id in list(self._backends.keys()):
             self.remove_backend(backend_id)
         self._backends.clear()
+        self._active = None
     
     def get_active_backends(self) -> dict[str, BaseDetector]:
-        """Get only enabled backends"""
-        return {
-            bid: instance.detector
-            for bid, instance in self._backends.items()
-            if instance.enabled
-        }
+        """
+        Get only enabled backends.
+        The dict is shared between calls and must not be mutated.
+        """
+        if self._active is None:
+            self._active = {
+                bid: instance.detector
+                for bid, instance in self._backends.items()
+                if instance.enabled
+            }
+        return self._active
     
     async def process_frame(self, frame: np.ndarray) -> FusedDetectionResult:
         """
@@ -346,13 +512,214 @@ class PipelineManager:
         active = self.get_active_backends()
         return await self._fusion_engine.process_parallel(frame, active)
     
+    async def process_frame_batched(self, frame: np.ndarray) -> FusedDetectionResult:
+        """
+        Process a frame through the continuous batching front-end.
+        
+        Frames arriving within FRAME_BATCH_WINDOW_S of each other (or while
+        the previous batch is still running) share one detect_batch() call
+        per backend, then are fused individually.
+        
+        Entry point for multi-client callers of the manager; the WebSocket
+        stream still drives its own YOLODetector and does not use it yet.
+        """
+        loop = asyncio.get_running_loop()
+        task = self._batch_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._pending = asyncio.Queue()
+            self._batch_task = loop.create_task(self._batch_worker(self._pending))
+        
+        future = loop.create_future()
+        await self._pending.put((frame, future))
+        return await future
+    
+    async def _batch_worker(self, pending: asyncio.Queue) -> None:
+        """Drain queued frames into batches of up to MAX_FRAME_BATCH"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await pending.get()]
+            deadline = loop.time() + FRAME_BATCH_WINDOW_S
+            while len(batch) < MAX_FRAME_BATCH:
+                if not pending.empty():
+                    batch.append(pending.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(pending.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            frames = [frame for frame, _ in batch]
+            try:
+                fused = await self._process_batch(frames)
+            except Exception as e:
+                logger.warning("Batch of %d frames failed", len(batch), exc_info=e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(batch, fused):
+                if not future.done():
+                    future.set_result(result)
+    
+    async def _process_batch(self, frames: list[np.ndarray]) -> list[FusedDetectionResult]:
+        """Run every active backend once over the batch, then fuse per frame"""
+        active = self.get_active_backends()
+        engine = self._fusion_engine
+        
+        # Cascade crops depend on each frame's own YOLO pass
+        if not active or engine.config.strategy == FusionStrategy.CASCADE:
+            return list(await asyncio.gather(
+                *(engine.process_parallel(frame, active) for frame in frames)
+            ))
+        
+        start_time = time.perf_counter()
+        backend_ids = list(active.keys())
+        outputs = await asyncio.gather(
+            *(asyncio.to_thread(d.detect_batch, frames) for d in active.values()),
+            return_exceptions=True,
+        )
+        
+        batch_results: dict[str, list[DetectionResult]] = {}
+        for backend_id, output in zip(backend_ids, outputs):
+            if isinstance(output, Exception):
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning("Backend %s failed on batch", backend_id, exc_info=output)
+                continue
+            batch_results[backend_id] = output
+        
+        # Batch cost is shared evenly across its frames
+        per_frame_ms = (time.perf_counter() - start_time) * 1000 / len(frames)
+        return [
+            await engine.fuse_results(
+                frame,
+                {bid: results[i] for bid, results in batch_results.items()},
+                per_frame_ms,
+            )
+            for i, frame in enumerate(frames)
+        ]
+    
+    async def run_pipeline(
+        self,
+        source: "VideoSource",
+        tracker: "ObjectTracker | None" = None,
+    ) -> AsyncIterator[tuple[np.ndarray, "FusedDetectionResult | TrackingResult"]]:
+        """
+        Stream a video source through capture -> detect -> fuse/track stages.
+        
+        Each stage is its own task, connected by bounded queues, so the
+        backends already work on the next frame while the current one is
+        fused and tracked. Full queues hold back the stage before them.
+        Like process_frame_batched, not yet used by the WebSocket stream.
+        
+        Yields:
+            (frame, result) pairs until the source closes; the result is a
+            TrackingResult when a tracker is given
+        """
+        frames: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        detected: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        out: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        tasks = [
+            asyncio.create_task(self._run_stage(self._capture_stage(source, frames), frames)),
+            asyncio.create_task(self._run_stage(self._detect_stage(frames, detected), detected)),
+            asyncio.create_task(self._run_stage(self._fuse_stage(detected, out, tracker), out)),
+        ]
+        try:
+            while (item := await out.get()) is not None:
+                yield item
+            # End of stream: surface the error that ended it, if any. Stages
+            # upstream of a failed one may be stuck on a full queue, so wait
+            # for the first failure instead of joining the stages in order
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    @staticmethod
+    async def _run_stage(stage: Awaitable[None], out: asyncio.Queue) -> None:
+        """Run a pipeline stage, then signal end of stream downstream"""
+        try:
+            await stage
+        except Exception:
+            await out.put(None)
+            raise
+        await out.put(None)
+    
+    async def _capture_stage(self, source: "VideoSource", out: asyncio.Queue) -> None:
+        while True:
+            ok, frame = await asyncio.to_thread(source.read)
+            if not ok or frame is None:
+                if not source.is_opened():
+                    return
+                await asyncio.sleep(0.01)  # Camera reconnecting
+                continue
+            await out.put(frame)
+    
+    async def _detect_stage(self, inp: asyncio.Queue, out: asyncio.Queue) -> None:
+        engine = self._fusion_engine
+        while (frame := await inp.get()) is not None:
+            active = self.get_active_backends()
+            if engine.config.strategy == FusionStrategy.CASCADE:
+                # Cascade interleaves detection and fusion itself
+                await out.put((frame, await engine.process_parallel(frame, active), None))
+                continue
+            results, total_time = await engine.run_backends(frame, active)
+            await out.put((frame, results, total_time))
+    
+    async def _fuse_stage(
+        self,
+        inp: asyncio.Queue,
+        out: asyncio.Queue,
+        tracker: "ObjectTracker | None",
+    ) -> None:
+        while (item := await inp.get()) is not None:
+            frame, results, total_time = item
+            if total_time is None:
+                fused = results
+            else:
+                fused = await self._fusion_engine.fuse_results(frame, results, total_time)
+            result = tracker.update(fused) if tracker is not None else fused
+            await out.put((frame, result))
+    
     def process_frame_sync(self, frame: np.ndarray) -> FusedDetectionResult:
-        """Synchronous version for compatibility"""
-        return asyncio.run(self.process_frame(frame))
+        """Synchronous version for compatibility (not callable from a running loop)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("process_frame_sync called from a running event loop; await process_frame instead")
+        with self._sync_lock:
+            if self._sync_loop is None or self._sync_loop.is_closed():
+                self._sync_loop = asyncio.new_event_loop()
+            return self._sync_loop.run_until_complete(self.process_frame(frame))
+    
+    def close(self) -> None:
+        """Release the event loop used by process_frame_sync and cached models"""
+        clear_model_cache()
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            self._batch_task = None
+        with self._sync_lock:
+            # Only closed, never run here: close() is called from the app's own loop
+            if self._sync_loop is not None and not self._sync_loop.is_closed():
+                # Also shuts down the loop's default executor (without waiting)
+                self._sync_loop.close()
+            self._sync_loop = None
     
     def get_combined_capabilities(self) -> dict[str, Any]:
         """Get combined capabilities of all active backends"""
-        active = self.get_active_backends()
+        active = [
+            instance for instance in self._backends.values()
+            if instance.enabled
+        ]
         
         if not active:
             return {
@@ -366,7 +733,7 @@ class PipelineManager:
             }
         
         # Aggregate capabilities
-        caps = [d.get_capabilities() for d in active.values()]
+        caps = [instance.capabilities for instance in active]
         
         return {
             "supports_pose": any(c.supports_pose for c in caps),
@@ -374,13 +741,11 @@ class PipelineManager:
             "supports_3d": any(c.supports_3d for c in caps),
             "supports_multi_animal": any(c.supports_multi_animal for c in caps),
             "max_fps": min(c.max_fps for c in caps) if caps else 0,
-            "supported_targets": list(set(
-                t.value for c in caps for t in c.supported_targets
-            )),
+            "supported_targets": list(frozenset().union(*(c.target_values for c in caps))),
             "backends_count": len(active),
             "backends": [
-                {"id": bid, "type": self._backends[bid].backend_type.value}
-                for bid in active.keys()
+                {"id": instance.backend_id, "type": instance.backend_type.value}
+                for instance in active
             ],
         }
     
@@ -0,0 +1,372 @@
+"""
+TensorRT engine helper for Argos Pro.
+Builds, caches and runs serialized TensorRT engines for pose backends.
+
+Note: TensorRT is optional. Install with: pip install tensorrt pycuda
+Uses the name-based tensor API (TensorRT 8.5+, including 10.x).
+"""
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+import numpy as np
+
+try:
+    import tensorrt as trt
+    import pycuda.driver as cuda
+    _HAS_TRT = True
+except ImportError:
+    trt = None
+    cuda = None
+    _HAS_TRT = False
+
+
+WORKSPACE_BYTES = 1 << 30
+
+# Engine precisions; "fp32" means no engine at all (framework reference path)
+PRECISIONS = ("fp32", "fp16", "int8")
+
+# Batches in flight at once: one uploading/computing while the next is prepared
+PIPELINE_DEPTH = 2
+
+# Device 0 primary context (the one PyTorch uses), retained on first use
+_context = None
+_context_lock = threading.Lock()
+
+
+def tensorrt_available() -> bool:
+    """Check if TensorRT and pycuda are installed"""
+    return _HAS_TRT
+
+
+def _shared_context():
+    """Retain the primary CUDA context lazily instead of at import time"""
+    global _context
+    with _context_lock:
+        if _context is None:
+            cuda.init()
+            _context = cuda.Device(0).retain_primary_context()
+    return _context
+
+
+@lru_cache(maxsize=1)
+def engine_tag() -> str:
+    """
+    TensorRT release and GPU an engine is built for.
+
+    Serialized engines only load on the release and GPU that built them,
+    so cached engine filenames carry this tag and upgrades trigger a rebuild.
+    """
+    try:
+        import tensorrt
+        version = tensorrt.__version__
+    except ImportError:
+        version = "none"
+
+    import torch
+    if torch.cuda.is_available():
+        name = re.sub(r"[^a-z0-9]+", "-", torch.cuda.get_device_name(0).lower()).strip("-")
+        major, minor = torch.cuda.get_device_capability(0)
+        gpu = f"{name}-sm{major}{minor}"
+    else:
+        gpu = "cpu"
+    return f"trt{version}_{gpu}"
+
+
+@contextmanager
+def _cuda_context() -> Iterator[None]:
+    """Make the shared CUDA context current on the calling (worker) thread"""
+    _shared_context().push()
+    try:
+        yield
+    finally:
+        cuda.Context.pop()
+
+
+def export_onnx(
+    model,
+    onnx_path: Path,
+    input_shape: tuple[int, int, int, int],
+) -> Path:
+    """
+    Export a PyTorch module to ONNX with a dynamic batch axis.
+
+    Args:
+        model: torch.nn.Module in eval mode
+        onnx_path: Destination .onnx file
+        input_shape: NCHW shape of the dummy input
+    """
+    import torch
+
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    device = next(model.parameters()).device
+    dummy_input = torch.zeros(input_shape, device=device)
+
+    torch.onnx.export(
+        model,
+        dummy_input,
+        str(onnx_path),
+        opset_version=17,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {0: "B"}, "output": {0: "B"}},
+    )
+    return onnx_path
+
+
+if _HAS_TRT:
+    class EntropyCalibrator(trt.IInt8EntropyCalibrator2):
+        """
+        Feeds preprocessed NCHW batches to TensorRT's INT8 entropy
+        calibration and persists the resulting scale cache.
+        """
+
+        def __init__(self, batches: Sequence[np.ndarray], cache_path: Path):
+            trt.IInt8EntropyCalibrator2.__init__(self)
+            self._batches = [np.ascontiguousarray(b, dtype=np.float32) for b in batches]
+            self._next = 0
+            self._cache_path = cache_path
+            self._batch_size = self._batches[0].shape[0] if self._batches else 1
+            self._d_input = cuda.mem_alloc(self._batches[0].nbytes) if self._batches else None
+
+        def get_batch_size(self) -> int:
+            return self._batch_size
+
+        def get_batch(self, names):
+            if self._next >= len(self._batches):
+                return None
+            cuda.memcpy_htod(self._d_input, self._batches[self._next])
+            self._next += 1
+            return [int(self._d_input)]
+
+        def read_calibration_cache(self):
+            if self._cache_path.exists():
+                return self._cache_path.read_bytes()
+            return None
+
+        def write_calibration_cache(self, cache) -> None:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self._cache_path.write_bytes(bytes(cache))
+
+
+@dataclass
+class PipelineSlot:
+    """
+    One in-flight batch: its own execution context, pinned host buffers,
+    device buffers and the events ordering its copy-in/compute/copy-out.
+    """
+    context: Any
+    host_input: np.ndarray
+    host_output: np.ndarray
+    d_input: Any
+    d_output: Any
+    uploaded: Any  # cuda.Event
+    computed: Any  # cuda.Event
+    done: Any  # cuda.Event
+    batch_size: int = 0
+
+
+class TensorRTEngine:
+    """
+    Serialized TensorRT engine with a single input and a single output.
+
+    Work is split over three CUDA streams (copy-in, compute, copy-out)
+    chained with events, and PIPELINE_DEPTH slots of reusable pinned and
+    device buffers. While one batch computes, the next can be
+    preprocessed and uploaded:
+
+        slot = engine.acquire()
+        ... fill slot.host_input[:n] ...
+        engine.enqueue(slot, n)
+        output = engine.wait(slot)
+        ... read output ...
+        engine.release(slot)
+    """
+
+    def __init__(self, engine_path: Path, max_batch: int):
+        if not _HAS_TRT:
+            raise RuntimeError("TensorRT not installed. Run: pip install tensorrt pycuda")
+
+        self.engine_path = engine_path
+        self.max_batch = max_batch
+
+        with _cuda_context():
+            self._runtime = trt.Runtime(trt.Logger(trt.Logger.WARNING))
+            self._engine = self._runtime.deserialize_cuda_engine(engine_path.read_bytes())
+
+            names = [self._engine.get_tensor_name(i) for i in range(self._engine.num_io_tensors)]
+            self._input_name = next(
+                n for n in names if self._engine.get_tensor_mode(n) == trt.TensorIOMode.INPUT
+            )
+            self._output_name = next(
+                n for n in names if self._engine.get_tensor_mode(n) == trt.TensorIOMode.OUTPUT
+            )
+            # Leading axis is the dynamic batch
+            self.input_shape = tuple(self._engine.get_tensor_shape(self._input_name))[1:]
+            self.output_shape = tuple(self._engine.get_tensor_shape(self._output_name))[1:]
+
+            self._copy_in = cuda.Stream()
+            self._compute = cuda.Stream()
+            self._copy_out = cuda.Stream()
+
+            self._free: queue.Queue[PipelineSlot] = queue.Queue()
+            for _ in range(PIPELINE_DEPTH):
+                self._free.put(self._create_slot())
+
+    def _create_slot(self) -> PipelineSlot:
+        # Pinned host memory makes the async copies truly asynchronous
+        host_input = cuda.pagelocked_empty((self.max_batch, *self.input_shape), np.float32)
+        host_output = cuda.pagelocked_empty((self.max_batch, *self.output_shape), np.float32)
+        d_input = cuda.mem_alloc(host_input.nbytes)
+        d_output = cuda.mem_alloc(host_output.nbytes)
+        # Device buffers never move, so tensor addresses are bound once per slot
+        context = self._engine.create_execution_context()
+        context.set_tensor_address(self._input_name, int(d_input))
+        context.set_tensor_address(self._output_name, int(d_output))
+        return PipelineSlot(
+            context=context,
+            host_input=host_input,
+            host_output=host_output,
+            d_input=d_input,
+            d_output=d_output,
+            uploaded=cuda.Event(),
+            computed=cuda.Event(),
+            done=cuda.Event(),
+        )
+
+    def acquire(self) -> PipelineSlot:
+        """Take a free slot, blocking while PIPELINE_DEPTH batches are in flight"""
+        return self._free.get()
+
+    def release(self, slot: PipelineSlot) -> None:
+        """Return a slot once its output has been consumed"""
+        self._free.put(slot)
+
+    def enqueue(self, slot: PipelineSlot, n: int) -> None:
+        """Queue upload, inference and download of slot.host_input[:n]"""
+        if n > self.max_batch:
+            raise ValueError(f"Batch of {n} exceeds engine max_batch {self.max_batch}")
+
+        slot.batch_size = n
+        with _cuda_context():
+            slot.context.set_input_shape(self._input_name, (n, *self.input_shape))
+
+            cuda.memcpy_htod_async(slot.d_input, slot.host_input[:n], self._copy_in)
+            slot.uploaded.record(self._copy_in)
+
+            self._compute.wait_for_event(slot.uploaded)
+            slot.context.execute_async_v3(self._compute.handle)
+            slot.computed.record(self._compute)
+
+            self._copy_out.wait_for_event(slot.computed)
+            cuda.memcpy_dtoh_async(slot.host_output[:n], slot.d_output, self._copy_out)
+            slot.done.record(self._copy_out)
+
+    def wait(self, slot: PipelineSlot) -> np.ndarray:
+        """
+        Block until the slot's batch is downloaded.
+
+        Returns:
+            View of shape (n, *output_shape), valid until the slot is released
+        """
+        with _cuda_context():
+            slot.done.synchronize()
+        return slot.host_output[:slot.batch_size]
+
+    @classmethod
+    def build(
+        cls,
+        onnx_path: Path,
+        engine_path: Path,
+        max_batch: int,
+        precision: str = "fp16",
+        calibration_batches: Sequence[np.ndarray] | None = None,
+        calibration_cache: Path | None = None,
+    ) -> "TensorRTEngine":
+        """
+        Build an engine from ONNX, or load it if it was built before.
+
+        Args:
+            onnx_path: Source ONNX model
+            engine_path: Where the serialized engine is cached
+            max_batch: Largest batch the engine must accept
+            precision: "fp16" or "int8"
+            calibration_batches: Preprocessed NCHW batches for INT8 calibration
+            calibration_cache: Where INT8 scales are cached between builds
+        """
+        if not _HAS_TRT:
+            raise RuntimeError("TensorRT not installed. Run: pip install tensorrt pycuda")
+        if precision not in ("fp16", "int8"):
+            raise ValueError(f"Unsupported TensorRT precision: {precision}")
+
+        if not engine_path.exists():
+            logger = trt.Logger(trt.Logger.WARNING)
+            builder = trt.Builder(logger)
+            # Explicit batch is the only mode (and the flag is deprecated) from TensorRT 10
+            explicit = int(trt.__version__.split(".")[0]) < 10
+            network = builder.create_network(
+                1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH) if explicit else 0
+            )
+            parser = trt.OnnxParser(network, logger)
+
+            if not parser.parse(onnx_path.read_bytes()):
+                errors = [str(parser.get_error(i)) for i in range(parser.num_errors)]
+                raise RuntimeError(f"ONNX parse failed: {errors}")
+
+            config = builder.create_builder_config()
+            config.set_memory_pool_limit(trt.MemoryPoolType.WORKSPACE, WORKSPACE_BYTES)
+            # FP16 stays enabled under INT8 so layers without INT8 kernels fall back to half
+            if builder.platform_has_fast_fp16:
+                config.set_flag(trt.BuilderFlag.FP16)
+
+            # Dynamic batch axis: optimize for the largest batch we send
+            input_tensor = network.get_input(0)
+            chw = tuple(input_tensor.shape)[1:]
+            profile = builder.create_optimization_profile()
+            profile.set_shape(input_tensor.name, (1, *chw), (max_batch, *chw), (max_batch, *chw))
+            config.add_optimization_profile(profile)
+
+            if precision == "int8":
+                cache_path = calibration_cache or onnx_path.with_suffix(".calibration.cache")
+                if not calibration_batches and not cache_path.exists():
+                    raise RuntimeError("INT8 build needs calibration frames or a calibration cache")
+                config.set_flag(trt.BuilderFlag.INT8)
+                with _cuda_context():  # The calibrator allocates its device buffer up front
+                    calibrator = EntropyCalibrator(calibration_batches or [], cache_path)
+                config.int8_calibrator = calibrator
+
+                # Calibration runs at the calibrator's batch size, not max_batch
+                calib_shape = (calibrator.get_batch_size(), *chw)
+                calib_profile = builder.create_optimization_profile()
+                calib_profile.set_shape(input_tensor.name, calib_shape, calib_shape, calib_shape)
+                config.set_calibration_profile(calib_profile)
+
+            with _cuda_context():  # Calibration allocates device memory
+                serialized = builder.build_serialized_network(network, config)
+            if serialized is None:
+                raise RuntimeError("TensorRT engine build failed")
+
+            engine_path.parent.mkdir(parents=True, exist_ok=True)
+            engine_path.write_bytes(bytes(serialized))
+
+        return cls(engine_path, max_batch)
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run the engine on a float32 NCHW batch without pipelining.
+
+        Returns:
+            Output array of shape (N, *output_shape)
+        """
+        slot = self.acquire()
+        try:
+            np.copyto(slot.host_input[:batch.shape[0]], batch)
+            self.enqueue(slot, batch.shape[0])
+            return self.wait(slot).copy()
+        finally:
+            self.release(slot)
@@ -2,15 +2,32 @@
 ByteTrack Object Tracker using Supervision library.
 Provides persistent IDs for detected objects across frames.
 """
+import json
+import time
 import numpy as np
 import supervision as sv
-from dataclasses import dataclass
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
 from typing import Any
 
-from app.detection.yolo_detector import Detection, DetectionResult, Keypoint
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    _HAS_ORJSON = False
 
+from app.detection.yolo_detector import Detection, DetectionBatch, DetectionResult, Keypoint
 
-@dataclass
+
+LOST_TRACK_BUFFER = 30  # Frames antes de perder track
+FRAME_RATE = 30
+# Un ID sin verse durante más tiempo que el buffer de ByteTrack ya está perdido
+TRACK_TTL_S = LOST_TRACK_BUFFER / FRAME_RATE
+MAX_ID_HISTORY = 1024
+
+
+@dataclass(slots=True)
 class TrackedObject:
     """Representa un objeto con tracking persistente"""
     tracker_id: int
@@ -39,7 +56,7 @@ class TrackedObject:
         return result
 
 
-@dataclass
+@dataclass(slots=True)
 class TrackingResult:
     """Resultado de detección con tracking"""
     objects: list[TrackedObject]
@@ -47,13 +64,53 @@ class TrackingResult:
     frame_width: int
     frame_height: int
     timestamp: float
+    # Columnas int32 de los objetos (N, 4) y (N, 2), para serializar sin dicts
+    bbox_array: np.ndarray | None = field(default=None, repr=False, compare=False)
+    center_array: np.ndarray | None = field(default=None, repr=False, compare=False)
+    
+    def _counts(self) -> dict[str, int]:
+        return dict(Counter(obj.class_name_es for obj in self.objects))
+    
+    def to_json_bytes(self) -> bytes:
+        """
+        Serializa el resultado en formato columnar (una lista por campo).
+        Usa orjson con arrays NumPy directos si está instalado.
+        """
+        objects = self.objects
+        bboxes = self.bbox_array
+        centers = self.center_array
+        if bboxes is None:
+            bboxes = np.array([o.bbox for o in objects], dtype=np.int32).reshape(-1, 4)
+        if centers is None:
+            centers = np.array([o.center for o in objects], dtype=np.int32).reshape(-1, 2)
+        
+        payload = {
+            "objects_bbox": bboxes,
+            "objects_center": centers,
+            "tracker_ids": [o.tracker_id for o in objects],
+            "class_ids": [o.class_id for o in objects],
+            "class_names": [o.class_name for o in objects],
+            "class_names_es": [o.class_name_es for o in objects],
+            "confidences": [round(o.confidence, 3) for o in objects],
+            "keypoints": [
+                [kp.to_dict() for kp in o.keypoints] if o.keypoints else None
+                for o in objects
+            ],
+            "counts": self._counts(),
+            "total_objects": len(objects),
+            "inference_time_ms": round(self.inference_time_ms, 2),
+            "frame_size": {"width": self.frame_width, "height": self.frame_height},
+            "timestamp": self.timestamp,
+        }
+        if _HAS_ORJSON:
+            return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+        payload["objects_bbox"] = bboxes.tolist()
+        payload["objects_center"] = centers.tolist()
+        return json.dumps(payload).encode()
     
     def to_dict(self) -> dict[str, Any]:
         # Contar objetos por clase
-        counts: dict[str, int] = {}
-        for obj in self.objects:
-            key = obj.class_name_es
-            counts[key] = counts.get(key, 0) + 1
+        counts = self._counts()
         
         # Tracking IDs activos
         active_ids = [obj.tracker_id for obj in self.objects]
@@ -78,20 +135,33 @@ class ObjectTracker:
     def __init__(self):
         self.byte_tracker = sv.ByteTrack(
             track_activation_threshold=0.25,
-            lost_track_buffer=30,  # Frames antes de perder track
+            lost_track_buffer=LOST_TRACK_BUFFER,
             minimum_matching_threshold=0.8,
-            frame_rate=30,
+            frame_rate=FRAME_RATE,
         )
-        self._id_history: dict[int, dict] = {}  # Historial de IDs
+        # Historial de IDs, del visto hace más tiempo al más reciente
+        self._id_history: OrderedDict[int, dict] = OrderedDict()
+        # Buffers reutilizables por frame (crecen a la siguiente potencia de 2)
+        self._grow_buffers(64)
+    
+    def _grow_buffers(self, n: int) -> None:
+        capacity = 1 << (n - 1).bit_length()
+        self._xyxy_buf = np.empty((capacity, 4), dtype=np.float32)
+        self._conf_buf = np.empty(capacity, dtype=np.float32)
+        self._class_buf = np.empty(capacity, dtype=np.int32)
+        self._index = np.arange(capacity, dtype=np.int32)
     
     def reset(self) -> None:
         """Resetea el tracker"""
-        self.byte_tracker = sv.ByteTrack(
-            track_activation_threshold=0.25,
-            lost_track_buffer=30,
-            minimum_matching_threshold=0.8,
-            frame_rate=30,
-        )
+        # Reutiliza la instancia de ByteTrack en vez de crear otra
+        tracker = self.byte_tracker
+        if hasattr(tracker, "reset"):
+            tracker.reset()
+        else:
+            tracker.tracked_tracks = []
+            tracker.lost_tracks = []
+            tracker.removed_tracks = []
+            tracker.frame_id = 0
         self._id_history.clear()
     
     def update(self, detection_result: DetectionResult) -> TrackingResult:
@@ -113,15 +183,31 @@ class ObjectTracker:
                 timestamp=detection_result.timestamp,
             )
         
-        # Convertir detecciones a formato Supervision
-        xyxy = np.array([d.bbox for d in detection_result.detections])
-        confidence = np.array([d.confidence for d in detection_result.detections])
-        class_id = np.array([d.class_id for d in detection_result.detections])
+        # Convertir detecciones a formato Supervision en una sola pasada,
+        # con columnas contiguas ya en float32/int32 (sin copias extra)
+        n = len(detection_result.detections)
+        if n > len(self._xyxy_buf):
+            self._grow_buffers(n)
+        xyxy = self._xyxy_buf[:n]
+        confidence = self._conf_buf[:n]
+        class_id = self._class_buf[:n]
+        detections = detection_result.detections
+        if isinstance(detections, DetectionBatch):
+            xyxy[:] = detections.xyxy
+            confidence[:] = detections.confidence
+            class_id[:] = detections.class_id
+        else:
+            for i, d in enumerate(detections):
+                xyxy[i] = d.bbox
+                confidence[i] = d.confidence
+                class_id[i] = d.class_id
         
         sv_detections = sv.Detections(
             xyxy=xyxy,
             confidence=confidence,
             class_id=class_id,
+            # Índice de la detección original; ByteTrack lo conserva por fila
+            data={"orig_idx": self._index[:n]},
         )
         
         # Aplicar ByteTrack
@@ -129,37 +215,55 @@ class ObjectTracker:
         
         # Construir objetos trackeados
         tracked_objects: list[TrackedObject] = []
+        orig_idx = tracked_detections.data.get("orig_idx")
         
-        for i in range(len(tracked_detections)):
-            x1, y1, x2, y2 = map(int, tracked_detections.xyxy[i])
-            tracker_id = int(tracked_detections.tracker_id[i]) if tracked_detections.tracker_id is not None else -1
-            cls_id = int(tracked_detections.class_id[i]) if tracked_detections.class_id is not None else 0
-            conf = float(tracked_detections.confidence[i]) if tracked_detections.confidence is not None else 0.0
-            
-            # Encontrar detección original para obtener nombres y keypoints
-            original_det = next(
-                (d for d in detection_result.detections if d.class_id == cls_id),
-                detection_result.detections[0] if detection_result.detections else None
-            )
-            
-            class_name = original_det.class_name if original_det else f"class_{cls_id}"
-            class_name_es = original_det.class_name_es if original_det else class_name
-            keypoints = original_det.keypoints if original_det else None
-            
-            # Calcular puntos de referencia
-            center = ((x1 + x2) // 2, (y1 + y2) // 2)
-            bottom_center = ((x1 + x2) // 2, y2)  # Punto inferior (pies/patas)
+        n_tracked = len(tracked_detections)
+        
+        # Puntos de referencia para todas las filas en una pasada vectorizada
+        xyxy = tracked_detections.xyxy.astype(np.int32)
+        centers = (xyxy[:, :2] + xyxy[:, 2:]) >> 1
+        
+        boxes = xyxy.tolist()
+        centers_x = centers[:, 0].tolist()
+        centers_y = centers[:, 1].tolist()
+        tracker_ids = tracked_detections.tracker_id.tolist() if tracked_detections.tracker_id is not None else [-1] * n_tracked
+        class_ids = tracked_detections.class_id.tolist() if tracked_detections.class_id is not None else [0] * n_tracked
+        confidences = tracked_detections.confidence.tolist() if tracked_detections.confidence is not None else [0.0] * n_tracked
+        
+        # Nombres y keypoints de la detección original de cada fila, resueltos de una vez
+        if orig_idx is not None and isinstance(detections, DetectionBatch):
+            # Columnas: sin construir objetos Detection (YOLO no trae keypoints aquí)
+            class_names, class_names_es = detections.class_names(orig_idx.tolist())
+            keypoints_rows = [None] * n_tracked
+        else:
+            if orig_idx is not None:
+                originals = [detections[j] for j in orig_idx.tolist()]
+            else:
+                # Sin índice por fila, la mejor pista es la primera detección de la clase
+                by_class: dict[int, Detection] = {}
+                for d in detections:
+                    by_class.setdefault(d.class_id, d)
+                originals = [by_class.get(cls_id) for cls_id in class_ids]
+            class_names = [d.class_name if d else f"class_{c}" for d, c in zip(originals, class_ids)]
+            class_names_es = [d.class_name_es if d else name for d, name in zip(originals, class_names)]
+            keypoints_rows = [d.keypoints if d else None for d in originals]
+        
+        for i in range(n_tracked):
+            x1, y1, x2, y2 = boxes[i]
+            tracker_id = tracker_ids[i]
+            cls_id = class_ids[i]
+            class_name_es = class_names_es[i]
             
             tracked_objects.append(TrackedObject(
                 tracker_id=tracker_id,
                 class_id=cls_id,
-                class_name=class_name,
+                class_name=class_names[i],
                 class_name_es=class_name_es,
-                confidence=conf,
+                confidence=confidences[i],
                 bbox=(x1, y1, x2, y2),
-                center=center,
-                bottom_center=bottom_center,
-                keypoints=keypoints,
+                center=(centers_x[i], centers_y[i]),
+                bottom_center=(centers_x[i], y2),  # Punto inferior (pies/patas)
+                keypoints=keypoints_rows[i],
             ))
             
             # Guardar en historial
@@ -167,6 +271,9 @@ class ObjectTracker:
                 "class": class_name_es,
                 "last_seen": detection_result.timestamp,
             }
+            self._id_history.move_to_end(tracker_id)
+        
+        self._prune_history(detection_result.timestamp)
         
         return TrackingResult(
             objects=tracked_objects,
@@ -174,8 +281,23 @@ class ObjectTracker:
             frame_width=detection_result.frame_width,
             frame_height=detection_result.frame_height,
             timestamp=detection_result.timestamp,
+            bbox_array=xyxy,
+            center_array=centers,
         )
     
+    def _prune_history(self, now: float) -> None:
+        """Descarta IDs perdidos y limita el tamaño del historial"""
+        history = self._id_history
+        while history and (
+            len(history) > MAX_ID_HISTORY
+            or now - next(iter(history.values()))["last_seen"] >= TRACK_TTL_S
+        ):
+            history.popitem(last=False)
+    
     def get_active_ids(self) -> list[int]:
-        """Retorna lista de IDs activos"""
-        return list(self._id_history.keys())
+        """Retorna lista de IDs vistos dentro del buffer de ByteTrack"""
+        now = time.time()
+        return [
+            tid for tid, info in self._id_history.items()
+            if now - info["last_seen"] < TRACK_TTL_S
+        ]
@@ -4,24 +4,35 @@ Maneja carga del modelo, inferencia y postprocesamiento de detecciones.
 Refactored to implement BaseDetector interface for multi-backend support.
 """
 import cv2
+import importlib.util
 import numpy as np
+import shutil
+import threading
+from pathlib import Path
 from ultralytics import YOLO
 from dataclasses import dataclass, field
 from typing import Any
 import time
+import torch
+import torch.nn.functional as F
 
-from app.config import DetectionConfig, COCO_CLASSES_ES, ModelSize, ModelType, PoseModelSize
+from app.config import DetectionConfig, COCO_CLASSES_ES, ENGINE_DIR, ModelSize, ModelType, PoseModelSize
 from .base_detector import (
     BaseDetector,
     BackendCapabilities,
     BackendType,
     TargetType,
     Detection as BaseDetection,
+    DetectionBatch,
     DetectionResult as BaseDetectionResult,
     Keypoint as BaseKeypoint,
 )
 
 
+# Lote máximo que aceptan los motores TensorRT exportados (batch dinámico)
+YOLO_MAX_BATCH = 8
+
+
 # Conexiones del esqueleto COCO para pose estimation (17 keypoints)
 # Índices: 0=nariz, 1=ojo_izq, 2=ojo_der, 3=oreja_izq, 4=oreja_der,
 #          5=hombro_izq, 6=hombro_der, 7=codo_izq, 8=codo_der,
@@ -40,6 +51,135 @@ KEYPOINT_NAMES = [
     "muñeca_izq", "muñeca_der", "cadera_izq", "cadera_der",
     "rodilla_izq", "rodilla_der", "tobillo_izq", "tobillo_der"
 ]
+_KEYPOINT_NAMES = tuple(KEYPOINT_NAMES)
+MIN_KEYPOINT_CONFIDENCE = 0.3
+
+# Labels distintos cuyo tamaño de texto se memoriza (clase x % de confianza)
+TEXT_SIZE_CACHE_SIZE = 1024
+
+
+def _tensorrt_export_available() -> bool:
+    """Ultralytics solo puede exportar motores con TensorRT y una GPU CUDA"""
+    if importlib.util.find_spec("tensorrt") is None:
+        return False
+    return torch.cuda.is_available()
+
+
+# Detector calentado al arrancar; lo recibe la primera sesión (take_warm_detector)
+_warm_detector: "YOLODetector | None" = None
+_warm_lock = threading.Lock()
+
+
+def warmup_models(config: DetectionConfig) -> None:
+    """
+    Carga y calienta los modelos configurados una vez al arrancar el servidor,
+    para que la primera conexión no pague la inicialización de CUDA ni la
+    descarga/lectura de pesos.
+    """
+    global _warm_detector
+    if config.warmup_iters <= 0:
+        return
+    try:
+        detector = YOLODetector(config)
+        detector.load_model()
+        if config.pose_enabled:
+            detector.load_pose_model()
+    except Exception as e:
+        print(f"⚠️ No se pudieron precalentar los modelos: {e}")
+        return
+    with _warm_lock:
+        _warm_detector = detector
+
+
+def take_warm_detector(config: DetectionConfig) -> "YOLODetector":
+    """
+    Entrega el detector precalentado (una sola vez) o, si no hay, uno nuevo
+    con el modelo de detección cargado. Si el config cambió desde el arranque
+    solo se recargan los pesos afectados.
+    """
+    global _warm_detector
+    with _warm_lock:
+        detector, _warm_detector = _warm_detector, None
+    if detector is None:
+        detector = YOLODetector(config)
+        detector.load_model()
+    elif detector.config != config:
+        detector.update_config(config)
+    return detector
+
+
+# Gris de relleno del letterbox de Ultralytics
+LETTERBOX_FILL = 114
+
+# Stride máximo de YOLO11: la entrada debe ser múltiplo para que cuadren las grillas
+MODEL_STRIDE = 32
+
+
+class _FrameUploader:
+    """
+    Sube lotes de frames BGR uint8 a la GPU y los deja listos para el modelo.
+    
+    Los frames se copian a un buffer pinned reutilizable y se suben con
+    non_blocking en un stream propio, que el stream de cómputo espera con
+    wait_stream; BGR→RGB, HWC→CHW, normalización y letterbox se hacen
+    después en la GPU. Fuera de CUDA el mismo camino corre sin pinning.
+    """
+    
+    def __init__(self, device: str, half: bool, imgsz: int):
+        self.device = torch.device(device)
+        self.half = half
+        # Ultralytics redondea imgsz hacia arriba al stride; sin esto el tensor no encaja
+        self.imgsz = -(-imgsz // MODEL_STRIDE) * MODEL_STRIDE
+        self._cuda = self.device.type == "cuda"
+        self._stream = torch.cuda.Stream(device=self.device) if self._cuda else None
+        self._host: torch.Tensor | None = None
+    
+    def _host_buffer(self, shape: tuple[int, ...]) -> torch.Tensor:
+        """Buffer de subida, realocado solo si crece el lote o cambia la resolución"""
+        host = self._host
+        if host is None or host.shape[1:] != shape[1:] or host.shape[0] < shape[0]:
+            host = torch.empty(shape, dtype=torch.uint8, pin_memory=self._cuda)
+            self._host = host
+        return host[:shape[0]]
+    
+    def upload(self, frames: list[np.ndarray]) -> tuple[torch.Tensor, tuple[float, int, int]]:
+        """
+        Returns:
+            Tensor (N, 3, imgsz, imgsz) en [0, 1] y el letterbox (escala, pad_x, pad_y)
+            para llevar las cajas de vuelta a coordenadas del frame
+        """
+        h, w = frames[0].shape[:2]
+        host = self._host_buffer((len(frames), h, w, 3))
+        host_np = host.numpy()
+        for i, frame in enumerate(frames):
+            np.copyto(host_np[i], frame)
+        
+        if self._cuda:
+            with torch.cuda.stream(self._stream):
+                batch = host.to(self.device, non_blocking=True)
+            torch.cuda.current_stream(self.device).wait_stream(self._stream)
+            # El buffer pinned sigue en uso hasta que termine la copia
+            batch.record_stream(torch.cuda.current_stream(self.device))
+        else:
+            batch = host.clone()
+        
+        x = batch.permute(0, 3, 1, 2).flip(1)  # BGR HWC → RGB CHW
+        x = x.half() if self.half else x.float()
+        x.mul_(1 / 255)
+        
+        # Letterbox: escalar conservando aspecto y centrar con relleno gris
+        r = min(self.imgsz / h, self.imgsz / w)
+        new_h, new_w = round(h * r), round(w * r)
+        if (new_h, new_w) != (h, w):
+            x = F.interpolate(x, size=(new_h, new_w), mode="bilinear", align_corners=False)
+        pad_x = (self.imgsz - new_w) // 2
+        pad_y = (self.imgsz - new_h) // 2
+        x = F.pad(
+            x,
+            (pad_x, self.imgsz - new_w - pad_x, pad_y, self.imgsz - new_h - pad_y),
+            value=LETTERBOX_FILL / 255,
+        )
+        return x.contiguous(), (r, pad_x, pad_y)
 
 
 # Legacy type aliases for backward compatibility
@@ -64,6 +204,37 @@ class YOLODetector(BaseDetector):
         self.pose_model: YOLO | None = None
         self._model_loaded: str | None = None
         self._pose_model_loaded: str | None = None
+        # FP16 solo en GPU; en CPU la media precisión es más lenta
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.half = self.device == "cuda"
+        self._apply_draw_style()
+        self._apply_counting_region()
+        self._uploader: _FrameUploader | None = None
+    
+    def _apply_draw_style(self) -> None:
+        """Precalcula color, escala y grosor de dibujo a partir del config"""
+        color_hex = self.config.box_color.lstrip('#')
+        self.color_bgr = tuple(int(color_hex[i:i+2], 16) for i in (4, 2, 0))
+        self.font_scale = self.config.font_size / 32
+        self.thickness = max(1, self.config.font_size // 8)
+        self._text_size_cache: dict[str, tuple[int, int]] = {}
+    
+    def _apply_counting_region(self) -> None:
+        """Precalcula los límites (x1, y1, x2, y2) de la región de conteo"""
+        r = self.config.counting_region
+        self._region_bounds = (r.x, r.y, r.x + r.width, r.y + r.height) if r else None
+    
+    def text_size(self, label: str) -> tuple[int, int]:
+        """(ancho, alto) del label con la fuente actual, memorizado por string"""
+        size = self._text_size_cache.get(label)
+        if size is None:
+            if len(self._text_size_cache) >= TEXT_SIZE_CACHE_SIZE:
+                self._text_size_cache.clear()
+            size, _ = cv2.getTextSize(
+                label, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.thickness
+            )
+            self._text_size_cache[label] = size
+        return size
     
     def get_capabilities(self) -> BackendCapabilities:
         """Return YOLO backend capabilities"""
@@ -101,8 +272,10 @@ class YOLODetector(BaseDetector):
             return
             
         print(f"🔄 Cargando modelo de detección {resolved_name}...")
-        self.model = YOLO(resolved_name)
+        self.model = YOLO(self._resolve_weights(resolved_name))
         self._model_loaded = resolved_name
+        self._compile(self.model)
+        self.warmup(self.model)
         print(f"✅ Modelo de detección {resolved_name} cargado correctamente")
     
     def load_pose_model(self, pose_model_size: PoseModelSize | None = None) -> None:
@@ -114,24 +287,112 @@ class YOLODetector(BaseDetector):
             return
             
         print(f"🔄 Cargando modelo de pose {model_name}...")
-        self.pose_model = YOLO(model_name)
+        self.pose_model = YOLO(self._resolve_weights(model_name))
         self._pose_model_loaded = model_name
+        self._compile(self.pose_model)
+        self.warmup(self.pose_model)
         print(f"✅ Modelo de pose {model_name} cargado correctamente")
+    
+    def _compile(self, model: YOLO) -> None:
+        """
+        Compila la red con torch.compile(mode="reduce-overhead") si está habilitado.
+        Las formas de entrada quedan fijas (imgsz y la resolución de la cámara no
+        cambian entre frames), así que CUDA graphs y la fusión de kernels se
+        especializan una vez; el calentamiento posterior paga la compilación.
+        """
+        if not self.config.torch_compile or self.device != "cuda" or not hasattr(torch, "compile"):
+            return
+        # Los motores TensorRT no tienen grafo PyTorch que compilar
+        if not isinstance(model.model, torch.nn.Module):
+            return
+        try:
+            model.model = torch.compile(model.model, mode="reduce-overhead", fullgraph=False)
+        except Exception as e:
+            print(f"⚠️ torch.compile no disponible, usando modo eager: {e}")
+    
+    @torch.inference_mode()
+    def warmup(self, model: YOLO) -> None:
+        """
+        Ejecuta inferencias de prueba tras cargar un modelo.
+        Inicializa CUDA, autotunea cuDNN y prepara el motor para que el primer
+        frame real tenga la latencia normal.
+        """
+        iters = self.config.warmup_iters
+        if iters <= 0:
+            return
+        
+        dummy = np.zeros((self.config.imgsz, self.config.imgsz, 3), dtype=np.uint8)
+        try:
+            for _ in range(iters):
+                model(dummy, imgsz=self.config.imgsz, device=self.device, half=self.half, verbose=False)
+        except Exception as e:
+            print(f"⚠️ Calentamiento del modelo falló: {e}")
+    
+    def _engine_path(self, model_name: str) -> Path:
+        """Ruta del motor cacheado, por (modelo, imgsz, batch, precisión, TensorRT y GPU)"""
+        # Import diferido: tensorrt_engine solo hace falta con use_tensorrt
+        from .tensorrt_engine import engine_tag
+        
+        stem = Path(model_name).stem
+        return ENGINE_DIR / f"{stem}_{self.config.imgsz}_b{YOLO_MAX_BATCH}_fp16.{engine_tag()}.engine"
+    
+    def _resolve_weights(self, model_name: str) -> str:
+        """
+        Devuelve el archivo de pesos a cargar.
+        Con use_tensorrt exporta una vez a un motor TensorRT FP16 y lo reutiliza;
+        sin GPU/TensorRT o si la exportación falla, usa los pesos .pt.
+        """
+        if not self.config.use_tensorrt or model_name.endswith(".engine"):
+            return model_name
+        
+        engine_path = self._engine_path(model_name)
+        if engine_path.exists():
+            return str(engine_path)
+        
+        if not _tensorrt_export_available():
+            print("⚠️ TensorRT/CUDA no disponible, usando pesos PyTorch")
+            return model_name
+        
+        try:
+            print(f"🔧 Exportando {model_name} a TensorRT FP16 (solo la primera vez)...")
+            exported = YOLO(model_name).export(
+                format="engine",
+                half=True,
+                dynamic=True,
+                batch=YOLO_MAX_BATCH,
+                imgsz=self.config.imgsz,
+                verbose=False,
+            )
+            engine_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(exported), engine_path)
+            return str(engine_path)
+        except Exception as e:
+            print(f"⚠️ Exportación TensorRT falló, usando pesos PyTorch: {e}")
+            return model_name
         
     def update_config(self, config: DetectionConfig) -> None:
         """Actualiza la configuración del detector"""
         old_model = self.config.model_size
         old_pose_model = self.config.pose_model_size
         old_pose_enabled = self.config.pose_enabled
+        old_weights = (self.config.use_tensorrt, self.config.imgsz, self.config.torch_compile)
         self.config = config
+        self._apply_draw_style()
+        self._apply_counting_region()
+        
+        # Cambiar de backend (PyTorch/TensorRT/compilado) o de imgsz cambia los pesos a cargar
+        weights_changed = old_weights != (config.use_tensorrt, config.imgsz, config.torch_compile)
+        if weights_changed:
+            self._model_loaded = None
+            self._pose_model_loaded = None
         
         # Recargar modelo de detección si cambió el tamaño
-        if old_model != config.model_size:
+        if old_model != config.model_size or (weights_changed and self.model is not None):
             self.load_model(config.model_size)
         
         # Cargar/recargar modelo de pose si está habilitado y cambió
         if config.pose_enabled:
-            if not old_pose_enabled or old_pose_model != config.pose_model_size:
+            if not old_pose_enabled or old_pose_model != config.pose_model_size or weights_changed:
                 self.load_pose_model(config.pose_model_size)
     
     def detect(self, frame: np.ndarray) -> DetectionResult:
@@ -144,66 +405,116 @@ class YOLODetector(BaseDetector):
         Returns:
             DetectionResult con todas las detecciones
         """
-        if self.model is None:
-            self.load_model()
-        
-        start_time = time.perf_counter()
-        
-        # Ejecutar inferencia
-        results = self.model(
-            frame,
-            conf=self.config.confidence_threshold,
-            iou=self.config.iou_threshold,
-            classes=self.config.enabled_classes if self.config.enabled_classes else None,
-            verbose=False,
-        )
+        return self.detect_batch([frame])[0]
+    
+    @torch.inference_mode()
+    def detect_batch(self, frames: list[np.ndarray]) -> list[DetectionResult]:
+        """
+        Ejecuta detección sobre varios frames en una sola pasada del modelo.
+        Los lotes se parten en bloques de YOLO_MAX_BATCH (límite del motor TensorRT).
         
-        inference_time = (time.perf_counter() - start_time) * 1000
+        Args:
+            frames: Imágenes BGR de OpenCV
+            
+        Returns:
+            Un DetectionResult por frame, en el mismo orden
+        """
+        if not frames:
+            return []
         
-        # Procesar resultados
-        detections: list[Detection] = []
+        if self.model is None:
+            self.load_model()
         
-        for result in results:
-            boxes = result.boxes
-            if boxes is None:
-                continue
-                
-            for box in boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                
-                # Obtener nombres de clase
-                class_name = result.names.get(class_id, f"class_{class_id}")
-                class_name_es = COCO_CLASSES_ES.get(class_id, class_name)
-                
-                # Filtrar por región de conteo si está configurada
-                if self.config.counting_region:
-                    region = self.config.counting_region
-                    center_x = (x1 + x2) // 2
-                    center_y = (y1 + y2) // 2
-                    
-                    if not (region.x <= center_x <= region.x + region.width and
-                            region.y <= center_y <= region.y + region.height):
-                        continue
-                
-                detections.append(Detection(
-                    class_id=class_id,
-                    class_name=class_name,
-                    class_name_es=class_name_es,
-                    confidence=confidence,
-                    bbox=(x1, y1, x2, y2),
+        output: list[DetectionResult] = []
+        for start in range(0, len(frames), YOLO_MAX_BATCH):
+            chunk = frames[start:start + YOLO_MAX_BATCH]
+            start_time = time.perf_counter()
+            
+            # Subida pinned + preproceso en GPU si el lote comparte resolución
+            source, letterbox = chunk, None
+            if self._gpu_preprocess_enabled() and all(f.shape == chunk[0].shape for f in chunk):
+                source, letterbox = self._get_uploader().upload(chunk)
+            
+            # Ejecutar inferencia
+            results = self.model(
+                source,
+                conf=self.config.confidence_threshold,
+                iou=self.config.iou_threshold,
+                classes=self.config.enabled_classes if self.config.enabled_classes else None,
+                imgsz=self.config.imgsz,
+                device=self.device,
+                half=self.half,
+                verbose=False,
+            )
+            
+            # El costo del lote se reparte entre sus frames
+            inference_time = (time.perf_counter() - start_time) * 1000 / len(chunk)
+            
+            for result, frame in zip(results, chunk):
+                h, w = frame.shape[:2]
+                output.append(DetectionResult(
+                    detections=self._postprocess(result, letterbox and (*letterbox, w, h)),
+                    inference_time_ms=inference_time,
+                    frame_width=w,
+                    frame_height=h,
+                    backend_type=BackendType.YOLO,
                 ))
+        return output
+    
+    def _gpu_preprocess_enabled(self) -> bool:
+        return self.config.gpu_preprocess and self.device == "cuda"
+    
+    def _get_uploader(self) -> _FrameUploader:
+        uploader = self._uploader
+        if uploader is None or uploader.imgsz != self.config.imgsz or uploader.half != self.half:
+            uploader = self._uploader = _FrameUploader(self.device, self.half, self.config.imgsz)
+        return uploader
+    
+    @staticmethod
+    def _box_arrays(boxes, letterbox: tuple[float, int, int, int, int] | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Una sola copia GPU→CPU por columna: xyxy int32, confianzas, clases int32.
+        Con letterbox (escala, pad_x, pad_y, ancho, alto) las cajas se devuelven
+        a coordenadas del frame original.
+        """
+        xyxy = boxes.xyxy.cpu().numpy()
+        if letterbox is not None:
+            r, pad_x, pad_y, w, h = letterbox
+            xyxy = (xyxy - (pad_x, pad_y, pad_x, pad_y)) / r
+            np.clip(xyxy, 0, (w, h, w, h), out=xyxy)
+        xyxy = xyxy.astype(np.int32)
+        conf = boxes.conf.cpu().numpy()
+        cls = boxes.cls.cpu().numpy().astype(np.int32)
+        return xyxy, conf, cls
+    
+    def _postprocess(self, result, letterbox: tuple[float, int, int, int, int] | None = None) -> DetectionBatch:
+        """Convierte un resultado de Ultralytics en columnas de detecciones"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            xyxy = np.empty((0, 4), dtype=np.int32)
+            conf = np.empty(0, dtype=np.float32)
+            cls = np.empty(0, dtype=np.int32)
+        else:
+            xyxy, conf, cls = self._box_arrays(boxes, letterbox)
         
-        h, w = frame.shape[:2]
-        return DetectionResult(
-            detections=detections,
-            inference_time_ms=inference_time,
-            frame_width=w,
-            frame_height=h,
-            backend_type=BackendType.YOLO,
+        # Filtrar por región de conteo si está configurada (máscara sobre centros)
+        if self._region_bounds and len(cls):
+            rx1, ry1, rx2, ry2 = self._region_bounds
+            cx = (xyxy[:, 0] + xyxy[:, 2]) >> 1
+            cy = (xyxy[:, 1] + xyxy[:, 3]) >> 1
+            keep = (cx >= rx1) & (cx <= rx2) & (cy >= ry1) & (cy <= ry2)
+            xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+        
+        return DetectionBatch(
+            xyxy=xyxy,
+            confidence=conf.astype(np.float32, copy=False),
+            class_id=cls,
+            names=result.names,
+            names_es=COCO_CLASSES_ES,
+            backend_source=BackendType.YOLO,
         )
     
+    @torch.inference_mode()
     def detect_pose(self, frame: np.ndarray) -> DetectionResult:
         """
         Ejecuta detección de pose en un frame.
@@ -225,6 +536,9 @@ class YOLODetector(BaseDetector):
             frame,
             conf=self.config.confidence_threshold,
             iou=self.config.iou_threshold,
+            imgsz=self.config.imgsz,
+            device=self.device,
+            half=self.half,
             verbose=False,
         )
         
@@ -237,33 +551,36 @@ class YOLODetector(BaseDetector):
             boxes = result.boxes
             keypoints_data = result.keypoints
             
-            if boxes is None:
+            if boxes is None or len(boxes) == 0:
                 continue
             
-            for i, box in enumerate(boxes):
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                
+            xyxy, conf, cls = self._box_arrays(boxes)
+            
+            # Keypoints de todas las personas en una sola copia: (N, 17, 3) - x, y, conf
+            kp_all = None
+            if keypoints_data is not None and keypoints_data.data is not None:
+                kp_all = keypoints_data.data.cpu().numpy()
+            
+            for i, ((x1, y1, x2, y2), confidence, class_id) in enumerate(
+                zip(xyxy.tolist(), conf.tolist(), cls.tolist())
+            ):
                 # Nota: Pose models solo detectan personas (class_id=0)
                 class_name = "person"
                 class_name_es = "persona"
                 
-                # Extraer keypoints si están disponibles
+                # Solo keypoints con confianza mínima
                 keypoints: list[Keypoint] = []
-                if keypoints_data is not None and i < len(keypoints_data):
-                    kp_array = keypoints_data[i]
-                    if hasattr(kp_array, 'data') and kp_array.data is not None:
-                        kp_coords = kp_array.data[0]  # Shape: (17, 3) - x, y, conf
-                        for kp_idx, kp in enumerate(kp_coords):
-                            kp_x, kp_y, kp_conf = float(kp[0]), float(kp[1]), float(kp[2])
-                            if kp_conf > 0.3:  # Solo keypoints con confianza mínima
-                                keypoints.append(Keypoint(
-                                    x=int(kp_x),
-                                    y=int(kp_y),
-                                    confidence=kp_conf,
-                                    name=KEYPOINT_NAMES[kp_idx] if kp_idx < len(KEYPOINT_NAMES) else f"kp_{kp_idx}"
-                                ))
+                if kp_all is not None and i < len(kp_all):
+                    row = kp_all[i]
+                    valid = np.nonzero(row[:, 2] > MIN_KEYPOINT_CONFIDENCE)[0]
+                    xy = row[valid, :2].astype(np.int32).tolist()
+                    for kp_idx, (kp_x, kp_y), kp_conf in zip(valid.tolist(), xy, row[valid, 2].tolist()):
+                        keypoints.append(Keypoint(
+                            x=kp_x,
+                            y=kp_y,
+                            confidence=kp_conf,
+                            name=_KEYPOINT_NAMES[kp_idx] if kp_idx < len(_KEYPOINT_NAMES) else f"kp_{kp_idx}",
+                        ))
                 
                 detections.append(Detection(
                     class_id=class_id,
@@ -272,6 +589,7 @@ class YOLODetector(BaseDetector):
                     confidence=confidence,
                     bbox=(x1, y1, x2, y2),
                     keypoints=keypoints,
+                    backend_source=BackendType.YOLO,
                 ))
         
         h, w = frame.shape[:2]
@@ -286,7 +604,8 @@ class YOLODetector(BaseDetector):
     def draw_detections(
         self, 
         frame: np.ndarray, 
-        result: DetectionResult
+        result: DetectionResult,
+        inplace: bool = False,
     ) -> np.ndarray:
         """
         Dibuja bounding boxes y labels en el frame.
@@ -294,35 +613,38 @@ class YOLODetector(BaseDetector):
         Args:
             frame: Imagen BGR original
             result: Resultado de detección
+            inplace: Dibujar directamente sobre frame en vez de una copia
             
         Returns:
             Frame con anotaciones dibujadas
         """
-        output = frame.copy()
+        output = frame if inplace else frame.copy()
         
-        # Parsear color del config
-        color_hex = self.config.box_color.lstrip('#')
-        color_bgr = tuple(int(color_hex[i:i+2], 16) for i in (4, 2, 0))
+        color_bgr = self.color_bgr
+        font_scale = self.font_scale
+        thickness = self.thickness
+        show_labels = self.config.show_labels
+        show_confidence = self.config.show_confidence
+        font = cv2.FONT_HERSHEY_SIMPLEX
         
-        font_scale = self.config.font_size / 32
-        thickness = max(1, self.config.font_size // 8)
+        # Filas como columnas NumPy, sin construir objetos Detection
+        detections = result.detections
+        if isinstance(detections, DetectionBatch):
+            _, names_es = detections.class_names(range(len(detections)))
+            rows = zip(detections.xyxy.tolist(), detections.confidence.tolist(), names_es)
+        else:
+            rows = ((d.bbox, d.confidence, d.class_name_es) for d in detections)
         
-        for det in result.detections:
-            x1, y1, x2, y2 = det.bbox
-            
+        for (x1, y1, x2, y2), confidence, class_name_es in rows:
             # Dibujar bounding box
             cv2.rectangle(output, (x1, y1), (x2, y2), color_bgr, thickness)
             
             # Preparar label
-            if self.config.show_labels:
-                label = det.class_name_es
-                if self.config.show_confidence:
-                    label += f" {det.confidence:.0%}"
+            if show_labels:
+                label = f"{class_name_es} {confidence:.0%}" if show_confidence else class_name_es
                 
                 # Background del label
-                (label_w, label_h), _ = cv2.getTextSize(
-                    label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness
-                )
+                label_w, label_h = self.text_size(label)
                 cv2.rectangle(
                     output,
                     (x1, y1 - label_h - 10),
@@ -336,26 +658,26 @@ class YOLODetector(BaseDetector):
                     output,
                     label,
                     (x1 + 2, y1 - 5),
-                    cv2.FONT_HERSHEY_SIMPLEX,
+                    font,
                     font_scale,
                     (255, 255, 255),  # Blanco
                     thickness,
                 )
         
         # Dibujar región de conteo si existe
-        if self.config.counting_region:
-            r = self.config.counting_region
+        if self._region_bounds:
+            rx1, ry1, rx2, ry2 = self._region_bounds
             cv2.rectangle(
                 output,
-                (r.x, r.y),
-                (r.x + r.width, r.y + r.height),
+                (rx1, ry1),
+                (rx2, ry2),
                 (0, 255, 255),  # Amarillo
                 2,
             )
             cv2.putText(
                 output,
                 "Zona de conteo",
-                (r.x + 5, r.y + 20),
+                (rx1 + 5, ry1 + 20),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.5,
                 (0, 255, 255),
@@ -2,18 +2,22 @@
 Argos - Multi-Backend Object Detection System
 FastAPI Application Entry Point
 """
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.routes import router
+from app.api.routes import router, get_current_config
 from app.api.websocket import detection_websocket
 from app.api.assistant import router as assistant_router
 from app.api.auth_routes import router as auth_router
 from app.middleware import setup_middleware
 from app.auth import AUTH_ENABLED
 from app.database import init_db, close_db
+from app.detection import get_pipeline_manager
+from app.detection.yolo_detector import warmup_models
+from app.logging_config import start_logging, stop_logging
 
 # CORS configuration from environment
 CORS_ORIGINS = os.getenv("VM_CORS_ORIGINS", "*").split(",")
@@ -22,17 +26,34 @@ CORS_ORIGINS = os.getenv("VM_CORS_ORIGINS", "*").split(",")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle hooks para la aplicación"""
+    start_logging()
     auth_status = "habilitada" if AUTH_ENABLED else "deshabilitada"
     print(f"🚀 Iniciando Argos... (autenticación {auth_status})")
     
     # Initialize database
     await init_db()
     
+    # Precalentar YOLO: el servidor queda listo solo tras el calentamiento
+    await asyncio.to_thread(warmup_models, get_current_config())
+    
+    # Crear el grabador fuera del loop (prueba los encoders de FFmpeg) y
+    # guardar en la base de datos cada clip que termine
+    from app.recordings.recorder import get_recorder, recorder_enabled
+    from app.recordings.storage import get_storage
+    recorder = None
+    if recorder_enabled():
+        recorder = await asyncio.to_thread(get_recorder)
+        recorder.on_recording_complete(get_storage().save_finished_clip)
+    
     yield
     
     # Cleanup
+    if recorder is not None:
+        await asyncio.to_thread(recorder.close)
+    get_pipeline_manager().close()
     await close_db()
     print("🛑 Deteniendo Argos...")
+    stop_logging()
 
 
 app = FastAPI(
@@ -3,47 +3,82 @@ Middleware for Argos API.
 Implements rate limiting, request validation, and security headers.
 """
 import time
-from collections import defaultdict
 from typing import Callable
 from fastapi import Request, Response, HTTPException, status
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
+import logging
 import os
 
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
 # Rate limiting configuration
 RATE_LIMIT_REQUESTS = int(os.getenv("VM_RATE_LIMIT_REQUESTS", "100"))
 RATE_LIMIT_WINDOW = int(os.getenv("VM_RATE_LIMIT_WINDOW", "60"))  # seconds
+# Shared rate-limit counters across workers/replicas (optional, needs: pip install redis)
+REDIS_URL = os.getenv("VM_REDIS_URL", "")
+# A slow or dead Redis must not stall requests; past this they use the local bucket
+REDIS_TIMEOUT_SECONDS = 0.25
+# While Redis stays down, repeat the fallback warning at most this often
+REDIS_WARN_INTERVAL = 60.0
+
+MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max request body
+
+
+# Streaming routes that bypass every middleware check
+SKIP_PATH_PREFIXES = ("/ws",)
+
+
+def _should_skip(request: Request) -> bool:
+    """True for WebSocket routes and CORS preflights, which need none of these checks."""
+    scope = request.scope
+    return (
+        scope["type"] != "http"
+        or scope["method"] == "OPTIONS"
+        or scope["path"].startswith(SKIP_PATH_PREFIXES)
+    )
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     Simple in-memory rate limiting middleware.
     Limits requests per IP address within a time window.
+    
+    Token bucket per IP: requests_limit tokens refilled evenly over
+    window_seconds, stored as (tokens, last_refill). State and work per
+    request are O(1) whatever the traffic. IPs idle for two windows are
+    swept once per window.
     """
     
     def __init__(self, app: ASGIApp, requests_limit: int = RATE_LIMIT_REQUESTS, window_seconds: int = RATE_LIMIT_WINDOW):
         super().__init__(app)
         self.requests_limit = requests_limit
         self.window_seconds = window_seconds
-        self.requests: dict[str, list[float]] = defaultdict(list)
+        self.refill_rate = requests_limit / window_seconds  # tokens per second
+        self.buckets: dict[str, tuple[float, float]] = {}
+        self._next_sweep = 0.0
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Skip rate limiting for WebSocket connections
-        if request.url.path.startswith("/ws"):
+        if _should_skip(request):
             return await call_next(request)
         
         # Get client IP
         client_ip = self._get_client_ip(request)
-        current_time = time.time()
+        # Monotonic clock for window math: immune to NTP steps and cheaper to read
+        current_time = time.monotonic()
         
-        # Clean old requests
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip]
-            if current_time - req_time < self.window_seconds
-        ]
+        if current_time >= self._next_sweep:
+            self._sweep(current_time)
+        
+        allowed, remaining = await self._admit(client_ip, current_time)
         
         # Check rate limit
-        if len(self.requests[client_ip]) >= self.requests_limit:
+        if not allowed:
             return Response(
                 content='{"detail": "Rate limit exceeded. Please try again later."}',
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -52,28 +87,48 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                     "Retry-After": str(self.window_seconds),
                     "X-RateLimit-Limit": str(self.requests_limit),
                     "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(int(current_time + self.window_seconds)),
+                    "X-RateLimit-Reset": str(int(time.time() + self.window_seconds)),
                 }
             )
         
-        # Record request
-        self.requests[client_ip].append(current_time)
-        
         # Add rate limit headers to response
         response = await call_next(request)
-        remaining = self.requests_limit - len(self.requests[client_ip])
         response.headers["X-RateLimit-Limit"] = str(self.requests_limit)
         response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(int(current_time + self.window_seconds))
+        response.headers["X-RateLimit-Reset"] = str(int(time.time() + self.window_seconds))
         
         return response
     
+    async def _admit(self, client_ip: str, now: float) -> tuple[bool, int]:
+        """Take a token for client_ip at monotonic time now. Returns (allowed, remaining requests)."""
+        # Refill the bucket for the time elapsed since the last request
+        tokens, last_refill = self.buckets.get(client_ip, (self.requests_limit, now))
+        tokens = min(self.requests_limit, tokens + (now - last_refill) * self.refill_rate)
+        
+        if tokens < 1:
+            self.buckets[client_ip] = (tokens, now)
+            return False, 0
+        
+        # Spend a token for this request
+        tokens -= 1
+        self.buckets[client_ip] = (tokens, now)
+        return True, int(tokens)
+    
+    def _sweep(self, now: float) -> None:
+        """Forget IPs not seen for two windows so scanners don't leak memory."""
+        cutoff = now - 2 * self.window_seconds
+        stale = [ip for ip, (_, last_refill) in self.buckets.items() if last_refill < cutoff]
+        for ip in stale:
+            del self.buckets[ip]
+        self._next_sweep = now + self.window_seconds
+    
     def _get_client_ip(self, request: Request) -> str:
         """Extract client IP, considering proxies."""
         # Check X-Forwarded-For header (for reverse proxies)
         forwarded = request.headers.get("X-Forwarded-For")
         if forwarded:
-            return forwarded.split(",")[0].strip()
+            # Leftmost entry is the original client; partition avoids splitting the whole chain
+            return forwarded.partition(",")[0].strip()
         
         # Check X-Real-IP header
         real_ip = request.headers.get("X-Real-IP")
@@ -87,23 +142,78 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         return "unknown"
 
 
+class RedisRateLimitMiddleware(RateLimitMiddleware):
+    """
+    Rate limiting shared by every worker and replica through Redis.
+    
+    Fixed-window counter: one pipelined INCR + EXPIRE on
+    rl:{ip}:{window_index} per request. If Redis is unreachable the
+    request is judged by the in-memory token bucket instead.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        redis_url: str = REDIS_URL,
+        redis_client=None,
+        requests_limit: int = RATE_LIMIT_REQUESTS,
+        window_seconds: int = RATE_LIMIT_WINDOW,
+    ):
+        super().__init__(app, requests_limit, window_seconds)
+        self.redis = redis_client or aioredis.from_url(
+            redis_url,
+            socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+            socket_timeout=REDIS_TIMEOUT_SECONDS,
+        )
+        self._last_warn = float("-inf")
+    
+    async def _admit(self, client_ip: str, now: float) -> tuple[bool, int]:
+        # Wall-clock window index (not the monotonic now), so every process agrees on the bucket
+        key = f"rl:{client_ip}:{int(time.time() // self.window_seconds)}"
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, self.window_seconds)
+                count, _ = await pipe.execute()
+        except Exception as e:
+            # One warning per interval; every request would otherwise log while Redis is down
+            if now - self._last_warn >= REDIS_WARN_INTERVAL:
+                self._last_warn = now
+                logger.warning("Redis rate limit unavailable, using local bucket: %s", e)
+            else:
+                logger.debug("Redis rate limit unavailable: %s", e)
+            return await super()._admit(client_ip, now)
+        
+        return count <= self.requests_limit, max(0, self.requests_limit - count)
+
+
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     """
     Add security headers to all responses.
     """
     
+    _STATIC_HEADERS = (
+        ("X-Content-Type-Options", "nosniff"),
+        ("X-Frame-Options", "DENY"),
+        ("X-XSS-Protection", "1; mode=block"),
+        ("Referrer-Policy", "strict-origin-when-cross-origin"),
+    )
+    _NO_CACHE_PREFIXES = ("/api",)
+    
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        if _should_skip(request):
+            return await call_next(request)
+        
         response = await call_next(request)
         
         # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        headers = response.headers
+        for name, value in self._STATIC_HEADERS:
+            headers[name] = value
         
         # Cache control for API responses
-        if request.url.path.startswith("/api"):
-            response.headers["Cache-Control"] = "no-store, max-age=0"
+        if request.scope["path"].startswith(self._NO_CACHE_PREFIXES):
+            headers["Cache-Control"] = "no-store, max-age=0"
         
         return response
 
@@ -113,21 +223,24 @@ class RequestValidationMiddleware(BaseHTTPMiddleware):
     Validate incoming requests for common issues.
     """
     
-    MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max
-    
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Check content length
+        if _should_skip(request):
+            return await call_next(request)
+        
+        # Check content length; malformed values are left to the server to reject.
+        # isascii() guards isdigit() against Unicode digits int() cannot parse.
         content_length = request.headers.get("content-length")
-        if content_length:
-            try:
-                if int(content_length) > self.MAX_CONTENT_LENGTH:
-                    return Response(
-                        content='{"detail": "Request body too large"}',
-                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                        headers={"Content-Type": "application/json"}
-                    )
-            except ValueError:
-                pass
+        if (
+            content_length
+            and content_length.isascii()
+            and content_length.isdigit()
+            and int(content_length) > MAX_CONTENT_LENGTH
+        ):
+            return Response(
+                content='{"detail": "Request body too large"}',
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                headers={"Content-Type": "application/json"}
+            )
         
         return await call_next(request)
 
@@ -140,4 +253,9 @@ def setup_middleware(app):
     # Order matters: first added = outermost (runs first on request, last on response)
     app.add_middleware(SecurityHeadersMiddleware)
     app.add_middleware(RequestValidationMiddleware)
-    app.add_middleware(RateLimitMiddleware)
+    if REDIS_URL and aioredis is not None:
+        app.add_middleware(RedisRateLimitMiddleware, redis_url=REDIS_URL)
+    else:
+        if REDIS_URL:
+            logger.warning("VM_REDIS_URL is set but redis is not installed; rate limits are per process")
+        app.add_middleware(RateLimitMiddleware)
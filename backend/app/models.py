@@ -6,7 +6,7 @@ import uuid
 from datetime import datetime
 from typing import Optional, List
 
-from sqlalchemy import String, Float, Boolean, Integer, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import String, Float, Boolean, Integer, BigInteger, DateTime, Text, JSON, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -51,6 +51,10 @@ class ZoneModel(Base):
 class AlertModel(Base):
     """Alert triggered by zone intrusion."""
     __tablename__ = "alerts"
+    __table_args__ = (
+        # Per-zone alert history, newest first
+        Index("ix_alerts_zone_ts", "zone_id", "timestamp"),
+    )
     
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     zone_id: Mapped[Optional[str]] = mapped_column(String(36), ForeignKey("zones.id", ondelete="SET NULL"), nullable=True)
@@ -73,21 +77,30 @@ class AlertModel(Base):
 class RecordingModel(Base):
     """Video clip recording associated with an alert."""
     __tablename__ = "recordings"
+    __table_args__ = (
+        Index("ix_recordings_alert_id", "alert_id"),
+    )
     
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     alert_id: Mapped[Optional[str]] = mapped_column(String(36), ForeignKey("alerts.id", ondelete="CASCADE"), nullable=True)
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
-    path: Mapped[str] = mapped_column(Text, nullable=False)
+    # Legacy: the path is derived from filename and the storage dir; new rows
+    # store "" and reads skip the column (kept for existing databases)
+    path: Mapped[str] = mapped_column(Text, nullable=False, default="", deferred=True)
     duration_seconds: Mapped[float] = mapped_column(Float, default=0.0)
-    file_size_bytes: Mapped[int] = mapped_column(Integer, default=0)
+    file_size_bytes: Mapped[int] = mapped_column(BigInteger, default=0)  # Clips can exceed 2 GB
     resolution_width: Mapped[int] = mapped_column(Integer, default=0)
     resolution_height: Mapped[int] = mapped_column(Integer, default=0)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
     # Relationships
     alert: Mapped[Optional["AlertModel"]] = relationship("AlertModel", back_populates="recording")
 
 
+# Recording list: ORDER BY created_at DESC LIMIT/OFFSET reads the index in order
+Index("ix_recordings_created_at_desc", RecordingModel.created_at.desc())
+
+
 class AnalyticsModel(Base):
     """Daily analytics aggregation."""
     __tablename__ = "analytics"
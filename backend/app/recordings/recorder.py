@@ -4,56 +4,267 @@ Captures video clips before and after alert events.
 """
 import asyncio
 import os
+import queue
+import shutil
+import subprocess
 import time
 import threading
-from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Callable
-import cv2
 import numpy as np
 
 
+# H.264 encoders in order of preference, with their FFmpeg arguments
+FFMPEG_ENCODERS: dict[str, list[str]] = {
+    "h264_nvenc": ["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "ll"],
+    "h264_videotoolbox": ["-c:v", "h264_videotoolbox", "-realtime", "1"],
+    "h264_vaapi": [
+        "-vaapi_device", "/dev/dri/renderD128",
+        "-vf", "format=nv12,hwupload", "-c:v", "h264_vaapi",
+    ],
+    "libx264": ["-c:v", "libx264", "-preset", "veryfast", "-tune", "zerolatency"],
+}
+
+
+@lru_cache(maxsize=1)
+def detect_ffmpeg_encoder() -> Optional[str]:
+    """
+    Pick the best H.264 encoder the local FFmpeg offers.
+    Returns None when FFmpeg is missing (OpenCV's writer is used instead).
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    try:
+        listing = subprocess.run(
+            [ffmpeg, "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=10,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    
+    available = {line.split()[1] for line in listing.splitlines() if len(line.split()) > 1}
+    for encoder in FFMPEG_ENCODERS:
+        # Builds list hardware encoders even without the hardware: probe one frame
+        if encoder in available and _encoder_works(ffmpeg, encoder):
+            return encoder
+    return None
+
+
+def _encoder_works(ffmpeg: str, encoder: str) -> bool:
+    """Encode a single test frame to null output."""
+    try:
+        return subprocess.run(
+            [
+                ffmpeg, "-hide_banner", "-loglevel", "error",
+                "-f", "lavfi", "-i", "color=size=256x256", "-frames:v", "1",
+                *FFMPEG_ENCODERS[encoder], "-f", "null", "-",
+            ],
+            capture_output=True, timeout=10,
+        ).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+class FFmpegWriter:
+    """
+    Pipes raw BGR frames into an FFmpeg process.
+    Same interface as cv2.VideoWriter (isOpened/write/release).
+    """
+    
+    def __init__(self, filepath: str, encoder: str, fps: int, frame_size: tuple[int, int]):
+        width, height = frame_size
+        command = [
+            shutil.which("ffmpeg") or "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-",
+            *FFMPEG_ENCODERS[encoder],
+        ]
+        if encoder != "h264_vaapi":
+            command += ["-pix_fmt", "yuv420p"]  # Playable in browsers
+        command += ["-movflags", "+faststart", filepath]
+        
+        try:
+            self._proc: Optional[subprocess.Popen] = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            )
+        except OSError as e:
+            print(f"❌ No se pudo iniciar ffmpeg: {e}")
+            self._proc = None
+            return
+        # Drained on its own thread so a chatty ffmpeg never blocks on a full pipe
+        self._stderr_thread = threading.Thread(
+            target=self._report_errors, args=(self._proc.stderr, filepath), daemon=True,
+        )
+        self._stderr_thread.start()
+    
+    @staticmethod
+    def _report_errors(stderr, filepath: str):
+        """Print ffmpeg's error output (-loglevel error) as it arrives."""
+        for line in stderr:
+            print(f"❌ ffmpeg ({Path(filepath).name}): {line.decode(errors='replace').rstrip()}")
+        stderr.close()
+    
+    def isOpened(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+    
+    def write(self, frame: np.ndarray):
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except (BrokenPipeError, ValueError):
+            print(f"❌ ffmpeg terminó inesperadamente (código {self._proc.poll()})")
+            self.release()
+    
+    def release(self):
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if proc.wait() != 0:
+            print(f"❌ ffmpeg terminó con código {proc.returncode}")
+        self._stderr_thread.join()
+
+
+@dataclass(slots=True)
+class _FrameRing:
+    """Ring storage for one frame shape; replaced whole when the shape changes."""
+    shape: tuple[int, ...]
+    slots: list  # Per slot: the caller's frame, or a view into storage
+    timestamps: np.ndarray
+    base: int  # First frame number stored in this ring
+    storage: Optional[np.ndarray] = None  # Preallocated copies of borrowed frames
+
+
 class RecordingBuffer:
     """
     Circular buffer that stores frames for pre-event recording.
-    Thread-safe implementation for use with video capture threads.
+    
+    Frames the caller hands over (owns_frame=True, e.g. a fresh array per
+    camera read) are kept by reference with no copy. Borrowed frames are
+    copied into one preallocated (max_frames, H, W, 3) array, allocated
+    on first use, so the capture path never allocates per frame.
+    
+    Lock-free for one producer (the capture thread calling add_frame) and
+    one consumer (get_buffered_frames/clear). Each cursor is written by
+    its owner only, and CPython makes int and reference stores atomic.
+    The consumer copies slots without blocking the producer, then drops
+    any slot the producer overwrote while the copy was running.
     """
     
     def __init__(self, buffer_seconds: int = 5, fps: int = 15):
         self.buffer_seconds = buffer_seconds
         self.fps = fps
         self.max_frames = buffer_seconds * fps
-        self.buffer: deque = deque(maxlen=self.max_frames)
-        self.lock = threading.Lock()
         self.frame_size: Optional[tuple[int, int]] = None
+        
+        # Producer-owned ring for the current frame shape
+        self._ring: Optional[_FrameRing] = None
+        # Producer-owned: frame number being written, and total frames published
+        self._writing = -1
+        self._written = 0
+        # Consumer-owned: frames before this number were cleared
+        self._read_floor = 0
     
-    def add_frame(self, frame: np.ndarray):
-        """Add a frame to the circular buffer."""
-        with self.lock:
-            # Store frame with timestamp
-            self.buffer.append({
-                "frame": frame.copy(),
-                "timestamp": time.time(),
-            })
-            if self.frame_size is None and frame is not None:
-                self.frame_size = (frame.shape[1], frame.shape[0])
-    
-    def get_buffered_frames(self) -> list[dict]:
-        """Get all frames currently in the buffer."""
-        with self.lock:
-            return list(self.buffer)
+    def add_frame(self, frame: np.ndarray, owns_frame: bool = True):
+        """
+        Add a frame to the circular buffer (producer thread only).
+        
+        Args:
+            frame: BGR frame
+            owns_frame: The caller will never modify the frame again, so it
+                can be kept without copying. Pass False for reused buffers.
+        """
+        if frame is None or self.max_frames <= 0:
+            return
+        written = self._written
+        ring = self._ring
+        if ring is None or ring.shape != frame.shape:
+            ring = _FrameRing(
+                shape=frame.shape,
+                slots=[None] * self.max_frames,
+                timestamps=np.empty(self.max_frames, dtype=np.float64),
+                base=written,
+            )
+            self._ring = ring
+            self.frame_size = (frame.shape[1], frame.shape[0])
+        
+        idx = (written - ring.base) % self.max_frames
+        # Claim the slot before touching it so readers can detect the overlap
+        self._writing = written
+        if owns_frame:
+            ring.slots[idx] = frame
+        else:
+            if ring.storage is None:
+                ring.storage = np.empty((self.max_frames, *frame.shape), dtype=frame.dtype)
+            np.copyto(ring.storage[idx], frame)
+            ring.slots[idx] = ring.storage[idx]
+        ring.timestamps[idx] = time.time()
+        # Publish only after the slot is fully written
+        self._written = written + 1
+    
+    def _oldest(self, ring: _FrameRing, written: int) -> int:
+        return max(ring.base, self._read_floor, written - self.max_frames)
+    
+    def __len__(self) -> int:
+        ring = self._ring
+        if ring is None:
+            return 0
+        written = self._written
+        return written - self._oldest(ring, written)
+    
+    def get_buffered_frames(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Copy the frames currently in the buffer, oldest first.
+        
+        Returns:
+            (frames, timestamps) with frames of shape (N, H, W, 3)
+        """
+        ring = self._ring
+        written = self._written
+        if ring is None or written == self._oldest(ring, written):
+            return np.empty((0, 0, 0, 3), dtype=np.uint8), np.empty(0, dtype=np.float64)
+        
+        start = self._oldest(ring, written)
+        slots = (np.arange(start, written) - ring.base) % self.max_frames
+        frames_copy = np.stack([ring.slots[i] for i in slots])
+        timestamps_copy = ring.timestamps.take(slots)
+        
+        if self._ring is not ring:
+            # Resolution changed mid-copy: the old ring is history
+            return frames_copy[:0], timestamps_copy[:0]
+        
+        # Frames whose slot the producer has claimed since the snapshot
+        # may have been overwritten during the copy
+        torn = self._writing - self.max_frames + 1 - start
+        if torn > 0:
+            return frames_copy[torn:], timestamps_copy[torn:]
+        return frames_copy, timestamps_copy
     
     def clear(self):
-        """Clear the buffer."""
-        with self.lock:
-            self.buffer.clear()
+        """Clear the buffer (consumer thread only)."""
+        self._read_floor = self._written
 
 
 class ClipRecorder:
     """
     Records video clips when alerts are triggered.
     Uses a pre-event buffer and captures additional post-event frames.
+    
+    Encoding runs on a background thread fed by a bounded queue, so the
+    capture thread only enqueues frames. When the encoder falls behind,
+    frames are dropped (and counted) instead of stalling capture.
+    
+    Clips are H.264 through FFmpeg (hardware encoder when available) when
+    encoder is "auto"; without FFmpeg, or with encoder=None, OpenCV writes
+    them with the given fourcc codec.
     """
     
     def __init__(
@@ -63,6 +274,7 @@ class ClipRecorder:
         post_seconds: int = 10,
         fps: int = 15,
         codec: str = "mp4v",
+        encoder: Optional[str] = "auto",
     ):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -71,14 +283,15 @@ class ClipRecorder:
         self.post_seconds = post_seconds
         self.fps = fps
         self.codec = codec
+        self._fourcc: Optional[int] = None  # OpenCV fallback only, resolved on first use
+        self.encoder = detect_ffmpeg_encoder() if encoder == "auto" else encoder
         
-        # Recording state
+        # Recording state (capture side)
         self._recording = False
-        self._current_writer: Optional[cv2.VideoWriter] = None
         self._current_filename: Optional[str] = None
         self._post_frames_remaining = 0
         self._recording_start_time = 0
-        self._frame_count = 0
+        self.dropped_frames = 0
         
         # Frame buffer for pre-event recording
         self.buffer = RecordingBuffer(buffer_seconds=pre_seconds, fps=fps)
@@ -86,24 +299,41 @@ class ClipRecorder:
         # Lock for thread safety
         self._lock = threading.Lock()
         
-        # Callback for when recording completes
+        # Callback for when recording completes, run on the loop that registered it
         self._on_complete: Optional[Callable] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Background encoder: frames and ("start"/"stop", ...) commands, None to exit
+        self._encode_q: queue.Queue = queue.Queue(maxsize=max(fps * 2, 1))
+        self._encoder_thread = threading.Thread(target=self._encoder_loop, daemon=True)
+        self._encoder_thread.start()
     
     @property
     def is_recording(self) -> bool:
         """Check if currently recording."""
         return self._recording
     
-    def add_frame(self, frame: np.ndarray):
+    def add_frame(self, frame: np.ndarray, owns_frame: bool = True):
         """
         Add a frame to the system.
         If recording, adds to the current clip.
         Otherwise, adds to the pre-event buffer.
+        
+        Owned frames are kept by reference (no copy); pass owns_frame=False
+        when the source reuses its frame buffer.
         """
+        # Fast path while idle: the buffer is lock-free and _recording only
+        # flips a few times per hour, so an unlocked read is enough here
+        if not self._recording:
+            self.buffer.add_frame(frame, owns_frame)
+            return
+        
         with self._lock:
-            if self._recording and self._current_writer is not None:
-                self._current_writer.write(frame)
-                self._frame_count += 1
+            if self._recording:
+                try:
+                    self._encode_q.put_nowait(frame if owns_frame else frame.copy())
+                except queue.Full:
+                    self.dropped_frames += 1
                 self._post_frames_remaining -= 1
                 
                 # Check if recording should stop
@@ -111,7 +341,7 @@ class ClipRecorder:
                     self._stop_recording()
             else:
                 # Add to circular buffer for pre-event recording
-                self.buffer.add_frame(frame)
+                self.buffer.add_frame(frame, owns_frame)
     
     def start_recording(self, alert_id: str, alert_info: Optional[dict] = None) -> Optional[str]:
         """
@@ -130,36 +360,21 @@ class ClipRecorder:
             filepath = self.output_dir / filename
             
             # Get frame size from buffer
-            buffered_frames = self.buffer.get_buffered_frames()
-            if not buffered_frames and self.buffer.frame_size is None:
-                print(f"⚠️ No frames in buffer, cannot start recording")
-                return None
-            
+            buffered_frames, _ = self.buffer.get_buffered_frames()
             frame_size = self.buffer.frame_size
-            if frame_size is None and buffered_frames:
-                f = buffered_frames[0]["frame"]
-                frame_size = (f.shape[1], f.shape[0])
-            
             if frame_size is None:
+                print(f"⚠️ No frames in buffer, cannot start recording")
                 return None
             
             # Create video writer
-            fourcc = cv2.VideoWriter_fourcc(*self.codec)
-            self._current_writer = cv2.VideoWriter(
-                str(filepath),
-                fourcc,
-                self.fps,
-                frame_size,
-            )
+            writer = self._open_writer(filepath, frame_size)
             
-            if not self._current_writer.isOpened():
+            if not writer.isOpened():
                 print(f"❌ No se pudo crear el archivo de video: {filepath}")
                 return None
             
-            # Write buffered pre-event frames
-            for frame_data in buffered_frames:
-                self._current_writer.write(frame_data["frame"])
-                self._frame_count += 1
+            # The encoder writes the pre-event frames before any new frame
+            self._encode_q.put(("start", writer, buffered_frames))
             
             # Set recording state
             self._recording = True
@@ -171,26 +386,80 @@ class ClipRecorder:
             
             return filename
     
+    def _open_writer(self, filepath: Path, frame_size: tuple[int, int]):
+        """FFmpeg H.264 writer if an encoder was found, OpenCV otherwise."""
+        if self.encoder is not None:
+            return FFmpegWriter(str(filepath), self.encoder, self.fps, frame_size)
+        # OpenCV is imported lazily so API-only workers never load it
+        import cv2
+        if self._fourcc is None:
+            self._fourcc = cv2.VideoWriter_fourcc(*self.codec)
+        return cv2.VideoWriter(str(filepath), self._fourcc, self.fps, frame_size)
+    
     def _stop_recording(self):
         """Stop the current recording (internal, called with lock held)."""
-        if self._current_writer is not None:
-            self._current_writer.release()
-            
-            duration = time.time() - self._recording_start_time
-            print(f"🎬 Grabación finalizada: {self._current_filename} ({self._frame_count} frames, {duration:.1f}s)")
+        # Commands are never dropped: block until the encoder makes room
+        self._encode_q.put(("stop", self._current_filename, self._recording_start_time))
+        self._current_filename = None
+        self._recording = False
+    
+    def _encoder_loop(self):
+        """Encoder thread: write queued frames to the current clip."""
+        writer = None
+        frame_count = 0
+        
+        while True:
+            item = self._encode_q.get()
+            if item is None:
+                if writer is not None:
+                    writer.release()
+                return
             
-            # Call completion callback
-            if self._on_complete:
-                asyncio.create_task(self._on_complete(
-                    self._current_filename,
-                    self._frame_count,
-                    duration,
-                ))
+            if isinstance(item, np.ndarray):
+                if writer is not None:
+                    writer.write(item)
+                    frame_count += 1
+                continue
             
-            self._current_writer = None
-            self._current_filename = None
-            self._recording = False
-            self._frame_count = 0
+            command, *args = item
+            if command == "start":
+                writer, buffered_frames = args
+                frame_count = 0
+                for frame in buffered_frames:
+                    writer.write(frame)
+                    frame_count += 1
+            elif command == "stop" and writer is not None:
+                filename, start_time = args
+                writer.release()
+                writer = None
+                self._finish_clip(filename, frame_count, time.time() - start_time)
+    
+    def _finish_clip(self, filename: str, frame_count: int, duration: float):
+        """Report a finished clip (encoder thread, after the file is closed)."""
+        print(f"🎬 Grabación finalizada: {filename} ({frame_count} frames, {duration:.1f}s)")
+        
+        # Stat once here, off the event loop, so the save does not have to
+        try:
+            file_size = (self.output_dir / filename).stat().st_size
+        except OSError:
+            file_size = None
+        
+        # Call completion callback (this thread has no event loop of its own)
+        if self._on_complete:
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                print(f"⚠️ No se pudo notificar la grabación {filename}: sin event loop")
+                return
+            future = asyncio.run_coroutine_threadsafe(
+                self._on_complete(filename, frame_count, duration, file_size), loop,
+            )
+            future.add_done_callback(lambda f: self._report_callback_error(filename, f))
+    
+    @staticmethod
+    def _report_callback_error(filename: str, future):
+        """Print a failed completion callback; nobody else awaits its future."""
+        if not future.cancelled() and future.exception() is not None:
+            print(f"❌ Error en el callback de la grabación {filename}: {future.exception()!r}")
     
     def stop_recording(self):
         """Force stop the current recording."""
@@ -198,9 +467,26 @@ class ClipRecorder:
             if self._recording:
                 self._stop_recording()
     
-    def on_recording_complete(self, callback: Callable):
-        """Set callback for when recording completes."""
+    def close(self):
+        """Finish any clip in progress and stop the encoder thread."""
+        self.stop_recording()
+        self._encode_q.put(None)
+        self._encoder_thread.join()
+    
+    def on_recording_complete(self, callback: Callable, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """
+        Set an async callback for when recording completes.
+        It is awaited as callback(filename, frame_count, duration, file_size)
+        on `loop`, by default the loop running when this is called; file_size
+        is None if the clip could not be stat'ed.
+        """
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
         self._on_complete = callback
+        self._loop = loop
     
     def get_recordings_dir(self) -> Path:
         """Get the recordings directory path."""
@@ -209,12 +495,25 @@ class ClipRecorder:
 
 # Global recorder instance
 _recorder: Optional[ClipRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def recorder_enabled() -> bool:
+    """API-only replicas set VM_DISABLE_RECORDER=1 to never create a recorder."""
+    return os.getenv("VM_DISABLE_RECORDER", "0").lower() not in ("1", "true")
 
 
 def get_recorder() -> ClipRecorder:
-    """Get or create the global clip recorder."""
+    """
+    Get or create the global clip recorder.
+    Creation probes FFmpeg encoders (blocking); async callers use asyncio.to_thread.
+    """
     global _recorder
-    if _recorder is None:
+    if _recorder is not None:
+        return _recorder
+    with _recorder_lock:
+        if _recorder is not None:
+            return _recorder
         recordings_dir = os.getenv(
             "VM_RECORDINGS_DIR",
             str(Path(__file__).parent.parent.parent / "data" / "recordings")
@@ -224,5 +523,6 @@ def get_recorder() -> ClipRecorder:
             pre_seconds=int(os.getenv("VM_RECORDING_PRE_SECONDS", "5")),
             post_seconds=int(os.getenv("VM_RECORDING_POST_SECONDS", "10")),
             fps=int(os.getenv("VM_RECORDING_FPS", "15")),
+            encoder=os.getenv("VM_RECORDING_ENCODER", "auto") or None,
         )
     return _recorder
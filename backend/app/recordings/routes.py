@@ -1,15 +1,97 @@
 """
 API routes for recordings management.
 """
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
+import asyncio
+import os
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional
 
 from .storage import get_storage
-from .recorder import get_recorder
 
 router = APIRouter(prefix="/api/recordings", tags=["recordings"])
 
+# Read size for video streaming
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into inclusive (start, end).
+    Returns None for headers we answer with the full file (multiple ranges,
+    other units, malformed values); raises 416 for unsatisfiable ranges.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first + last).isdigit():
+        return None
+    
+    if not first:  # Suffix: last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+async def stream_mp4(path: Path, request: Request, filename: str) -> StreamingResponse:
+    """
+    Stream an MP4 with HTTP Range support.
+    The file is opened once, hinted for sequential reads, and read in
+    STREAM_CHUNK_SIZE blocks on worker threads. It is opened inside the
+    body generator, so a client that disconnects before streaming starts
+    never leaves a descriptor open.
+    """
+    size = (await asyncio.to_thread(os.stat, path)).st_size
+    byte_range = _parse_range(request.headers.get("range", ""), size)
+    start, end = byte_range or (0, size - 1)
+    
+    def open_range():
+        file = open(path, "rb")
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(file.fileno(), start, end - start + 1, os.POSIX_FADV_SEQUENTIAL)
+        file.seek(start)
+        return file
+    
+    async def body():
+        file = await asyncio.to_thread(open_range)
+        try:
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(file.read, min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            file.close()
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    return StreamingResponse(
+        body(),
+        status_code=206 if byte_range is not None else 200,
+        media_type="video/mp4",
+        headers=headers,
+    )
+
 
 @router.get("")
 async def list_recordings(
@@ -49,10 +131,19 @@ async def list_recording_files():
 @router.get("/status")
 async def get_recording_status():
     """Get current recording status."""
-    recorder = get_recorder()
+    # Imported here so workers serving only the listing/streaming routes
+    # never set up the recorder
+    from .recorder import get_recorder, recorder_enabled
+    
+    if not recorder_enabled():
+        return {"is_recording": False, "enabled": False}
+    
+    # The first call builds the recorder, which probes FFmpeg in subprocesses
+    recorder = await asyncio.to_thread(get_recorder)
     
     return {
         "is_recording": recorder.is_recording,
+        "enabled": True,
         "buffer_seconds": recorder.pre_seconds,
         "post_seconds": recorder.post_seconds,
         "fps": recorder.fps,
@@ -64,26 +155,19 @@ async def get_recording_status():
 async def get_recording(recording_id: str):
     """Get recording metadata by ID."""
     storage = get_storage()
-    recordings = await storage.get_recordings_from_db(limit=1000)
+    recording = await storage.get_recording_by_id(recording_id)
     
-    for rec in recordings:
-        if rec["id"] == recording_id:
-            return rec
+    if not recording:
+        raise HTTPException(status_code=404, detail="Recording not found")
     
-    raise HTTPException(status_code=404, detail="Recording not found")
+    return recording
 
 
 @router.get("/{recording_id}/video")
-async def stream_recording_video(recording_id: str):
+async def stream_recording_video(recording_id: str, request: Request):
     """Stream recording video file."""
     storage = get_storage()
-    recordings = await storage.get_recordings_from_db(limit=1000)
-    
-    recording = None
-    for rec in recordings:
-        if rec["id"] == recording_id:
-            recording = rec
-            break
+    recording = await storage.get_recording_by_id(recording_id)
     
     if not recording:
         raise HTTPException(status_code=404, detail="Recording not found")
@@ -93,15 +177,11 @@ async def stream_recording_video(recording_id: str):
     
     file_path = storage.get_file_path(recording["filename"])
     
-    return FileResponse(
-        path=str(file_path),
-        media_type="video/mp4",
-        filename=recording["filename"],
-    )
+    return await stream_mp4(file_path, request, recording["filename"])
 
 
 @router.get("/file/{filename}")
-async def stream_recording_by_filename(filename: str):
+async def stream_recording_by_filename(filename: str, request: Request):
     """Stream recording video by filename (direct file access)."""
     storage = get_storage()
     
@@ -110,11 +190,7 @@ async def stream_recording_by_filename(filename: str):
     
     file_path = storage.get_file_path(filename)
     
-    return FileResponse(
-        path=str(file_path),
-        media_type="video/mp4",
-        filename=filename,
-    )
+    return await stream_mp4(file_path, request, filename)
 
 
 @router.delete("/{recording_id}")
@@ -137,11 +213,13 @@ async def cleanup_recordings():
     
     deleted_old = storage.cleanup_old_files()
     deleted_size = storage.cleanup_by_size()
+    if deleted_size:
+        await storage.delete_recordings_by_filename(deleted_size)
     
     return {
         "status": "completed",
         "deleted_old": deleted_old,
-        "deleted_size": deleted_size,
-        "total_deleted": deleted_old + deleted_size,
+        "deleted_size": len(deleted_size),
+        "total_deleted": deleted_old + len(deleted_size),
         "current_size_mb": storage.get_total_size_mb(),
     }
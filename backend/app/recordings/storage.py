@@ -2,14 +2,25 @@
 Recording storage management for Argos.
 Handles file storage, cleanup, and database persistence.
 """
+import asyncio
 import json
 import os
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, List
 
 from app.database import get_db_context
-from app.models import RecordingModel
+from app.models import RecordingModel, generate_uuid
+
+
+# Recordings completed within this window are inserted together
+SAVE_BATCH_WINDOW = 1.0
+
+
+def _ts_to_iso(ts: float) -> str:
+    """Local-time ISO 8601 string (second precision) straight from a stat time."""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts))
 
 
 class RecordingStorage:
@@ -24,59 +35,96 @@ class RecordingStorage:
         # Storage limits
         self.max_storage_mb = int(os.getenv("VM_MAX_RECORDINGS_MB", "5000"))  # 5GB default
         self.max_age_days = int(os.getenv("VM_MAX_RECORDINGS_DAYS", "30"))
+        
+        # Directory scan cache: (scanned_at, dir_mtime, total_bytes, files, filenames)
+        self._stats_cache: Optional[tuple[float, float, int, List[dict], frozenset]] = None
+        self._stats_ttl = 5.0
+        
+        # Recordings waiting for the next bulk insert
+        self._pending_saves: List[dict] = []
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    def _invalidate(self):
+        """Drop the cached directory scan after the recordings change."""
+        self._stats_cache = None
+    
+    def _scan_or_cache(self) -> tuple[int, List[dict], frozenset]:
+        """
+        Total bytes, file infos (newest first) and filenames of the recordings directory.
+        Rescanned when the cache is older than _stats_ttl, the directory
+        mtime moved (a file was added or removed), or it was invalidated.
+        """
+        now = time.monotonic()
+        dir_mtime = self.base_dir.stat().st_mtime
+        cache = self._stats_cache
+        if cache is not None and now - cache[0] < self._stats_ttl and cache[1] == dir_mtime:
+            return cache[2], cache[3], cache[4]
+        
+        # One readdir; DirEntry.stat() is cached per entry
+        with os.scandir(self.base_dir) as it:
+            entries = [
+                (entry, entry.stat())
+                for entry in it
+                if entry.name.endswith(".mp4") and entry.is_file(follow_symlinks=False)
+            ]
+        
+        # Sort by creation time, newest first
+        entries.sort(key=lambda e: e[1].st_ctime, reverse=True)
+        files = [self._info_from_stat(entry.name, entry.path, stat) for entry, stat in entries]
+        total_bytes = sum(f["size_bytes"] for f in files)
+        filenames = frozenset(f["filename"] for f in files)
+        self._stats_cache = (now, dir_mtime, total_bytes, files, filenames)
+        return total_bytes, files, filenames
     
     def get_file_path(self, filename: str) -> Path:
         """Get full path for a recording file."""
         return self.base_dir / filename
     
     def file_exists(self, filename: str) -> bool:
-        """Check if a recording file exists."""
-        return self.get_file_path(filename).exists()
+        """
+        Check if a recording file exists, against the cached directory
+        snapshot (revalidated by the directory mtime, so new and deleted
+        files are seen immediately).
+        """
+        return filename in self._scan_or_cache()[2]
     
     def get_file_info(self, filename: str) -> Optional[dict]:
         """Get file info for a recording."""
         path = self.get_file_path(filename)
-        if not path.exists():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
             return None
         
-        stat = path.stat()
+        return self._info_from_stat(filename, str(path), stat)
+    
+    @staticmethod
+    def _info_from_stat(filename: str, path: str, stat: os.stat_result) -> dict:
         return {
             "filename": filename,
-            "path": str(path),
+            "path": path,
             "size_bytes": stat.st_size,
             "size_mb": round(stat.st_size / (1024 * 1024), 2),
-            "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-            "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "created_at": _ts_to_iso(stat.st_ctime),
+            "modified_at": _ts_to_iso(stat.st_mtime),
         }
     
     def list_files(self) -> List[dict]:
-        """List all recording files with info."""
-        files = []
-        for path in self.base_dir.glob("*.mp4"):
-            info = self.get_file_info(path.name)
-            if info:
-                files.append(info)
-        
-        # Sort by creation time, newest first
-        files.sort(key=lambda x: x["created_at"], reverse=True)
-        return files
+        """List all recording files with info, newest first."""
+        return list(self._scan_or_cache()[1])
     
     def get_total_size_mb(self) -> float:
         """Get total size of all recordings in MB."""
-        total_bytes = sum(
-            f.stat().st_size 
-            for f in self.base_dir.glob("*.mp4") 
-            if f.is_file()
-        )
-        return round(total_bytes / (1024 * 1024), 2)
+        return round(self._scan_or_cache()[0] / (1024 * 1024), 2)
     
     def delete_file(self, filename: str) -> bool:
         """Delete a recording file."""
-        path = self.get_file_path(filename)
-        if path.exists():
-            path.unlink()
-            return True
-        return False
+        try:
+            self.get_file_path(filename).unlink()
+        except FileNotFoundError:
+            return False
+        self._invalidate()
+        return True
     
     def cleanup_old_files(self) -> int:
         """
@@ -93,49 +141,162 @@ class RecordingStorage:
                     path.unlink()
                     deleted += 1
         
+        if deleted:
+            self._invalidate()
         return deleted
     
-    def cleanup_by_size(self) -> int:
+    def cleanup_by_size(self) -> List[str]:
         """
         Delete oldest recordings if total size exceeds limit.
-        Returns number of files deleted.
+        Returns the filenames deleted.
         """
-        files = self.list_files()
-        total_mb = self.get_total_size_mb()
-        deleted = 0
+        total_bytes, files, _ = self._scan_or_cache()
+        excess = total_bytes - self.max_storage_mb * 1024 * 1024
+        if excess <= 0:
+            return []
+        
+        # Files are sorted newest first: take the oldest until the excess is freed
+        to_delete = []
+        for info in reversed(files):
+            if excess <= 0:
+                break
+            to_delete.append(info["filename"])
+            excess -= info["size_bytes"]
         
-        # Files are sorted newest first, so we delete from the end
-        while total_mb > self.max_storage_mb and files:
-            oldest = files.pop()
-            self.delete_file(oldest["filename"])
-            total_mb -= oldest["size_mb"]
-            deleted += 1
+        deleted = []
+        for filename in to_delete:
+            try:
+                os.unlink(self.base_dir / filename)
+                deleted.append(filename)
+            except FileNotFoundError:
+                pass
         
+        self._invalidate()
+        return deleted
+    
+    async def delete_recordings_by_filename(self, filenames: List[str]) -> int:
+        """Delete the database rows of removed files. Returns rows deleted."""
+        from sqlalchemy import delete
+        
+        deleted = 0
+        async with get_db_context() as session:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(filenames), 500):
+                result = await session.execute(
+                    delete(RecordingModel).where(RecordingModel.filename.in_(filenames[i:i + 500]))
+                )
+                deleted += result.rowcount
         return deleted
     
+    def _recording_row(
+        self,
+        filename: str,
+        alert_id: Optional[str] = None,
+        duration_seconds: float = 0,
+        file_size_bytes: Optional[int] = None,
+    ) -> Optional[dict]:
+        """
+        Column values for a new recording row, or None if the file is missing.
+        The file is only stat'ed when the caller does not know its size.
+        """
+        if file_size_bytes is None:
+            file_info = self.get_file_info(filename)
+            if not file_info:
+                return None
+            file_size_bytes = file_info["size_bytes"]
+        return {
+            "id": generate_uuid(),
+            "alert_id": alert_id,
+            "filename": filename,
+            "duration_seconds": duration_seconds,
+            "file_size_bytes": file_size_bytes,
+        }
+    
     async def save_recording_to_db(
         self,
         filename: str,
         alert_id: Optional[str] = None,
         duration_seconds: float = 0,
+        file_size_bytes: Optional[int] = None,
     ) -> Optional[RecordingModel]:
         """Save recording metadata to database."""
-        file_info = self.get_file_info(filename)
-        if not file_info:
+        row = self._recording_row(filename, alert_id, duration_seconds, file_size_bytes)
+        if row is None:
             return None
+        # The clip finished growing after the last scan
+        self._invalidate()
         
+        # The id is generated client-side, so no flush/refresh round-trip is needed
         async with get_db_context() as session:
-            recording = RecordingModel(
-                alert_id=alert_id,
-                filename=filename,
-                path=file_info["path"],
-                duration_seconds=duration_seconds,
-                file_size_bytes=file_info["size_bytes"],
-            )
+            recording = RecordingModel(**row)
             session.add(recording)
-            await session.flush()
-            await session.refresh(recording)
-            return recording
+        return recording
+    
+    async def save_recordings_bulk(self, items: List[dict]) -> int:
+        """
+        Save several recordings in one INSERT.
+        
+        Args:
+            items: dicts with filename and optional alert_id, duration_seconds,
+                file_size_bytes
+        
+        Returns:
+            Number of rows inserted (missing files are skipped)
+        """
+        from sqlalchemy import insert
+        
+        rows = [row for item in items if (row := self._recording_row(**item)) is not None]
+        if not rows:
+            return 0
+        self._invalidate()
+        
+        async with get_db_context() as session:
+            await session.execute(insert(RecordingModel), rows)
+        return len(rows)
+    
+    async def queue_recording_save(
+        self,
+        filename: str,
+        alert_id: Optional[str] = None,
+        duration_seconds: float = 0,
+        file_size_bytes: Optional[int] = None,
+    ):
+        """
+        Queue a finished recording; everything queued within
+        SAVE_BATCH_WINDOW is saved with one bulk insert.
+        """
+        self._pending_saves.append({
+            "filename": filename,
+            "alert_id": alert_id,
+            "duration_seconds": duration_seconds,
+            "file_size_bytes": file_size_bytes,
+        })
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_saves())
+    
+    async def save_finished_clip(
+        self,
+        filename: str,
+        frame_count: int,
+        duration: float,
+        file_size: Optional[int] = None,
+    ):
+        """ClipRecorder.on_recording_complete adapter: queue the clip for saving."""
+        await self.queue_recording_save(
+            filename, duration_seconds=round(duration, 2), file_size_bytes=file_size,
+        )
+    
+    async def _flush_saves(self):
+        try:
+            await asyncio.sleep(SAVE_BATCH_WINDOW)
+            items, self._pending_saves = self._pending_saves, []
+        finally:
+            # Also when cancelled, so the next queued save schedules a new flush
+            self._flush_task = None
+        try:
+            await self.save_recordings_bulk(items)
+        except Exception as e:
+            print(f"❌ Error guardando {len(items)} grabaciones: {e}")
     
     async def get_recordings_from_db(
         self,
@@ -153,43 +314,54 @@ class RecordingStorage:
                 .offset(offset)
             )
             recordings = result.scalars().all()
-            
-            return [
-                {
-                    "id": r.id,
-                    "alert_id": r.alert_id,
-                    "filename": r.filename,
-                    "path": r.path,
-                    "duration_seconds": r.duration_seconds,
-                    "file_size_bytes": r.file_size_bytes,
-                    "resolution": f"{r.resolution_width}x{r.resolution_height}" if r.resolution_width else None,
-                    "created_at": r.created_at.isoformat() if r.created_at else None,
-                    "exists": self.file_exists(r.filename),
-                }
-                for r in recordings
-            ]
+        
+        # One directory snapshot instead of a stat per row
+        existing = self._scan_or_cache()[2]
+        return [self._recording_to_dict(r, r.filename in existing) for r in recordings]
     
-    async def delete_recording_from_db(self, recording_id: str) -> bool:
-        """Delete recording from database and filesystem."""
-        from sqlalchemy import select, delete
+    async def get_recording_by_id(self, recording_id: str) -> Optional[dict]:
+        """Get one recording by primary key, or None."""
+        from sqlalchemy import select
         
         async with get_db_context() as session:
             result = await session.execute(
                 select(RecordingModel).where(RecordingModel.id == recording_id)
             )
             recording = result.scalar_one_or_none()
+        if recording is None:
+            return None
+        return self._recording_to_dict(recording, self.file_exists(recording.filename))
+    
+    def _recording_to_dict(self, r: RecordingModel, exists: bool) -> dict:
+        return {
+            "id": r.id,
+            "alert_id": r.alert_id,
+            "filename": r.filename,
+            "path": str(self.get_file_path(r.filename)),
+            "duration_seconds": r.duration_seconds,
+            "file_size_bytes": r.file_size_bytes,
+            "resolution": f"{r.resolution_width}x{r.resolution_height}" if r.resolution_width else None,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+            "exists": exists,
+        }
+    
+    async def delete_recording_from_db(self, recording_id: str) -> bool:
+        """Delete recording from database and filesystem."""
+        from sqlalchemy import delete
+        
+        async with get_db_context() as session:
+            result = await session.execute(
+                delete(RecordingModel)
+                .where(RecordingModel.id == recording_id)
+                .returning(RecordingModel.filename)
+            )
+            filename = result.scalar_one_or_none()
             
-            if not recording:
+            if filename is None:
                 return False
             
             # Delete file
-            self.delete_file(recording.filename)
-            
-            # Delete from database
-            await session.execute(
-                delete(RecordingModel).where(RecordingModel.id == recording_id)
-            )
-            
+            self.delete_file(filename)
             return True
 
 
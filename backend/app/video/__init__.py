@@ -1,4 +1,7 @@
 """Package init for video module"""
-from app.video.sources import VideoSource, WebcamSource, IPCameraSource, create_video_source
+from app.video.sources import VideoSource, WebcamSource, IPCameraSource, SharedVideoSource, create_video_source
+from app.video.jpeg import encode_jpeg
 
-__all__ = ["VideoSource", "WebcamSource", "IPCameraSource", "create_video_source"]
+__all__ = [
+    "VideoSource", "WebcamSource", "IPCameraSource", "SharedVideoSource", "create_video_source", "encode_jpeg",
+]
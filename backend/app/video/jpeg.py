@@ -0,0 +1,44 @@
+"""
+Codificación JPEG para el stream de detecciones.
+
+Nota: PyTurboJPEG es opcional (pip install PyTurboJPEG, requiere libturbojpeg).
+Sin él se usa cv2.imencode con parámetros de una sola pasada.
+"""
+import cv2
+import numpy as np
+
+try:
+    from turbojpeg import TJSAMP_420, TurboJPEG
+    _turbo = TurboJPEG()  # Falla si falta la librería nativa
+except (ImportError, OSError, RuntimeError):
+    TJSAMP_420 = None
+    _turbo = None
+
+
+JPEG_QUALITY = 75
+
+
+def turbojpeg_available() -> bool:
+    """Verifica si PyTurboJPEG y libturbojpeg están disponibles"""
+    return _turbo is not None
+
+
+def encode_jpeg(frame: np.ndarray, quality: int = JPEG_QUALITY) -> bytes:
+    """
+    Codifica un frame BGR como JPEG.
+    
+    Usa libturbojpeg (Huffman/DCT con SIMD) si está instalado; si no,
+    cv2.imencode sin optimización de tablas Huffman ni modo progresivo,
+    que agregarían una segunda pasada sobre la imagen.
+    """
+    if _turbo is not None:
+        return _turbo.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420)
+    
+    ok, buffer = cv2.imencode('.jpg', frame, [
+        cv2.IMWRITE_JPEG_QUALITY, quality,
+        cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+        cv2.IMWRITE_JPEG_PROGRESSIVE, 0,
+    ])
+    if not ok:
+        raise ValueError("No se pudo codificar el frame como JPEG")
+    return buffer.tobytes()
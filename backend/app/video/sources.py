@@ -3,19 +3,128 @@ Manejadores de fuentes de video.
 Soporta webcam local y cámaras IP (celular).
 """
 import cv2
+import logging
 import numpy as np
+import sys
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 from typing import Generator
 import time
 import threading
-from queue import Queue, Empty
+from functools import lru_cache
+from urllib.parse import urlsplit
 
 from app.config import DetectionConfig, VideoSourceType
 
+logger = logging.getLogger(__name__)
+
+# Fuentes vivas por configuración, compartidas entre quienes piden la misma cámara
+_source_cache: dict[tuple, "_Broadcast"] = {}
+_source_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def gstreamer_available() -> bool:
+    """True si OpenCV fue compilado con el backend GStreamer"""
+    for line in cv2.getBuildInformation().splitlines():
+        if line.strip().startswith("GStreamer:"):
+            return "YES" in line
+    return False
+
+
+# Caracteres con significado en la sintaxis de gst-launch
+_PIPELINE_UNSAFE = frozenset('!"\'\\')
+
+
+def gstreamer_pipeline(url: str) -> str | None:
+    """
+    Pipeline GStreamer para una cámara IP, o None si la URL no aplica.
+    
+    Demux/decodificación corren en hilos de GStreamer (C, sin GIL) y
+    appsink drop=1 max-buffers=1 conserva solo el último frame, como el
+    slot único de IPCameraSource.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("rtsp", "http", "https") or not parts.netloc:
+        return None
+    # La URL va dentro de la descripción del pipeline: espacios, '!' o comillas
+    # permitirían inyectar elementos, así que esas URLs usan la captura normal
+    if any(c.isspace() or c in _PIPELINE_UNSAFE for c in url):
+        logger.warning("URL con caracteres no válidos para GStreamer, se usa captura estándar")
+        return None
+    sink = "videoconvert ! video/x-raw,format=BGR ! appsink drop=1 max-buffers=1 sync=false"
+    if parts.scheme == "rtsp":
+        return f'rtspsrc location="{url}" latency=0 ! decodebin ! {sink}'
+    # IP Webcam / DroidCam sirven MJPEG como multipart/x-mixed-replace
+    return f'souphttpsrc location="{url}" is-live=true ! multipartdemux ! jpegdec ! {sink}'
+
+
+# Load shedding del productor IP: si el consumidor deja sin recoger más de
+# DROP_RATE_HIGH de los frames publicados en una ventana, se espacian las
+# publicaciones; por debajo de DROP_RATE_LOW se vuelve a publicar todo
+SHED_WINDOW_SECONDS = 1.0
+DROP_RATE_HIGH = 0.3
+DROP_RATE_LOW = 0.1
+MIN_PUBLISH_INTERVAL = 0.01
+MAX_PUBLISH_INTERVAL = 0.2
+
+# Buffers de captura reciclables por fuente. Si todos siguen en uso (colas del
+# pipeline, grabador, tracker) el frame se lee en un array nuevo
+READ_BUFFERS = 8
+
+
+def _buffer_refs(buffers: list[np.ndarray], index: int) -> int:
+    return sys.getrefcount(buffers[index])
+
+
+# Referencias de un buffer que solo guarda el pool (lista + llamada de arriba),
+# medidas con el mismo camino de código para no depender de la versión de Python
+_IDLE_REFS = _buffer_refs([np.empty(0, dtype=np.uint8)], 0)
+
+
+class FramePool:
+    """
+    Buffers para cap.read(dst), así no se reservan ~2.6 MB por frame a 720p.
+    
+    Un buffer solo se reutiliza cuando nadie fuera del pool lo referencia:
+    cualquier vista, slice o cola que retenga el frame lo mantiene ocupado
+    (las vistas de numpy apuntan al buffer vía .base). Los consumidores
+    pueden guardar frames el tiempo que quieran; la captura nunca escribe
+    sobre uno que siga en uso.
+    """
+    
+    def __init__(self, size: int = READ_BUFFERS):
+        self.size = size
+        self._buffers: list[np.ndarray] = []
+    
+    def _free_index(self) -> int | None:
+        for i in range(len(self._buffers)):
+            if _buffer_refs(self._buffers, i) <= _IDLE_REFS:
+                return i
+        return None
+    
+    def read(self, cap: cv2.VideoCapture) -> tuple[bool, np.ndarray | None]:
+        index = self._free_index()
+        if index is None:
+            ret, frame = cap.read()
+            if ret and len(self._buffers) < self.size:
+                self._buffers.append(frame)  # Adoptar el array que reservó OpenCV
+            return ret, frame
+        
+        ret, frame = cap.read(self._buffers[index])
+        if ret and frame is not self._buffers[index]:
+            # Cambio de resolución: OpenCV reservó otro array, que pasa a ser el slot
+            self._buffers[index] = frame
+        return ret, frame
+
 
 class VideoSource(ABC):
     """Clase base abstracta para fuentes de video"""
     
+    # True si read() puede devolver el mismo array más de una vez; en ese caso
+    # los consumidores no deben dibujar sobre el frame in-place
+    reuses_frames: bool = False
+    
     @abstractmethod
     def start(self) -> bool:
         """Inicia la captura de video. Retorna True si fue exitoso."""
@@ -44,14 +153,21 @@ class VideoSource(ABC):
 
 
 class WebcamSource(VideoSource):
-    """Fuente de video desde webcam local"""
+    """
+    Fuente de video desde webcam local.
+    read() lee sobre un FramePool: el frame es del consumidor, que puede
+    retenerlo o dibujar sin copiar; su buffer no se recicla mientras exista.
+    """
     
     def __init__(self, camera_index: int = 0):
         self.camera_index = camera_index
         self.cap: cv2.VideoCapture | None = None
         self._frame_size: tuple[int, int] = (0, 0)
+        self._pool = FramePool()
         
     def start(self) -> bool:
+        if self.is_opened():
+            return True  # Compartida y ya iniciada
         self.cap = cv2.VideoCapture(self.camera_index)
         if not self.cap.isOpened():
             print(f"❌ No se pudo abrir webcam {self.camera_index}")
@@ -72,7 +188,7 @@ class WebcamSource(VideoSource):
     def read(self) -> tuple[bool, np.ndarray | None]:
         if self.cap is None:
             return False, None
-        return self.cap.read()
+        return self._pool.read(self.cap)
     
     def stop(self) -> None:
         if self.cap:
@@ -92,23 +208,55 @@ class IPCameraSource(VideoSource):
     """
     Fuente de video desde cámara IP (celular con IP Webcam, DroidCam, etc.)
     Usa un thread separado para buffering y evitar lag.
+    
+    read() entrega vistas de solo lectura de buffers del FramePool, que no se
+    reciclan mientras la vista (o cualquier otra referencia) exista: cada
+    frame es una instantánea estable que se puede retener, pero hay que
+    copiarla para dibujar encima.
     """
     
+    # Repite el último frame mientras reconecta: el mismo array puede llegar
+    # más de una vez (y a varios consumidores vía SharedVideoSource)
+    reuses_frames = True
+    
     def __init__(self, url: str):
         self.url = url
         self.cap: cv2.VideoCapture | None = None
         self._frame_size: tuple[int, int] = (0, 0)
         self._running = False
         self._thread: threading.Thread | None = None
-        self._frame_queue: Queue[np.ndarray] = Queue(maxsize=1)  # Buffer pequeño para menor latencia
+        # Slot único con el último frame: el productor solo reasigna la referencia
+        # (atómico bajo el GIL) y avisa por el Event, sin colas ni locks por frame
+        self._latest_frame: np.ndarray | None = None
+        self._frame_event = threading.Event()
         self._last_frame: np.ndarray | None = None
+        self._pool = FramePool()
         self._reconnect_delay = 5.0
+        self._last_warn_ts = 0.0
+        # Estadísticas de load shedding (solo las toca el hilo de captura)
+        self.dropped_frames = 0  # Frames publicados que el consumidor nunca leyó
+        self._window_start = time.monotonic()
+        self._window_published = 0
+        self._window_dropped = 0
+        self._publish_interval = 0.0
+        self._last_publish = 0.0
         
+    def _open_capture(self) -> cv2.VideoCapture:
+        """Abre la cámara con GStreamer si está disponible, si no autodetecta"""
+        pipeline = gstreamer_pipeline(self.url) if gstreamer_available() else None
+        if pipeline:
+            cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+            if cap.isOpened():
+                return cap
+            cap.release()
+            logger.warning("Pipeline GStreamer no disponible para %s, usando backend por defecto", self.url)
+        # Eliminar CAP_FFMPEG para que OpenCV autodetecte (match test_cam.py)
+        return cv2.VideoCapture(self.url)
+    
     def _connect(self) -> bool:
         """Intenta conectar a la cámara"""
         try:
-            # Eliminar CAP_FFMPEG para que OpenCV autodetecte (match test_cam.py)
-            cap = cv2.VideoCapture(self.url)
+            cap = self._open_capture()
             
             if not cap.isOpened():
                 return False
@@ -122,52 +270,94 @@ class IPCameraSource(VideoSource):
             self.cap = cap
             h, w = frame.shape[:2]
             self._frame_size = (w, h)
-            print(f"✅ Conectado a cámara IP {self.url} @ {w}x{h}")
+            logger.info("Conectado a cámara IP %s @ %dx%d", self.url, w, h)
             return True
             
         except Exception as e:
-            print(f"❌ Error conectando a cámara IP: {e}")
+            self._warn_throttled("Error conectando a cámara IP: %s", e)
             return False
 
+    def _warn_throttled(self, msg: str, *args) -> None:
+        """Warning como máximo una vez por _reconnect_delay; el resto queda en debug"""
+        now = time.monotonic()
+        if now - self._last_warn_ts >= self._reconnect_delay:
+            self._last_warn_ts = now
+            logger.warning(msg, *args)
+        else:
+            logger.debug(msg, *args)
+    
+    def _update_shedding(self, now: float) -> None:
+        """Ajusta el intervalo mínimo entre publicaciones según la tasa de descarte"""
+        if now - self._window_start < SHED_WINDOW_SECONDS:
+            return
+        if self._window_published:
+            drop_rate = self._window_dropped / self._window_published
+            if drop_rate > DROP_RATE_HIGH:
+                self._publish_interval = min(
+                    MAX_PUBLISH_INTERVAL, max(MIN_PUBLISH_INTERVAL, self._publish_interval * 1.5)
+                )
+            elif drop_rate < DROP_RATE_LOW:
+                self._publish_interval *= 0.5
+                if self._publish_interval < MIN_PUBLISH_INTERVAL:
+                    self._publish_interval = 0.0
+        self._window_start = now
+        self._window_published = 0
+        self._window_dropped = 0
+    
     def _capture_loop(self) -> None:
         """Thread de captura continua con reconexión automática"""
-        print(f"🔄 Iniciando loop de captura para: {self.url}")
+        logger.info("Iniciando loop de captura para: %s", self.url)
         
         while self._running:
             if self.cap is None or not self.cap.isOpened():
                 if self._connect():
-                    print(f"✅ Reconexión exitosa a: {self.url}")
+                    logger.info("Reconexión exitosa a: %s", self.url)
                 else:
                     time.sleep(self._reconnect_delay)
                     continue
             
             try:
-                ret, frame = self.cap.read()
-                if ret:
-                    # Siempre mantener solo el último frame
-                    if self._frame_queue.full():
-                        try:
-                            self._frame_queue.get_nowait()
-                        except Empty:
-                            pass
-                    self._frame_queue.put(frame)
+                now = time.monotonic()
+                self._update_shedding(now)
+                if self._publish_interval and now - self._last_publish < self._publish_interval:
+                    # Consumidor saturado: grab() drena el stream (sin acumular
+                    # latencia) pero se ahorra retrieve/conversión del frame
+                    ret, frame = self.cap.grab(), None
                 else:
+                    # El pool solo recicla buffers sin referencias: el hilo corre al
+                    # ritmo de la cámara sin escribir sobre un frame aún en uso
+                    ret, frame = self._pool.read(self.cap)
+                if not ret:
                     # Fallo de lectura, forzar reconexión
-                    print("⚠️ Fallo lectura de frame, reconectando...")
+                    self._warn_throttled("Fallo lectura de frame, reconectando...")
                     self.cap.release()
                     self.cap = None
                     time.sleep(1.0)
+                elif frame is not None:
+                    # Siempre mantener solo el último frame
+                    self._latest_frame = frame
+                    self._last_publish = now
+                    self._window_published += 1
+                    # is_set() no toma el lock del Event: si el consumidor aún
+                    # no recogió el anterior, publicar es solo reasignar
+                    if self._frame_event.is_set():
+                        self._window_dropped += 1
+                        self.dropped_frames += 1
+                    else:
+                        self._frame_event.set()
             except Exception as e:
-                print(f"❌ Error en captura: {e}")
+                self._warn_throttled("Error en captura: %s", e)
                 if self.cap:
                     self.cap.release()
                     self.cap = None
                 time.sleep(1.0)
     
     def start(self) -> bool:
+        if self._running:
+            return True  # Compartida y ya iniciada
         # Intentar conexión inicial
         if not self._connect():
-            print(f"⚠️ No se pudo conectar inicialmente a: {self.url}. Reintentando en background...")
+            logger.warning("No se pudo conectar inicialmente a: %s. Reintentando en background...", self.url)
             # No fallamos aquí para permitir que el loop de reintento funcione
             
         self._running = True
@@ -177,16 +367,20 @@ class IPCameraSource(VideoSource):
         return True
     
     def read(self) -> tuple[bool, np.ndarray | None]:
-        try:
-            # Timeout corto para no bloquear
-            frame = self._frame_queue.get(timeout=0.1)
+        # Timeout corto para no bloquear
+        if self._frame_event.wait(0.1):
+            # Limpiar antes de leer: un frame publicado entremedio deja el evento activo
+            self._frame_event.clear()
+            # Solo lectura porque el mismo array se repite y se comparte, no porque
+            # cambie: el pool no recicla un buffer referenciado. Para dibujar, copiar
+            frame = self._latest_frame.view()
+            frame.flags.writeable = False
             self._last_frame = frame
             return True, frame
-        except Empty:
-            # Retornar último frame conocido mientras reconecta
-            if self._last_frame is not None:
-                return True, self._last_frame
-            return False, None
+        # Retornar último frame conocido mientras reconecta
+        if self._last_frame is not None:
+            return True, self._last_frame
+        return False, None
     
     def stop(self) -> None:
         self._running = False
@@ -196,7 +390,7 @@ class IPCameraSource(VideoSource):
         if self.cap:
             self.cap.release()
             self.cap = None
-        print("🛑 Cámara IP desconectada")
+        logger.info("Cámara IP desconectada")
     
     def is_opened(self) -> bool:
         return self._running
@@ -206,11 +400,103 @@ class IPCameraSource(VideoSource):
         return self._frame_size
 
 
+@dataclass(slots=True, eq=False)
+class _Broadcast:
+    """Fuente abierta compartida por los SharedVideoSource de una misma cámara"""
+    source: VideoSource
+    key: tuple
+    refs: int = 0
+    seq: int = 0  # Se incrementa con cada frame nuevo de la fuente
+    frame: np.ndarray | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class SharedVideoSource(VideoSource):
+    """
+    Handle por consumidor sobre una fuente compartida.
+    
+    Cada handle recuerda el último seq que entregó: si la fuente ya avanzó
+    recibe el frame publicado sin leer; si no, lee él y lo publica para el
+    resto. Así todos los consumidores ven cada frame y ninguno roba el
+    Event ni el frame de otro.
+    """
+    
+    def __init__(self, broadcast: _Broadcast):
+        self._broadcast = broadcast
+        self._seen: int | None = None
+        self._exclusive = False
+        self._stopped = False
+    
+    @property
+    def reuses_frames(self) -> bool:
+        # Un frame solo es de este consumidor si nadie más comparte la fuente
+        return not self._exclusive
+    
+    def start(self) -> bool:
+        return self._broadcast.source.start()
+    
+    def read(self) -> tuple[bool, np.ndarray | None]:
+        b = self._broadcast
+        with b.lock:
+            if self._seen is None:
+                self._seen = b.seq  # Un consumidor nuevo espera el siguiente frame
+            if b.seq == self._seen:
+                ret, frame = b.source.read()
+                if not ret:
+                    return False, None
+                if frame is not b.frame:
+                    b.frame = frame
+                    b.seq += 1
+                    self._exclusive = b.refs == 1 and not b.source.reuses_frames
+                else:
+                    self._exclusive = False
+            else:
+                self._exclusive = False
+            self._seen = b.seq
+            return True, b.frame
+    
+    def stop(self) -> None:
+        b = self._broadcast
+        with _source_cache_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            b.refs -= 1
+            if b.refs:
+                return
+            if _source_cache.get(b.key) is b:
+                del _source_cache[b.key]
+        b.source.stop()
+    
+    def is_opened(self) -> bool:
+        return not self._stopped and self._broadcast.source.is_opened()
+    
+    @property
+    def frame_size(self) -> tuple[int, int]:
+        return self._broadcast.source.frame_size
+
+
 def create_video_source(config: DetectionConfig) -> VideoSource:
-    """Factory function para crear la fuente de video según configuración"""
-    if config.video_source == VideoSourceType.IP_CAMERA:
-        if not config.ip_camera_url:
-            raise ValueError("URL de cámara IP no configurada")
-        return IPCameraSource(config.ip_camera_url)
-    else:
-        return WebcamSource(config.webcam_index)
+    """
+    Factory function para crear la fuente de video según configuración.
+    
+    Devuelve un SharedVideoSource por consumidor: si ya hay una fuente para
+    la misma cámara se reutiliza (start() es idempotente) en vez de reabrir
+    el VideoCapture. Cada handle debe cerrarse con stop(); el último cierra
+    la cámara.
+    """
+    if config.video_source == VideoSourceType.IP_CAMERA and not config.ip_camera_url:
+        raise ValueError("URL de cámara IP no configurada")
+    
+    key = (config.video_source, config.webcam_index, config.ip_camera_url)
+    with _source_cache_lock:
+        broadcast = _source_cache.get(key)
+        if broadcast is None:
+            if config.video_source == VideoSourceType.IP_CAMERA:
+                source = IPCameraSource(config.ip_camera_url)
+            else:
+                source = WebcamSource(config.webcam_index)
+            broadcast = _Broadcast(source, key)
+            _source_cache[key] = broadcast
+        broadcast.refs += 1
+        return SharedVideoSource(broadcast)
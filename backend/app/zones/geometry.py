@@ -3,10 +3,48 @@ Zona geometry system for geofencing.
 Detecta si objetos están dentro de zonas definidas.
 """
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Sequence
 from enum import Enum
-from shapely.geometry import Point, Polygon
-from shapely.prepared import prep
+import numpy as np
+
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+if _HAS_NUMBA:
+    # Sin fastmath: el test de borde compara el producto cruz con 0 exacto
+    @njit(cache=True)
+    def _points_in_polygon(xs, ys, px, py):
+        """
+        Crossing number (ray-cast) de cada punto contra un polígono simple.
+        Los puntos sobre un lado quedan fuera, igual que shapely.contains_xy.
+        """
+        inside = np.zeros(xs.shape[0], np.bool_)
+        n = px.shape[0]
+        for k in range(xs.shape[0]):
+            x = xs[k]
+            y = ys[k]
+            crossings = False
+            on_edge = False
+            j = n - 1
+            for i in range(n):
+                cross = (px[j] - px[i]) * (y - py[i]) - (py[j] - py[i]) * (x - px[i])
+                if (
+                    cross == 0.0
+                    and min(px[i], px[j]) <= x <= max(px[i], px[j])
+                    and min(py[i], py[j]) <= y <= max(py[i], py[j])
+                ):
+                    on_edge = True
+                    break
+                if (py[i] > y) != (py[j] > y):
+                    if x < (px[j] - px[i]) * (y - py[i]) / (py[j] - py[i]) + px[i]:
+                        crossings = not crossings
+                j = i
+            inside[k] = crossings and not on_edge
+        return inside
 
 
 class ZoneType(str, Enum):
@@ -46,7 +84,7 @@ class Zone:
         )
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ZoneEvent:
     """Evento cuando un objeto entra/sale de una zona"""
     tracker_id: int
@@ -69,6 +107,10 @@ class ZoneEvent:
         }
 
 
+# Zonas previas de un tracker nuevo (evita crear un set vacío por objeto)
+_NO_ZONES: frozenset[str] = frozenset()
+
+
 class ZoneManager:
     """
     Administra zonas y detecta cuándo objetos entran/salen.
@@ -76,28 +118,71 @@ class ZoneManager:
     
     def __init__(self):
         self.zones: dict[str, Zone] = {}
-        self._prepared_polygons: dict[str, Any] = {}
-        self._object_zones: dict[int, set[str]] = {}  # tracker_id -> set of zone_ids
+        # Polígonos shapely preparados para contains_xy; solo sin numba
+        self._polygons: dict[str, Any] = {}
+        self._bboxes: dict[str, tuple[float, float, float, float]] = {}  # minx, miny, maxx, maxy
+        self._poly_arrays: dict[str, tuple[np.ndarray, np.ndarray]] = {}  # Vértices para el ray-cast
+        self._poly_keys: dict[str, tuple] = {}  # Vértices con los que se preparó cada zona
+        # Bounding boxes empaquetados (Z, 4) float32 en el orden de _zone_order
+        self._zone_order: list[str] = []
+        self._bbox_array = np.empty((0, 4), dtype=np.float32)
+        self._object_zones: dict[int, frozenset[str]] = {}  # tracker_id -> set of zone_ids
+        # Conjuntos de zonas internados: membresías iguales comparten objeto
+        self._zone_set_pool: dict[frozenset[str], frozenset[str]] = {_NO_ZONES: _NO_ZONES}
     
     def add_zone(self, zone: Zone) -> None:
         """Agrega o actualiza una zona"""
         self.zones[zone.id] = zone
-        # Pre-preparar polígono para queries rápidas
-        poly = Polygon(zone.polygon)
-        self._prepared_polygons[zone.id] = prep(poly)
+        # Misma geometría (p.ej. solo cambió enabled o color): reusar lo preparado
+        key = tuple(map(tuple, zone.polygon))
+        if self._poly_keys.get(zone.id) == key:
+            return
+        self._poly_keys[zone.id] = key
+        coords = np.asarray(zone.polygon, dtype=np.float64)
+        self._bboxes[zone.id] = (*coords.min(axis=0), *coords.max(axis=0))
+        if not _HAS_NUMBA:
+            # shapely (GEOS) se importa solo si hace falta el test exacto de respaldo
+            import shapely
+            # Pre-preparar polígono para queries rápidas
+            poly = shapely.Polygon(coords)
+            shapely.prepare(poly)
+            self._polygons[zone.id] = poly
+        self._poly_arrays[zone.id] = (
+            np.ascontiguousarray(coords[:, 0]), np.ascontiguousarray(coords[:, 1]),
+        )
+        self._pack_bboxes()
+    
+    def _pack_bboxes(self) -> None:
+        """Reconstruye la matriz de bounding boxes tras cambiar la geometría"""
+        # Las membresías internadas pueden nombrar zonas que ya no existen
+        self._zone_set_pool = {_NO_ZONES: _NO_ZONES}
+        self._zone_order = list(self._bboxes)
+        bboxes = np.array(list(self._bboxes.values()), dtype=np.float32).reshape(-1, 4)
+        # Redondear hacia afuera: el prefiltro en float32 nunca debe descartar un punto válido
+        bboxes[:, :2] = np.nextafter(bboxes[:, :2], np.float32(-np.inf))
+        bboxes[:, 2:] = np.nextafter(bboxes[:, 2:], np.float32(np.inf))
+        self._bbox_array = bboxes
     
     def remove_zone(self, zone_id: str) -> bool:
         """Elimina una zona"""
         if zone_id in self.zones:
             del self.zones[zone_id]
-            del self._prepared_polygons[zone_id]
+            self._polygons.pop(zone_id, None)
+            del self._bboxes[zone_id]
+            del self._poly_arrays[zone_id]
+            del self._poly_keys[zone_id]
+            self._pack_bboxes()
             return True
         return False
     
     def clear_zones(self) -> None:
         """Elimina todas las zonas"""
         self.zones.clear()
-        self._prepared_polygons.clear()
+        self._polygons.clear()
+        self._bboxes.clear()
+        self._poly_arrays.clear()
+        self._poly_keys.clear()
+        self._pack_bboxes()
         self._object_zones.clear()
     
     def get_zones(self) -> list[Zone]:
@@ -122,17 +207,46 @@ class ZoneManager:
             Lista de zonas que contienen el punto
         """
         # Normalizar coordenadas a 0-1
-        norm_x = x / frame_width
-        norm_y = y / frame_height
-        point = Point(norm_x, norm_y)
+        return self.check_normalized_point(x * (1.0 / frame_width), y * (1.0 / frame_height))
+    
+    def check_normalized_point(self, x: float, y: float) -> list[Zone]:
+        """Como check_point, para coordenadas ya normalizadas (0-1)"""
+        masks = self._zone_masks(np.array([x]), np.array([y]))
+        return [self.zones[zone_id] for zone_id, mask in masks if mask[0]]
+    
+    def _zone_masks(
+        self,
+        xs: np.ndarray,
+        ys: np.ndarray,
+    ) -> list[tuple[str, np.ndarray]]:
+        """
+        Máscara booleana (N,) por zona habilitada para puntos normalizados.
         
-        zones_containing: list[Zone] = []
-        for zone_id, prepared in self._prepared_polygons.items():
-            zone = self.zones[zone_id]
-            if zone.enabled and prepared.contains(point):
-                zones_containing.append(zone)
+        Un único broadcast contra la matriz de bounding boxes da la matriz
+        (N, Z) de candidatos; solo esos llegan al test exacto: ray-cast
+        compilado con numba si está instalado, si no shapely.contains_xy.
+        """
+        if not _HAS_NUMBA:
+            import shapely
+        bb = self._bbox_array
+        x = xs[:, None]
+        y = ys[:, None]
+        candidates = (x >= bb[:, 0]) & (x <= bb[:, 2]) & (y >= bb[:, 1]) & (y <= bb[:, 3])
         
-        return zones_containing
+        masks: list[tuple[str, np.ndarray]] = []
+        for zi, zone_id in enumerate(self._zone_order):
+            if not self.zones[zone_id].enabled:
+                continue
+            mask = candidates[:, zi]
+            idx = np.flatnonzero(mask)
+            if len(idx):
+                if _HAS_NUMBA:
+                    px, py = self._poly_arrays[zone_id]
+                    mask[idx] = _points_in_polygon(xs[idx], ys[idx], px, py)
+                else:
+                    mask[idx] = shapely.contains_xy(self._polygons[zone_id], xs[idx], ys[idx])
+            masks.append((zone_id, mask))
+        return masks
     
     def check_objects(
         self,
@@ -153,63 +267,88 @@ class ZoneManager:
         Returns:
             Lista de eventos de zona
         """
+        n = len(objects)
+        return self.check_objects_numpy(
+            [o["tracker_id"] for o in objects],
+            np.fromiter((o["bottom_center"][0] for o in objects), dtype=np.float64, count=n),
+            np.fromiter((o["bottom_center"][1] for o in objects), dtype=np.float64, count=n),
+            [o["class_name_es"] for o in objects],
+            frame_width,
+            frame_height,
+            timestamp,
+        )
+    
+    def check_objects_numpy(
+        self,
+        tracker_ids: Sequence[int] | np.ndarray,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        class_names: Sequence[str],
+        frame_width: int,
+        frame_height: int,
+        timestamp: float,
+    ) -> list[ZoneEvent]:
+        """
+        Igual que check_objects, con los objetos en columnas paralelas
+        (sin construir un dict por objeto).
+        
+        Args:
+            tracker_ids: IDs de tracking (N,)
+            xs, ys: Punto inferior central de cada objeto en píxeles (N,)
+            class_names: Nombre de clase en español de cada objeto
+            frame_width, frame_height: Tamaño del frame
+            timestamp: Timestamp actual
+            
+        Returns:
+            Lista de eventos de zona
+        """
+        if isinstance(tracker_ids, np.ndarray):
+            tracker_ids = tracker_ids.tolist()  # ints nativos para claves y JSON
+        
         events: list[ZoneEvent] = []
-        current_object_zones: dict[int, set[str]] = {}
+        current_object_zones: dict[int, frozenset[str]] = {}
+        
+        # Todas las zonas contra todos los puntos en una sola consulta vectorizada
+        xs = np.array(xs, dtype=np.float64)  # Copia: se escala in-place
+        ys = np.array(ys, dtype=np.float64)
+        xs *= 1.0 / frame_width
+        ys *= 1.0 / frame_height
+        masks = self._zone_masks(xs, ys)
         
-        for obj in objects:
-            tracker_id = obj["tracker_id"]
-            bottom = obj["bottom_center"]
-            x, y = bottom[0], bottom[1]
+        zones = self.zones
+        pool = self._zone_set_pool
+        for i, tracker_id in enumerate(tracker_ids):
+            class_name = class_names[i]
             
             # Verificar zonas
-            containing_zones = self.check_point(x, y, frame_width, frame_height)
-            current_zones = {z.id for z in containing_zones}
+            key = frozenset(zone_id for zone_id, mask in masks if mask[i])
+            current_zones = pool.setdefault(key, key)
             current_object_zones[tracker_id] = current_zones
+            previous_zones = self._object_zones.get(tracker_id, _NO_ZONES)
             
-            # Verificar cambios respecto a frame anterior
-            previous_zones = self._object_zones.get(tracker_id, set())
-            
-            # Nuevas entradas
-            entered_zones = current_zones - previous_zones
-            for zone_id in entered_zones:
-                zone = self.zones[zone_id]
-                events.append(ZoneEvent(
-                    tracker_id=tracker_id,
-                    class_name=obj["class_name_es"],
-                    zone_id=zone_id,
-                    zone_name=zone.name,
-                    zone_type=zone.zone_type,
-                    event_type="enter",
-                    timestamp=timestamp,
-                ))
+            if current_zones is previous_zones:
+                # Misma membresía (mismo objeto internado): todo es "inside"
+                for zone_id in current_zones:
+                    zone = zones[zone_id]
+                    events.append(ZoneEvent(
+                        tracker_id, class_name, zone_id, zone.name, zone.zone_type, "inside", timestamp,
+                    ))
+                continue
             
-            # Objetos que siguen dentro
-            still_inside = current_zones & previous_zones
-            for zone_id in still_inside:
-                zone = self.zones[zone_id]
+            # Entradas/permanencias y luego salidas, sin conjuntos intermedios
+            for zone_id in current_zones:
+                zone = zones[zone_id]
+                event_type = "inside" if zone_id in previous_zones else "enter"
                 events.append(ZoneEvent(
-                    tracker_id=tracker_id,
-                    class_name=obj["class_name_es"],
-                    zone_id=zone_id,
-                    zone_name=zone.name,
-                    zone_type=zone.zone_type,
-                    event_type="inside",
-                    timestamp=timestamp,
+                    tracker_id, class_name, zone_id, zone.name, zone.zone_type, event_type, timestamp,
                 ))
-            
-            # Salidas
-            exited_zones = previous_zones - current_zones
-            for zone_id in exited_zones:
-                if zone_id in self.zones:  # Zona podría haber sido eliminada
-                    zone = self.zones[zone_id]
+            for zone_id in previous_zones:
+                if zone_id in current_zones:
+                    continue
+                zone = zones.get(zone_id)
+                if zone is not None:  # Zona podría haber sido eliminada
                     events.append(ZoneEvent(
-                        tracker_id=tracker_id,
-                        class_name=obj["class_name_es"],
-                        zone_id=zone_id,
-                        zone_name=zone.name,
-                        zone_type=zone.zone_type,
-                        event_type="exit",
-                        timestamp=timestamp,
+                        tracker_id, class_name, zone_id, zone.name, zone.zone_type, "exit", timestamp,
                     ))
         
         # Actualizar estado
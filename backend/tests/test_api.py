@@ -40,6 +40,21 @@ class TestConfig:
         assert data["status"] == "updated"
         assert "config" in data
 
+    @pytest.mark.asyncio
+    async def test_update_performance_fields(self, client: AsyncClient):
+        """Test inference and rendering options can be changed through the API."""
+        update = {
+            "imgsz": 320, "use_tensorrt": True, "gpu_preprocess": True,
+            "torch_compile": True, "warmup_iters": 0, "render_on_server": False,
+        }
+        try:
+            response = await client.put("/api/config", json=update)
+            assert response.status_code == 200
+            config = response.json()["config"]
+            assert {key: config[key] for key in update} == update
+        finally:
+            await client.post("/api/config/reset")
+
 
 class TestZones:
     """Zone endpoint tests."""
@@ -0,0 +1,221 @@
+"""
+Tests for DeepLabCut frame batching.
+"""
+import asyncio
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import app.detection.deeplabcut_detector as dlc_module
+from app.detection import Detection
+from app.detection.deeplabcut_detector import (
+    IMAGENET_MEAN,
+    IMAGENET_STD,
+    MAX_BATCH_SIZE,
+    TRT_INPUT_SIZE,
+    DeepLabCutDetector,
+    FrameBatcher,
+)
+
+
+class TestFrameBatcher:
+    """FrameBatcher grouping tests."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_frames_share_one_batch(self):
+        """Test frames submitted together are predicted in a single call."""
+        calls = []
+
+        def predict(frames):
+            calls.append(len(frames))
+            return [int(frame[0, 0, 0]) for frame in frames]
+
+        batcher = FrameBatcher(predict, batch_size=4)
+        frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(4)]
+        results = await asyncio.gather(*(batcher.submit(f) for f in frames))
+
+        assert results == [0, 1, 2, 3]
+        assert calls == [4]
+
+    @pytest.mark.asyncio
+    async def test_partial_batch_flushes_on_timeout(self):
+        """Test a lone frame is not held back waiting for a full batch."""
+        batcher = FrameBatcher(lambda frames: ["ok"] * len(frames), batch_size=8)
+        result = await asyncio.wait_for(batcher.submit(np.zeros((4, 4, 3))), 1.0)
+        assert result == "ok"
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_callers(self):
+        """Test a failing batch raises in every waiting caller."""
+
+        def predict(frames):
+            raise RuntimeError("boom")
+
+        batcher = FrameBatcher(predict, batch_size=2)
+        with pytest.raises(RuntimeError):
+            await batcher.submit(np.zeros((4, 4, 3)))
+
+    @pytest.mark.asyncio
+    async def test_pipelined_batches_overlap(self):
+        """Test max_inflight lets consecutive batches run concurrently."""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def predict(frames):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+            return [None] * len(frames)
+
+        batcher = FrameBatcher(predict, batch_size=1)
+        batcher.set_max_inflight(2)
+        await asyncio.gather(*(batcher.submit(np.zeros((4, 4, 3))) for _ in range(2)))
+
+        assert max(peak) == 2
+
+    @pytest.mark.asyncio
+    async def test_lone_frame_does_not_wait_for_window(self):
+        """Test a frame submitted while idle is predicted on the next loop iteration."""
+        batcher = FrameBatcher(lambda frames: ["ok"] * len(frames), batch_size=8, timeout_s=10.0)
+        result = await asyncio.wait_for(batcher.submit(np.zeros((4, 4, 3))), 1.0)
+        assert result == "ok"
+
+    @pytest.mark.asyncio
+    async def test_frames_queue_behind_running_batch(self):
+        """Test frames arriving during a batch are flushed together when it finishes."""
+        calls = []
+        release = threading.Event()
+
+        def predict(frames):
+            calls.append(len(frames))
+            if len(calls) == 1:
+                release.wait(1.0)
+            return [None] * len(frames)
+
+        batcher = FrameBatcher(predict, batch_size=8, timeout_s=10.0)
+        first = batcher.submit(np.zeros((4, 4, 3)))
+        await asyncio.sleep(0.05)
+        rest = [batcher.submit(np.zeros((4, 4, 3))) for _ in range(3)]
+        release.set()
+        await asyncio.wait_for(asyncio.gather(first, *rest), 1.0)
+
+        assert calls == [1, 3]
+
+    def test_direct_predict_respects_inflight_limit(self):
+        """Test synchronous predict calls share the in-flight semaphore with queued batches."""
+        batcher = FrameBatcher(lambda frames: frames, batch_size=2)
+        with batcher._inflight:
+            caller = threading.Thread(target=batcher.predict, args=([1],))
+            caller.start()
+            caller.join(0.05)
+            assert caller.is_alive()
+        caller.join(1.0)
+        assert not caller.is_alive()
+
+    def test_batch_size_is_capped(self):
+        """Test oversized batches are clamped."""
+        batcher = FrameBatcher(lambda frames: frames, batch_size=64)
+        assert batcher.batch_size == MAX_BATCH_SIZE
+
+
+class TestPoseArray:
+    """Runner array output post-processing tests."""
+
+    def test_low_confidence_individuals_are_dropped(self):
+        """Test only individuals with enough confident keypoints are kept."""
+        bodyparts = np.zeros((2, 6, 3), dtype=np.float32)
+        bodyparts[0, :, 0] = np.arange(6) * 10 + 50
+        bodyparts[0, :, 1] = 60
+        bodyparts[0, :, 2] = 0.9
+        bodyparts[1, :, 2] = 0.1
+
+        detector = DeepLabCutDetector.__new__(DeepLabCutDetector)
+        detections = detector._process_poses({"bodyparts": bodyparts}, (200, 200, 3))
+
+        assert len(detections) == 1
+        assert detections[0].bbox == (30, 40, 120, 80)
+        assert len(detections[0].keypoints) == 6
+        assert detections[0].confidence == pytest.approx(0.9)
+
+    def test_decode_heatmaps_scales_to_frame(self):
+        """Test heatmap peaks are mapped back into frame coordinates."""
+        heatmaps = np.zeros((2, 8, 8), dtype=np.float32)
+        heatmaps[0, 2, 3] = 0.8
+        heatmaps[1, 7, 0] = 0.6
+
+        poses = DeepLabCutDetector._decode_heatmaps(heatmaps, (160, 80, 3))
+
+        assert poses.shape == (1, 2, 3)
+        np.testing.assert_allclose(poses[0, 0], [35, 50, 0.8], rtol=1e-6)
+        np.testing.assert_allclose(poses[0, 1], [5, 150, 0.6], rtol=1e-6)
+
+    def test_keypoints_are_materialized_lazily(self):
+        """Test DLC detections keep keypoints as an array until read."""
+        bodyparts = np.zeros((1, 6, 3), dtype=np.float32)
+        bodyparts[0, :, 0] = np.arange(6) * 10 + 50
+        bodyparts[0, :, 2] = 0.9
+
+        detector = DeepLabCutDetector.__new__(DeepLabCutDetector)
+        detection = detector._process_poses({"bodyparts": bodyparts}, (200, 200, 3))[0]
+
+        assert detection._keypoints is None
+        assert detection.num_keypoints == 6
+        assert detection.to_dict()["keypoints"][1] == {"x": 60, "y": 0, "confidence": 0.9, "name": "1"}
+
+
+class TestPreprocessing:
+    """TensorRT input preprocessing tests."""
+
+    def test_preprocess_matches_reference(self):
+        """Test buffered preprocessing equals the straightforward version."""
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 255, (120, 160, 3), dtype=np.uint8)
+        out = np.empty((3, TRT_INPUT_SIZE, TRT_INPUT_SIZE), dtype=np.float32)
+
+        DeepLabCutDetector()._preprocess_into(frame, out)
+
+        rgb = cv2.cvtColor(cv2.resize(frame, (TRT_INPUT_SIZE, TRT_INPUT_SIZE)), cv2.COLOR_BGR2RGB)
+        expected = (rgb.transpose(2, 0, 1) / 255.0 - IMAGENET_MEAN) / IMAGENET_STD
+        np.testing.assert_allclose(out, expected, atol=1e-5)
+
+    def test_calibration_batches_from_frames(self, tmp_path, monkeypatch):
+        """Test calibration frames are grouped into full preprocessed batches."""
+        model_dir = tmp_path / "superanimal_quadruped"
+        model_dir.mkdir()
+        for i in range(10):
+            cv2.imwrite(str(model_dir / f"{i}.png"), np.full((40, 60, 3), i, dtype=np.uint8))
+        monkeypatch.setattr(dlc_module, "CALIBRATION_DIR", tmp_path)
+
+        batches = DeepLabCutDetector()._calibration_batches("superanimal_quadruped")
+
+        assert len(batches) == 1
+        assert batches[0].shape == (dlc_module.CALIBRATION_BATCH, 3, TRT_INPUT_SIZE, TRT_INPUT_SIZE)
+
+    def test_invalid_precision_is_rejected(self):
+        """Test unknown precision names fail fast."""
+        with pytest.raises(ValueError):
+            DeepLabCutDetector(precision="int4")
+
+
+class TestCapabilities:
+    """Capability reporting tests."""
+
+    def test_tensorrt_path_is_single_animal(self):
+        """Test an active engine reports single-animal pose at its measured rate."""
+        detector = DeepLabCutDetector()
+        caps = detector.get_capabilities()
+        assert caps.supports_multi_animal and caps.max_fps == dlc_module.DEFAULT_MAX_FPS
+
+        detector._trt_engine, detector._trt_fps = object(), 42
+        caps = detector.get_capabilities()
+        assert not caps.supports_multi_animal and caps.max_fps == 42
+
+        detector._reset_trt_engine()
+        assert detector.get_capabilities().supports_multi_animal
@@ -0,0 +1,320 @@
+"""
+Tests for the multi-backend FusionEngine.
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from app.detection import (
+    BackendCapabilities,
+    BackendType,
+    BaseDetector,
+    Detection,
+    DetectionResult,
+    FusionConfig,
+    FusionEngine,
+    FusionStrategy,
+    Keypoint,
+)
+from app.detection.fusion_engine import _greedy_group, _greedy_group_py
+
+
+def make_detection(
+    class_id: int,
+    bbox: tuple[int, int, int, int],
+    confidence: float,
+    num_keypoints: int = 0,
+    backend_source: BackendType | None = None,
+) -> Detection:
+    return Detection(
+        class_id=class_id,
+        class_name=f"class_{class_id}",
+        class_name_es=f"clase_{class_id}",
+        confidence=confidence,
+        bbox=bbox,
+        keypoints=[Keypoint(x=1, y=1, confidence=0.9) for _ in range(num_keypoints)],
+        backend_source=backend_source,
+    )
+
+
+class StaticDetector(BaseDetector):
+    """Backend that always returns the same detections."""
+
+    def __init__(self, backend_type: BackendType, detections: list[Detection]):
+        self.backend_type = backend_type
+        self.detections = detections
+        self.calls = 0
+
+    def get_capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities(
+            backend_type=self.backend_type,
+            supports_pose=self.backend_type != BackendType.YOLO,
+            supports_tracking=False,
+            supports_3d=False,
+            supports_multi_animal=True,
+            max_fps=30,
+            supported_targets=[],
+        )
+
+    def load_model(self, model_name: str, **kwargs) -> None:
+        pass
+
+    def is_loaded(self) -> bool:
+        return True
+
+    def detect(self, frame: np.ndarray) -> DetectionResult:
+        self.calls += 1
+        h, w = frame.shape[:2]
+        return DetectionResult(
+            detections=[
+                make_detection(d.class_id, d.bbox, d.confidence, len(d.keypoints), self.backend_type)
+                for d in self.detections
+            ],
+            inference_time_ms=1.0,
+            frame_width=w,
+            frame_height=h,
+            backend_type=self.backend_type,
+        )
+
+
+@pytest.fixture
+def frame() -> np.ndarray:
+    return np.zeros((100, 100, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def backends() -> dict[str, BaseDetector]:
+    """YOLO + DeepLabCut backends with one overlapping detection."""
+    return {
+        "yolo_1": StaticDetector(BackendType.YOLO, [
+            make_detection(0, (0, 0, 10, 10), 0.6),
+            make_detection(0, (50, 50, 60, 60), 0.9),
+            make_detection(1, (0, 0, 10, 10), 0.7),
+        ]),
+        "deeplabcut_2": StaticDetector(BackendType.DEEPLABCUT, [
+            make_detection(0, (1, 1, 10, 10), 0.8, 5, BackendType.DEEPLABCUT),
+            make_detection(0, (80, 80, 90, 90), 0.4, 5, BackendType.DEEPLABCUT),
+        ]),
+    }
+
+
+class TestFusionEngine:
+    """FusionEngine strategy tests."""
+
+    def test_calculate_iou(self):
+        """Test scalar IoU helper."""
+        engine = FusionEngine()
+        assert engine._calculate_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+        assert engine._calculate_iou((0, 0, 10, 10), (20, 20, 30, 30)) == 0.0
+        assert engine._calculate_iou((0, 0, 10, 10), (5, 0, 15, 10)) == pytest.approx(1 / 3)
+
+    @pytest.mark.asyncio
+    async def test_no_backends(self, frame):
+        """Test empty backend set returns an empty result."""
+        result = await FusionEngine().process_parallel(frame, {})
+        assert result.detections == []
+        assert result.backends_used == []
+
+    @pytest.mark.asyncio
+    async def test_parallel_merge_deduplicates(self, frame, backends):
+        """Test overlapping same-class detections are merged."""
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.PARALLEL_MERGE))
+        result = await engine.process_parallel(frame, backends)
+
+        assert len(result.detections) == 4
+        merged = result.detections[0]
+        assert merged.confidence == pytest.approx(0.8)
+        assert len(merged.keypoints) == 5
+        assert result.backends_used == [BackendType.YOLO, BackendType.DEEPLABCUT]
+
+    @pytest.mark.asyncio
+    async def test_consensus_requires_agreement(self, frame, backends):
+        """Test consensus keeps only detections seen by both backends."""
+        engine = FusionEngine(FusionConfig(
+            strategy=FusionStrategy.CONSENSUS,
+            min_backends_agree=2,
+        ))
+        result = await engine.process_parallel(frame, backends)
+
+        assert len(result.detections) == 1
+        assert result.detections[0].bbox == (0, 0, 10, 10)
+        assert result.detections[0].confidence == pytest.approx(0.7)
+
+    @pytest.mark.asyncio
+    async def test_cascade_refines_animal_crops(self, frame):
+        """Test cascade runs pose only on animal crops and maps keypoints back."""
+        yolo = StaticDetector(BackendType.YOLO, [
+            make_detection(16, (20, 30, 60, 70), 0.6),
+            make_detection(0, (0, 0, 10, 10), 0.9),
+        ])
+        pose = StaticDetector(BackendType.DEEPLABCUT, [
+            make_detection(0, (2, 2, 30, 30), 0.8, 5, BackendType.DEEPLABCUT),
+        ])
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.CASCADE))
+        result = await engine.process_parallel(frame, {"yolo_1": yolo, "deeplabcut_2": pose})
+
+        dog, person = result.detections
+        assert pose.calls == 1
+        assert dog.bbox == (20, 30, 60, 70)
+        assert dog.confidence == pytest.approx(0.8)
+        assert [(kp.x, kp.y) for kp in dog.keypoints] == [(21, 31)] * 5
+        assert person.keypoints == []
+        assert result.backends_used == [BackendType.YOLO, BackendType.DEEPLABCUT]
+
+    @pytest.mark.asyncio
+    async def test_cascade_partition_is_computed_once(self, frame, backends, monkeypatch):
+        """Test capabilities are read when the backends dict changes, not on every frame."""
+        calls = []
+        for backend in backends.values():
+            original = backend.get_capabilities
+            monkeypatch.setattr(backend, "get_capabilities", lambda original=original: calls.append(1) or original())
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.CASCADE))
+
+        for _ in range(3):
+            await engine.process_parallel(frame, backends)
+        assert len(calls) == 2
+
+        await engine.process_parallel(frame, {"yolo_1": backends["yolo_1"]})
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_cascade_skips_pose_without_animals(self, frame, backends):
+        """Test frames without animals never reach the pose backend."""
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.CASCADE))
+        result = await engine.process_parallel(frame, backends)
+
+        assert backends["deeplabcut_2"].calls == 0
+        assert len(result.detections) == 3
+        assert result.backends_used == [BackendType.YOLO]
+        assert all(d.backend_source is not None for d in result.detections)
+
+    @pytest.mark.asyncio
+    async def test_weighted_scales_confidence(self, frame, backends):
+        """Test weighted fusion applies per-backend weights."""
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.WEIGHTED))
+        result = await engine.process_parallel(frame, backends)
+
+        confidences = sorted(round(d.confidence, 3) for d in result.detections)
+        assert confidences == [0.48, 0.7, 0.9, 0.96]
+
+    @pytest.mark.asyncio
+    async def test_first_wins_uses_first_backend(self, frame, backends):
+        """Test first-wins returns only the first backend's detections."""
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.FIRST_WINS))
+        result = await engine.process_parallel(frame, backends)
+
+        assert len(result.detections) == 3
+        assert all(d.backend_source == BackendType.YOLO for d in result.detections)
+
+    @pytest.mark.asyncio
+    async def test_update_config_switches_strategy(self, frame, backends):
+        """Test the resolved strategy follows config updates."""
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.PARALLEL_MERGE))
+        engine.update_config(FusionConfig(strategy=FusionStrategy.FIRST_WINS))
+        result = await engine.process_parallel(frame, backends)
+
+        assert result.fusion_strategy == "first_wins"
+        assert len(result.detections) == 3
+
+    def test_untagged_detection_is_backfilled(self, caplog):
+        """Test untagged detections get the result's backend and one warning per backend."""
+        engine = FusionEngine()
+        with caplog.at_level("DEBUG", logger="app.detection.fusion_engine"):
+            for _ in range(3):
+                flat = engine._flatten_results({
+                    "yolo_1": DetectionResult([make_detection(0, (0, 0, 5, 5), 0.5)], 1.0, 10, 10, BackendType.YOLO),
+                })
+
+        assert flat.detections[0].backend_source == BackendType.YOLO
+        levels = [r.levelname for r in caplog.records if "without backend_source" in r.message]
+        assert levels == ["WARNING", "DEBUG", "DEBUG"]
+
+    @pytest.mark.asyncio
+    async def test_single_backend_skips_fusion(self, frame, backends):
+        """Test a lone backend's detections are returned untouched."""
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.WEIGHTED))
+        result = await engine.process_parallel(frame, {"deeplabcut_2": backends["deeplabcut_2"]})
+
+        assert [d.confidence for d in result.detections] == [0.8, 0.4]
+        assert result.backends_used == [BackendType.DEEPLABCUT]
+        assert len(result.individual_results) == 1
+
+    @pytest.mark.asyncio
+    async def test_crowded_frame_fuses_off_loop(self, frame, monkeypatch):
+        """Test large detection counts are fused through a worker thread."""
+        crowd = [make_detection(0, (i * 20, 0, i * 20 + 10, 10), 0.5) for i in range(20)]
+        backends = {
+            "yolo_1": StaticDetector(BackendType.YOLO, crowd),
+            "deeplabcut_2": StaticDetector(BackendType.DEEPLABCUT, crowd),
+        }
+
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.PARALLEL_MERGE))
+        strategy_fn = engine._strategy_fn
+        fused_on = []
+
+        def spy_strategy(flat):
+            fused_on.append(threading.get_ident())
+            return strategy_fn(flat)
+
+        monkeypatch.setattr(engine, "_strategy_fn", spy_strategy)
+        result = await engine.process_parallel(frame, backends)
+
+        assert fused_on and fused_on[0] != threading.get_ident()
+        assert len(result.detections) == 20
+
+    @pytest.mark.asyncio
+    async def test_failing_backend_is_skipped(self, frame, backends):
+        """Test a backend raising an exception does not abort fusion."""
+
+        class FailingDetector(StaticDetector):
+            def detect(self, frame):
+                raise RuntimeError("boom")
+
+        backends["sleap_3"] = FailingDetector(BackendType.SLEAP, [])
+        engine = FusionEngine(FusionConfig(strategy=FusionStrategy.PARALLEL_MERGE))
+        result = await engine.process_parallel(frame, backends)
+
+        assert BackendType.SLEAP not in result.backends_used
+        assert len(result.detections) == 4
+
+
+    def test_spatial_index_matches_dense_iou(self):
+        """Test the STRtree path agrees with dense IoU on crowded frames."""
+        rng = np.random.default_rng(0)
+        detections = []
+        for _ in range(40):
+            x, y = rng.integers(0, 200, 2)
+            w, h = rng.integers(5, 40, 2)
+            bbox = (int(x), int(y), int(x + w), int(y + h))
+            detections.append(make_detection(int(rng.integers(0, 2)), bbox, 0.5, backend_source=BackendType.YOLO))
+
+        engine = FusionEngine()
+        flat = engine._flatten_results({
+            "yolo_1": DetectionResult(detections, 1.0, 300, 300, BackendType.YOLO),
+        })
+
+        dense = engine._iou_matrix(flat.boxes, flat.areas, flat.boxes, flat.areas)
+        dense[flat.class_ids[:, None] != flat.class_ids[None, :]] = 0
+        np.fill_diagonal(dense, 0)
+
+        np.testing.assert_allclose(engine._pairwise_iou(flat), dense)
+
+
+class TestGreedyGroup:
+    """Greedy IoU grouping kernel tests."""
+
+    @pytest.mark.parametrize("group_fn", [_greedy_group, _greedy_group_py])
+    def test_groups_same_class_overlaps(self, group_fn):
+        """Test overlapping same-class boxes share a label."""
+        iou = np.array([
+            [1.0, 0.8, 0.9, 0.0],
+            [0.8, 1.0, 0.7, 0.0],
+            [0.9, 0.7, 1.0, 0.6],
+            [0.0, 0.0, 0.6, 1.0],
+        ], dtype=np.float32)
+        cls = np.array([0, 0, 1, 0], dtype=np.int32)
+
+        labels = group_fn(iou, cls, 0.5)
+
+        assert labels.tolist() == [0, 0, 1, 2]
@@ -0,0 +1,269 @@
+"""
+Tests for the API middleware.
+"""
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.middleware import (
+    MAX_CONTENT_LENGTH,
+    RateLimitMiddleware,
+    RedisRateLimitMiddleware,
+    RequestValidationMiddleware,
+    SecurityHeadersMiddleware,
+)
+
+
+class FakePipeline:
+    """Minimal redis.asyncio pipeline over a dict."""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def incr(self, key):
+        self.commands.append(("incr", key))
+
+    def expire(self, key, seconds):
+        self.commands.append(("expire", key, seconds))
+
+    async def execute(self):
+        if self.redis.down:
+            raise ConnectionError("redis down")
+        results = []
+        for command in self.commands:
+            if command[0] == "incr":
+                self.redis.counts[command[1]] = self.redis.counts.get(command[1], 0) + 1
+                results.append(self.redis.counts[command[1]])
+            else:
+                self.redis.ttls[command[1]] = command[2]
+                results.append(True)
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.counts = {}
+        self.ttls = {}
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def make_app(middleware=RateLimitMiddleware, **options) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware, **options)
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.options("/api/ping")
+    async def ping_options():
+        return {"ok": True}
+
+    return app
+
+
+def limiter_of(app: FastAPI) -> RateLimitMiddleware:
+    """Build the middleware stack and return the rate limiter instance."""
+    app.middleware_stack = app.build_middleware_stack()
+    layer = app.middleware_stack
+    while not isinstance(layer, RateLimitMiddleware):
+        layer = layer.app
+    return layer
+
+
+async def get(app: FastAPI, ip: str = "10.0.0.1"):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/api/ping", headers={"X-Forwarded-For": ip})
+
+
+class TestRateLimitMiddleware:
+    """Rate limiting tests."""
+
+    @pytest.mark.asyncio
+    async def test_rejects_over_limit(self):
+        """Test requests beyond the limit get 429 while other IPs pass."""
+        app = make_app(requests_limit=2)
+
+        statuses = [(await get(app)).status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 429]
+        assert (await get(app, "10.0.0.2")).status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_remaining_header_counts_down(self):
+        """Test X-RateLimit-Remaining reflects the requests left in the window."""
+        app = make_app(requests_limit=3)
+
+        remaining = [(await get(app)).headers["X-RateLimit-Remaining"] for _ in range(2)]
+
+        assert remaining == ["2", "1"]
+
+    @pytest.mark.asyncio
+    async def test_preflight_does_not_spend_quota(self):
+        """Test OPTIONS requests skip rate limiting."""
+        app = make_app(requests_limit=1)
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            preflight = await client.options("/api/ping")
+
+        assert "X-RateLimit-Remaining" not in preflight.headers
+        assert (await get(app)).status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_idle_ips_are_swept(self, monkeypatch):
+        """Test IPs unseen for two windows are forgotten."""
+        app = make_app(window_seconds=10)
+        limiter = limiter_of(app)
+        now = [1000.0]
+        monkeypatch.setattr("app.middleware.time.monotonic", lambda: now[0])
+
+        await get(app, "10.0.0.1")
+        now[0] += 25
+        await get(app, "10.0.0.2")
+
+        assert list(limiter.buckets) == ["10.0.0.2"]
+
+    @pytest.mark.asyncio
+    async def test_tokens_refill_over_time(self, monkeypatch):
+        """Test a drained bucket admits requests again as tokens refill."""
+        app = make_app(requests_limit=2, window_seconds=10)
+        now = [1000.0]
+        monkeypatch.setattr("app.middleware.time.monotonic", lambda: now[0])
+
+        assert [(await get(app)).status_code for _ in range(3)] == [200, 200, 429]
+        now[0] += 5  # Half a window refills one token
+        assert [(await get(app)).status_code for _ in range(2)] == [200, 429]
+
+    @pytest.mark.asyncio
+    async def test_redis_down_warning_is_rate_limited(self, caplog):
+        """Test an outage logs one warning, not one per request."""
+        redis = FakeRedis()
+        redis.down = True
+        app = make_app(requests_limit=100, middleware=RedisRateLimitMiddleware, redis_client=redis)
+
+        with caplog.at_level("DEBUG", logger="app.middleware"):
+            for _ in range(5):
+                await get(app)
+
+        levels = [r.levelname for r in caplog.records if "Redis" in r.getMessage()]
+        assert levels == ["WARNING"] + ["DEBUG"] * 4
+
+    @pytest.mark.asyncio
+    async def test_wall_clock_jump_does_not_refill(self, monkeypatch):
+        """Test an NTP step of the wall clock does not hand out new tokens."""
+        app = make_app(requests_limit=1, window_seconds=10)
+        wall = [1000.0]
+        monkeypatch.setattr("app.middleware.time.time", lambda: wall[0])
+
+        assert (await get(app)).status_code == 200
+        wall[0] += 3600
+        response = await get(app)
+
+        assert response.status_code == 429
+        assert response.headers["X-RateLimit-Reset"] == str(int(wall[0] + 10))
+
+
+class TestSecurityHeadersMiddleware:
+    """Security header tests."""
+
+    @pytest.mark.asyncio
+    async def test_api_responses_get_static_headers(self):
+        """Test every static header plus no-store caching on /api."""
+        app = make_app(middleware=SecurityHeadersMiddleware)
+
+        response = await get(app)
+
+        for name, value in SecurityHeadersMiddleware._STATIC_HEADERS:
+            assert response.headers[name] == value
+        assert response.headers["Cache-Control"] == "no-store, max-age=0"
+
+    def test_forwarded_for_uses_leftmost_ip(self):
+        """Test the client IP is the first X-Forwarded-For entry."""
+
+        class FakeRequest:
+            headers = {"X-Forwarded-For": " 203.0.113.7 , 10.0.0.1, 10.0.0.2"}
+            client = None
+
+        assert RateLimitMiddleware._get_client_ip(None, FakeRequest()) == "203.0.113.7"
+
+
+class TestRequestValidationMiddleware:
+    """Request validation tests."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("content_length, expected", [
+        (str(MAX_CONTENT_LENGTH + 1), 413),
+        ("12", 200),
+        ("not-a-number", 200),
+        ("\u00b2", 200),
+    ])
+    async def test_content_length_limit(self, content_length, expected):
+        """Test oversized bodies are rejected and malformed lengths pass through."""
+        app = make_app(middleware=RequestValidationMiddleware)
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        sent = []
+        scope = {
+            "type": "http", "method": "GET", "path": "/api/ping", "raw_path": b"/api/ping",
+            "query_string": b"", "root_path": "", "scheme": "http", "server": ("test", 80),
+            "headers": [(b"content-length", content_length.encode("latin-1"))],
+        }
+        await app(scope, receive, send)
+
+        assert sent[0]["status"] == expected
+
+
+class TestRedisRateLimitMiddleware:
+    """Redis-backed rate limiting tests."""
+
+    @pytest.mark.asyncio
+    async def test_counts_are_shared_through_redis(self):
+        """Test two app instances enforce one limit through the same Redis."""
+        redis = FakeRedis()
+        first = make_app(requests_limit=2, middleware=RedisRateLimitMiddleware, redis_client=redis)
+        second = make_app(requests_limit=2, middleware=RedisRateLimitMiddleware, redis_client=redis)
+
+        statuses = [(await get(first)).status_code, (await get(second)).status_code, (await get(first)).status_code]
+
+        assert statuses == [200, 200, 429]
+        (key, ttl), = redis.ttls.items()
+        assert key.startswith("rl:10.0.0.1:") and ttl == 60
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_local_bucket(self):
+        """Test an unreachable Redis degrades to per-process limiting."""
+        redis = FakeRedis()
+        redis.down = True
+        app = make_app(requests_limit=1, middleware=RedisRateLimitMiddleware, redis_client=redis)
+
+        assert [(await get(app)).status_code for _ in range(2)] == [200, 429]
+
+    @pytest.mark.asyncio
+    async def test_redis_down_warning_is_rate_limited(self, caplog):
+        """Test an outage logs one warning, not one per request."""
+        redis = FakeRedis()
+        redis.down = True
+        app = make_app(requests_limit=100, middleware=RedisRateLimitMiddleware, redis_client=redis)
+
+        with caplog.at_level("DEBUG", logger="app.middleware"):
+            for _ in range(5):
+                await get(app)
+
+        levels = [r.levelname for r in caplog.records if "Redis" in r.getMessage()]
+        assert levels == ["WARNING"] + ["DEBUG"] * 4
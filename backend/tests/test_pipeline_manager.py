@@ -0,0 +1,292 @@
+"""
+Tests for the PipelineManager orchestrator.
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.detection import (
+    BackendCapabilities,
+    BackendType,
+    BaseDetector,
+    DetectionResult,
+    PipelineManager,
+    TargetType,
+)
+from app.detection import pipeline_manager as pm_module
+
+
+class CountingDetector(BaseDetector):
+    """Backend that counts capability queries and returns no detections."""
+
+    def __init__(self, backend_type: BackendType = BackendType.YOLO):
+        self.backend_type = backend_type
+        self.caps_calls = 0
+        self.batch_sizes = []
+        self.loaded = []
+        self.cleaned_up = False
+
+    def get_capabilities(self) -> BackendCapabilities:
+        self.caps_calls += 1
+        return BackendCapabilities(
+            backend_type=self.backend_type,
+            supports_pose=False,
+            supports_tracking=False,
+            supports_3d=False,
+            supports_multi_animal=False,
+            max_fps=30,
+            supported_targets=[TargetType.HUMAN],
+        )
+
+    def load_model(self, model_name: str, **kwargs) -> None:
+        self.loaded.append(model_name)
+
+    def cleanup(self) -> None:
+        self.cleaned_up = True
+
+    def is_loaded(self) -> bool:
+        return True
+
+    def detect(self, frame: np.ndarray) -> DetectionResult:
+        h, w = frame.shape[:2]
+        return DetectionResult([], 1.0, w, h, self.backend_type)
+
+    def detect_batch(self, frames: list[np.ndarray]) -> list[DetectionResult]:
+        self.batch_sizes.append(len(frames))
+        return super().detect_batch(frames)
+
+
+class ListSource:
+    """Video source replaying a fixed list of frames."""
+
+    def __init__(self, frames: list[np.ndarray]):
+        self.frames = list(frames)
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+    def is_opened(self) -> bool:
+        return bool(self.frames)
+
+
+@pytest.fixture
+def manager(monkeypatch) -> PipelineManager:
+    monkeypatch.setattr(pm_module, "_model_cache", type(pm_module._model_cache)())
+    manager = PipelineManager()
+    monkeypatch.setattr(manager, "_create_detector", lambda backend_type: CountingDetector(backend_type))
+    return manager
+
+
+class TestPipelineManager:
+    """PipelineManager tests."""
+
+    @pytest.mark.asyncio
+    async def test_status_reuses_cached_capabilities(self, manager):
+        """Test status polling does not query detectors again."""
+        backend_id = await manager.add_backend(BackendType.YOLO)
+        detector = manager.backends[backend_id].detector
+
+        first = manager.get_status()
+        second = manager.get_status()
+
+        assert detector.caps_calls == 1
+        assert first["backends"][0] == second["backends"][0]
+        assert second["capabilities"]["supported_targets"] == [TargetType.HUMAN.value]
+
+    @pytest.mark.asyncio
+    async def test_status_dict_is_memoized_until_dirty(self, manager):
+        """Test the backend dict is shared between calls and rebuilt after a change."""
+        backend_id = await manager.add_backend(BackendType.YOLO)
+        instance = manager.backends[backend_id]
+
+        snapshot = instance.to_dict()
+        assert instance.to_dict() is snapshot
+
+        manager.enable_backend(backend_id, False)
+        again = instance.to_dict()
+        assert again is not snapshot and again["enabled"] is False
+
+    @pytest.mark.asyncio
+    async def test_refresh_capabilities_requeries_detector(self, manager):
+        """Test an explicit refresh queries the detector again and rebuilds the status dict."""
+        backend_id = await manager.add_backend(BackendType.YOLO)
+        instance = manager.backends[backend_id]
+        instance.to_dict()
+
+        instance.refresh_capabilities()
+
+        assert instance.detector.caps_calls == 2
+        assert instance._dirty
+
+    @pytest.mark.asyncio
+    async def test_enable_backend_invalidates_status(self, manager):
+        """Test toggling a backend is reflected in the memoized status."""
+        backend_id = await manager.add_backend(BackendType.YOLO)
+        assert manager.get_status()["backends"][0]["enabled"] is True
+
+        manager.enable_backend(backend_id, False)
+
+        status = manager.get_status()
+        assert status["backends"][0]["enabled"] is False
+        assert status["capabilities"]["backends_count"] == 0
+
+    def test_sync_processing_reuses_one_loop(self, manager):
+        """Test process_frame_sync runs every frame on the same event loop."""
+        asyncio.run(manager.add_backend(BackendType.YOLO))
+        frame = np.zeros((10, 10, 3), dtype=np.uint8)
+        assert manager._sync_loop is None
+
+        results = [manager.process_frame_sync(frame)]
+        loop = manager._sync_loop
+        results += [manager.process_frame_sync(frame) for _ in range(2)]
+        assert manager._sync_loop is loop
+        manager.close()
+
+        assert len(results) == 3
+        assert loop.is_closed() and manager._sync_loop is None
+
+    @pytest.mark.asyncio
+    async def test_close_from_running_loop(self, manager):
+        """Test close() works inside the app's loop and process_frame_sync refuses to nest."""
+        with pytest.raises(RuntimeError):
+            manager.process_frame_sync(np.zeros((10, 10, 3), dtype=np.uint8))
+
+        manager.close()
+        assert manager._sync_loop is None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_frames_are_batched(self, manager):
+        """Test frames submitted together share one detect_batch call per backend."""
+        yolo_id = await manager.add_backend(BackendType.YOLO)
+        dlc_id = await manager.add_backend(BackendType.DEEPLABCUT)
+        frames = [np.zeros((10 + i, 10, 3), dtype=np.uint8) for i in range(4)]
+
+        results = await asyncio.gather(*(manager.process_frame_batched(f) for f in frames))
+        manager.close()
+
+        assert [r.frame_height for r in results] == [10, 11, 12, 13]
+        assert manager.backends[yolo_id].detector.batch_sizes == [4]
+        assert manager.backends[dlc_id].detector.batch_sizes == [4]
+
+    @pytest.mark.asyncio
+    async def test_removed_models_are_reused(self, manager):
+        """Test re-adding a removed model takes the loaded detector from the cache."""
+        first_id = await manager.add_backend(BackendType.YOLO, "yolo11n.pt")
+        detector = manager.backends[first_id].detector
+        manager.remove_backend(first_id)
+
+        second_id = await manager.add_backend(BackendType.YOLO, "yolo11n.pt")
+
+        assert manager.backends[second_id].detector is detector
+        assert detector.loaded == ["yolo11n.pt"]
+        assert not detector.cleaned_up
+
+    @pytest.mark.asyncio
+    async def test_model_cache_evicts_least_recent(self, manager, monkeypatch):
+        """Test detectors beyond MODEL_CACHE_SIZE are cleaned up oldest first."""
+        monkeypatch.setattr(pm_module, "MODEL_CACHE_SIZE", 1)
+        old_id = await manager.add_backend(BackendType.YOLO, "yolo11n.pt")
+        new_id = await manager.add_backend(BackendType.YOLO, "yolo11m.pt")
+        old = manager.backends[old_id].detector
+
+        manager.remove_backend(old_id)
+        manager.remove_backend(new_id)
+
+        assert old.cleaned_up
+        assert list(pm_module._model_cache) == [(BackendType.YOLO, "yolo11m.pt")]
+
+    @pytest.mark.parametrize("cuda, size", [(True, 1), (False, pm_module.CPU_MODEL_CACHE_SIZE)])
+    def test_model_cache_size_follows_device(self, monkeypatch, cuda, size):
+        """Test the default cache parks a single model on CUDA hosts."""
+        monkeypatch.setattr(pm_module, "_cuda_available", lambda: cuda)
+        assert pm_module._model_cache_size() == size
+
+        monkeypatch.setattr(pm_module, "MODEL_CACHE_SIZE", 0)
+        assert pm_module._model_cache_size() == 0
+
+    @pytest.mark.asyncio
+    async def test_run_pipeline_streams_every_frame(self, manager):
+        """Test the staged pipeline yields each captured frame in order."""
+        await manager.add_backend(BackendType.YOLO)
+        await manager.add_backend(BackendType.DEEPLABCUT)
+        source = ListSource([np.zeros((10 + i, 10, 3), dtype=np.uint8) for i in range(5)])
+
+        heights = [result.frame_height async for _, result in manager.run_pipeline(source)]
+
+        assert heights == [10, 11, 12, 13, 14]
+
+    @pytest.mark.asyncio
+    async def test_run_pipeline_surfaces_stage_errors(self, manager):
+        """Test a failing stage ends the stream with its exception."""
+
+        class BrokenSource(ListSource):
+            def read(self):
+                raise RuntimeError("camera unplugged")
+
+        with pytest.raises(RuntimeError):
+            async for _ in manager.run_pipeline(BrokenSource([])):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_run_pipeline_fuse_error_with_live_source(self, manager, monkeypatch):
+        """Test a failing fuse stage ends the stream even while the source keeps producing."""
+        await manager.add_backend(BackendType.YOLO)
+        await manager.add_backend(BackendType.DEEPLABCUT)
+
+        class EndlessSource:
+            def read(self):
+                return True, np.zeros((10, 10, 3), dtype=np.uint8)
+
+            def is_opened(self) -> bool:
+                return True
+
+        async def broken_fuse(*args):
+            raise RuntimeError("fusion failed")
+
+        monkeypatch.setattr(manager._fusion_engine, "fuse_results", broken_fuse)
+
+        async def drain():
+            async for _ in manager.run_pipeline(EndlessSource()):
+                pass
+
+        with pytest.raises(RuntimeError, match="fusion failed"):
+            await asyncio.wait_for(drain(), timeout=5)
+
+    @pytest.mark.asyncio
+    async def test_active_backends_snapshot_follows_changes(self, manager):
+        """Test the per-frame backend snapshot is reused until backends change."""
+        yolo_id = await manager.add_backend(BackendType.YOLO)
+        active = manager.get_active_backends()
+        assert manager.get_active_backends() is active
+
+        manager.enable_backend(yolo_id, False)
+        assert manager.get_active_backends() == {}
+
+        dlc_id = await manager.add_backend(BackendType.DEEPLABCUT)
+        assert list(manager.get_active_backends()) == [dlc_id]
+
+        manager.remove_backend(dlc_id)
+        assert manager.get_active_backends() == {}
+
+
+class TestPresets:
+    """Preset registry tests."""
+
+    def test_presets_are_built_once(self):
+        """Test repeated lookups return the same lazily built preset."""
+        assert pm_module.get_preset("wildlife") is pm_module.get_preset("wildlife")
+        assert pm_module.get_preset("does_not_exist") is None
+
+    def test_available_presets_cover_every_id(self):
+        """Test the preset listing follows registry order."""
+        presets = PipelineManager().get_available_presets()
+        assert [p["id"] for p in presets] == list(pm_module.PRESET_IDS)
+
+    def test_preset_dict_is_memoized(self):
+        """Test presets serialize once."""
+        preset = pm_module.get_preset("pet_monitor")
+        assert preset.to_dict() is preset.to_dict()
+        assert preset.to_dict()["fusion"]["strategy"] == "cascade"
@@ -0,0 +1,597 @@
+"""
+Tests for clip recording and recording storage.
+"""
+import asyncio
+import os
+import subprocess
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import app.recordings.recorder as recorder_module
+import app.recordings.routes as routes_module
+import app.recordings.storage as storage_module
+from app.database import Base
+from app.models import RecordingModel
+from app.recordings import ClipRecorder, RecordingBuffer, RecordingStorage
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    """Point recording storage at a fresh in-memory database."""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    @asynccontextmanager
+    async def db_context():
+        async with sessions() as session:
+            yield session
+            await session.commit()
+
+    monkeypatch.setattr(storage_module, "get_db_context", db_context)
+    yield engine
+    await engine.dispose()
+
+
+def make_frame(value: int, shape: tuple[int, int] = (4, 6)) -> np.ndarray:
+    return np.full((*shape, 3), value, dtype=np.uint8)
+
+
+class TestRecordingBuffer:
+    """Pre-event ring buffer tests."""
+
+    def test_frames_are_returned_oldest_first(self):
+        """Test the ring unwraps to chronological order once it wraps around."""
+        buffer = RecordingBuffer(buffer_seconds=1, fps=3)
+        for value in range(5):
+            buffer.add_frame(make_frame(value))
+
+        frames, timestamps = buffer.get_buffered_frames()
+
+        assert [int(f[0, 0, 0]) for f in frames] == [2, 3, 4]
+        assert len(timestamps) == 3 and np.all(np.diff(timestamps) >= 0)
+        assert buffer.frame_size == (6, 4)
+
+    def test_borrowed_frames_are_copied_into_one_allocation(self):
+        """Test borrowed frames land in the preallocated ring instead of new arrays."""
+        buffer = RecordingBuffer(buffer_seconds=1, fps=3)
+        frame = make_frame(7)
+        buffer.add_frame(frame, owns_frame=False)
+        storage = buffer._ring.storage
+
+        frame[:] = 0
+        buffer.add_frame(make_frame(8), owns_frame=False)
+        buffer.add_frame(make_frame(9), owns_frame=False)
+
+        assert buffer._ring.storage is storage
+        assert [int(f[0, 0, 0]) for f in buffer.get_buffered_frames()[0]] == [7, 8, 9]
+
+    def test_owned_frames_are_kept_without_copying(self):
+        """Test frames handed over by the caller are stored by reference."""
+        buffer = RecordingBuffer(buffer_seconds=1, fps=3)
+        frame = make_frame(7)
+        buffer.add_frame(frame)
+
+        assert buffer._ring.slots[0] is frame
+        assert buffer._ring.storage is None
+
+    def test_resolution_change_restarts_ring(self):
+        """Test a new frame size drops frames that no longer fit the ring."""
+        buffer = RecordingBuffer(buffer_seconds=1, fps=3)
+        buffer.add_frame(make_frame(1))
+        buffer.add_frame(make_frame(2, shape=(8, 10)))
+
+        frames, _ = buffer.get_buffered_frames()
+
+        assert frames.shape == (1, 8, 10, 3)
+        assert buffer.frame_size == (10, 8)
+
+    def test_clear_empties_buffer(self):
+        """Test clear drops buffered frames but keeps the allocation."""
+        buffer = RecordingBuffer(buffer_seconds=1, fps=3)
+        buffer.add_frame(make_frame(1))
+        buffer.clear()
+
+        assert len(buffer) == 0
+        assert len(buffer.get_buffered_frames()[0]) == 0
+
+        buffer.add_frame(make_frame(2))
+        assert [int(f[0, 0, 0]) for f in buffer.get_buffered_frames()[0]] == [2]
+
+    @pytest.mark.parametrize("owns_frame", [True, False])
+    def test_concurrent_reader_never_sees_torn_frames(self, owns_frame):
+        """Test frames copied while the producer keeps writing are whole and in order."""
+        buffer = RecordingBuffer(buffer_seconds=1, fps=4)
+        stop = threading.Event()
+
+        def produce():
+            value = 0
+            while not stop.is_set():
+                buffer.add_frame(make_frame(value % 256, shape=(64, 64)), owns_frame)
+                value += 1
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        try:
+            for _ in range(200):
+                frames, _ = buffer.get_buffered_frames()
+                for frame in frames:
+                    assert (frame == frame[0, 0, 0]).all()
+                values = [int(f[0, 0, 0]) for f in frames]
+                assert all((b - a) % 256 == 1 for a, b in zip(values, values[1:]))
+        finally:
+            stop.set()
+            producer.join()
+
+
+class TestClipRecorder:
+    """Clip recording tests."""
+
+    def test_clip_contains_pre_and_post_event_frames(self, tmp_path):
+        """Test the encoder thread writes the pre-buffer followed by post-event frames."""
+        recorder = ClipRecorder(output_dir=str(tmp_path), pre_seconds=1, post_seconds=1, fps=3)
+        for value in range(4):
+            recorder.add_frame(make_frame(value, shape=(48, 64)))
+
+        filename = recorder.start_recording("alert-123456789")
+        for value in range(3):
+            recorder.add_frame(make_frame(value, shape=(48, 64)))
+        recorder.close()
+
+        assert not recorder.is_recording
+        capture = cv2.VideoCapture(str(tmp_path / filename))
+        assert capture.get(cv2.CAP_PROP_FRAME_COUNT) == 6
+        capture.release()
+
+    @pytest.mark.asyncio
+    async def test_completion_callback_runs_on_event_loop(self, tmp_path):
+        """Test clips finished on the encoder thread notify the registering loop."""
+        recorder = ClipRecorder(output_dir=str(tmp_path), pre_seconds=1, post_seconds=1, fps=2, encoder=None)
+        completed = asyncio.get_running_loop().create_future()
+
+        async def on_complete(filename, frame_count, duration, file_size):
+            completed.set_result((filename, frame_count, file_size, asyncio.get_running_loop()))
+
+        recorder.on_recording_complete(on_complete)
+        recorder.add_frame(make_frame(0, shape=(48, 64)))
+        filename = recorder.start_recording("alert")
+        recorder.add_frame(make_frame(1, shape=(48, 64)))
+        recorder.add_frame(make_frame(2, shape=(48, 64)))
+
+        result = await asyncio.wait_for(completed, 2)
+        await asyncio.to_thread(recorder.close)
+
+        assert result == (filename, 3, (tmp_path / filename).stat().st_size, asyncio.get_running_loop())
+
+    @pytest.mark.asyncio
+    async def test_failing_completion_callback_is_reported(self, tmp_path, capsys):
+        """Test an exception raised by the completion callback is printed, not lost."""
+        recorder = ClipRecorder(output_dir=str(tmp_path), pre_seconds=1, post_seconds=1, fps=2, encoder=None)
+        called = asyncio.Event()
+
+        async def on_complete(filename, frame_count, duration, file_size):
+            called.set()
+            raise RuntimeError("db down")
+
+        recorder.on_recording_complete(on_complete)
+        recorder.add_frame(make_frame(0, shape=(48, 64)))
+        recorder.start_recording("alert")
+        recorder.stop_recording()
+
+        await asyncio.wait_for(called.wait(), 2)
+        await asyncio.to_thread(recorder.close)
+        await asyncio.sleep(0)
+
+        assert "RuntimeError('db down')" in capsys.readouterr().out
+
+    def test_idle_frames_skip_the_lock(self, tmp_path):
+        """Test buffering while idle never waits on the recorder lock."""
+        recorder = ClipRecorder(output_dir=str(tmp_path), pre_seconds=1, fps=3, encoder=None)
+
+        with recorder._lock:
+            recorder.add_frame(make_frame(1))
+
+        assert len(recorder.buffer) == 1
+        recorder.close()
+
+    def test_full_queue_drops_frames_instead_of_blocking(self, tmp_path, monkeypatch):
+        """Test capture keeps going when the encoder cannot keep up."""
+        stalled, release = threading.Event(), threading.Event()
+
+        class StalledWriter:
+            def __init__(self, *args):
+                pass
+
+            def isOpened(self):
+                return True
+
+            def write(self, frame):
+                stalled.set()
+                release.wait()
+
+            def release(self):
+                pass
+
+        monkeypatch.setattr(cv2, "VideoWriter", StalledWriter)
+        recorder = ClipRecorder(output_dir=str(tmp_path), pre_seconds=1, post_seconds=10, fps=1, encoder=None)
+        recorder.add_frame(make_frame(0))
+        recorder.start_recording("alert")
+        stalled.wait(1)
+
+        for value in range(5):
+            recorder.add_frame(make_frame(value))
+
+        assert recorder.dropped_frames == 3
+        assert recorder.is_recording
+        release.set()
+        recorder.close()
+
+    @pytest.mark.asyncio
+    async def test_status_when_recorder_disabled(self, monkeypatch):
+        """Test API-only workers report a disabled recorder without creating one."""
+        monkeypatch.setenv("VM_DISABLE_RECORDER", "1")
+        monkeypatch.setattr(recorder_module, "get_recorder", lambda: pytest.fail("recorder created"))
+
+        status = await routes_module.get_recording_status()
+
+        assert status == {"is_recording": False, "enabled": False}
+
+
+class TestFFmpegEncoder:
+    """FFmpeg encoder selection tests."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_detection(self):
+        recorder_module.detect_ffmpeg_encoder.cache_clear()
+        yield
+        recorder_module.detect_ffmpeg_encoder.cache_clear()
+
+    def test_prefers_first_working_encoder(self, monkeypatch):
+        """Test listed hardware encoders are skipped when their probe fails."""
+        listing = " V....D libx264  H.264\n V....D h264_nvenc  NVIDIA NVENC\n V....D mpeg4  MPEG-4\n"
+        probed = []
+
+        def fake_run(command, **kwargs):
+            if "-encoders" in command:
+                return subprocess.CompletedProcess(command, 0, stdout=listing)
+            encoder = command[command.index("-c:v") + 1]
+            probed.append(encoder)
+            return subprocess.CompletedProcess(command, 0 if encoder == "libx264" else 1)
+
+        monkeypatch.setattr(recorder_module.shutil, "which", lambda name: "/usr/bin/ffmpeg")
+        monkeypatch.setattr(recorder_module.subprocess, "run", fake_run)
+
+        assert recorder_module.detect_ffmpeg_encoder() == "libx264"
+        assert probed == ["h264_nvenc", "libx264"]
+
+    def test_falls_back_to_opencv_without_ffmpeg(self, tmp_path, monkeypatch):
+        """Test recorders use the OpenCV writer when FFmpeg is not installed."""
+        monkeypatch.setattr(recorder_module.shutil, "which", lambda name: None)
+        recorder = ClipRecorder(output_dir=str(tmp_path))
+
+        assert recorder.encoder is None
+        assert isinstance(recorder._open_writer(tmp_path / "a.mp4", (64, 48)), cv2.VideoWriter)
+        recorder.close()
+
+    def test_ffmpeg_errors_are_reported(self, monkeypatch, capsys):
+        """Test ffmpeg's stderr and exit code are printed instead of discarded."""
+        read_end, write_end = os.pipe()
+
+        class FailingProcess:
+            def __init__(self, command, **kwargs):
+                assert kwargs["stderr"] is subprocess.PIPE
+                self.stdin = open(os.devnull, "wb")
+                self.stderr = os.fdopen(read_end, "rb")
+                self.returncode = None
+
+            def poll(self):
+                return self.returncode
+
+            def wait(self):
+                self.returncode = 1
+                return 1
+
+        monkeypatch.setattr(recorder_module.subprocess, "Popen", FailingProcess)
+        writer = recorder_module.FFmpegWriter("/tmp/clip.mp4", "libx264", 15, (64, 48))
+        os.write(write_end, b"Unknown encoder 'libx264'\n")
+        os.close(write_end)
+        writer.release()
+
+        out = capsys.readouterr().out
+        assert "clip.mp4): Unknown encoder 'libx264'" in out
+        assert "código 1" in out
+
+
+class TestRecordingStorage:
+    """Recording directory scan tests."""
+
+    @pytest.fixture
+    def storage(self, tmp_path) -> RecordingStorage:
+        for name, size in [("a.mp4", 1024), ("b.mp4", 2048), ("notes.txt", 10)]:
+            (tmp_path / name).write_bytes(b"\0" * size)
+        return RecordingStorage(str(tmp_path))
+
+    def test_listing_is_cached_until_ttl(self, storage, monkeypatch):
+        """Test repeated polling reuses one directory scan."""
+        scans = []
+        real_scandir = storage_module.os.scandir
+        monkeypatch.setattr(storage_module.os, "scandir", lambda path: scans.append(path) or real_scandir(path))
+
+        assert {f["filename"] for f in storage.list_files()} == {"a.mp4", "b.mp4"}
+        assert storage.get_total_size_mb() == round(3072 / (1024 * 1024), 2)
+        assert len(scans) == 1
+
+        storage._stats_ttl = 0
+        storage.list_files()
+        assert len(scans) == 2
+
+    def test_new_and_deleted_files_invalidate_cache(self, storage, tmp_path):
+        """Test files added or removed show up before the TTL expires."""
+        storage.list_files()
+        (tmp_path / "c.mp4").write_bytes(b"\0")
+        assert len(storage.list_files()) == 3
+
+        storage.delete_file("a.mp4")
+        assert {f["filename"] for f in storage.list_files()} == {"b.mp4", "c.mp4"}
+
+    def test_file_exists_uses_snapshot(self, storage, tmp_path, monkeypatch):
+        """Test existence checks share the cached scan and still see new and deleted files."""
+        assert storage.file_exists("a.mp4")
+        scans = []
+        real_scandir = storage_module.os.scandir
+        monkeypatch.setattr(storage_module.os, "scandir", lambda path: scans.append(path) or real_scandir(path))
+
+        assert storage.file_exists("b.mp4") and not storage.file_exists("c.mp4")
+        assert scans == []
+
+        (tmp_path / "c.mp4").write_bytes(b"\0")
+        (tmp_path / "a.mp4").unlink()
+        assert storage.file_exists("c.mp4") and not storage.file_exists("a.mp4")
+        assert len(scans) == 1
+
+    def test_scan_matches_file_info(self, storage, tmp_path):
+        """Test scandir entries describe files exactly like get_file_info."""
+        (tmp_path / "dir.mp4").mkdir()
+
+        files = storage.list_files()
+
+        assert sorted(f["filename"] for f in files) == ["a.mp4", "b.mp4"]
+        assert all(f == storage.get_file_info(f["filename"]) for f in files)
+
+    def test_timestamps_are_iso_seconds(self, storage, tmp_path):
+        """Test stat times are formatted like datetime.isoformat at second precision."""
+        os.utime(tmp_path / "a.mp4", (1_700_000_000.75, 1_700_000_000.75))
+
+        info = storage.get_file_info("a.mp4")
+
+        assert info["modified_at"] == datetime.fromtimestamp(1_700_000_000).isoformat()
+
+
+class TestRecordingDatabase:
+    """Recording metadata persistence tests."""
+
+    @pytest.fixture
+    def storage(self, tmp_path) -> RecordingStorage:
+        for name in ("a.mp4", "b.mp4"):
+            (tmp_path / name).write_bytes(b"\0" * 100)
+        return RecordingStorage(str(tmp_path))
+
+    @pytest.mark.asyncio
+    async def test_get_recording_by_id(self, db, storage):
+        """Test a single recording is fetched by primary key."""
+        saved = await storage.save_recording_to_db("a.mp4", duration_seconds=3.5)
+        await storage.save_recording_to_db("b.mp4")
+
+        recording = await storage.get_recording_by_id(saved.id)
+
+        assert recording["filename"] == "a.mp4"
+        assert recording["path"] == str(storage.get_file_path("a.mp4"))
+        assert recording["duration_seconds"] == 3.5
+        assert recording["exists"] is True
+        assert await storage.get_recording_by_id("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_known_size_skips_stat(self, db, storage, monkeypatch):
+        """Test callers that know the clip size save without touching the file."""
+        monkeypatch.setattr(storage, "get_file_info", lambda name: pytest.fail("stat on save"))
+
+        saved = await storage.save_recording_to_db("a.mp4", duration_seconds=1.0, file_size_bytes=1234)
+
+        assert saved.file_size_bytes == 1234
+
+    @pytest.mark.asyncio
+    async def test_bulk_save_skips_missing_files(self, db, storage):
+        """Test completed clips are inserted together and missing files ignored."""
+        inserted = await storage.save_recordings_bulk([
+            {"filename": "a.mp4", "duration_seconds": 2.0},
+            {"filename": "b.mp4", "alert_id": None},
+            {"filename": "gone.mp4"},
+        ])
+
+        recordings = await storage.get_recordings_from_db()
+        assert inserted == 2
+        assert sorted(r["filename"] for r in recordings) == ["a.mp4", "b.mp4"]
+        assert all(r["id"] and r["created_at"] for r in recordings)
+
+    @pytest.mark.asyncio
+    async def test_delete_removes_row_and_file(self, db, storage, tmp_path):
+        """Test deleting by id drops the row and its clip in one statement."""
+        saved = await storage.save_recording_to_db("a.mp4")
+
+        assert await storage.delete_recording_from_db(saved.id) is True
+        assert not (tmp_path / "a.mp4").exists()
+        assert await storage.get_recording_by_id(saved.id) is None
+        assert await storage.delete_recording_from_db(saved.id) is False
+
+    @pytest.mark.asyncio
+    async def test_cleanup_by_size_removes_oldest_files_and_rows(self, db, storage, tmp_path):
+        """Test size cleanup deletes just enough old clips and their rows at once."""
+        (tmp_path / "c.mp4").write_bytes(b"\0" * 100)
+        for name in ("a.mp4", "b.mp4", "c.mp4"):
+            await storage.save_recording_to_db(name)
+        storage.max_storage_mb = 150 / (1024 * 1024)
+
+        deleted = storage.cleanup_by_size()
+        rows = await storage.delete_recordings_by_filename(deleted)
+
+        assert deleted == ["a.mp4", "b.mp4"]
+        assert rows == 2
+        assert [f["filename"] for f in storage.list_files()] == ["c.mp4"]
+        assert [r["filename"] for r in await storage.get_recordings_from_db()] == ["c.mp4"]
+        assert storage.cleanup_by_size() == []
+
+    @pytest.mark.asyncio
+    async def test_queued_saves_share_one_insert(self, db, storage, monkeypatch):
+        """Test recordings completed together are inserted in one batch."""
+        monkeypatch.setattr(storage_module, "SAVE_BATCH_WINDOW", 0.01)
+        batches = []
+        real_bulk = storage.save_recordings_bulk
+
+        async def spy_bulk(items):
+            batches.append([item["filename"] for item in items])
+            return await real_bulk(items)
+
+        monkeypatch.setattr(storage, "save_recordings_bulk", spy_bulk)
+        await storage.queue_recording_save("a.mp4", duration_seconds=1.0)
+        await storage.queue_recording_save("b.mp4")
+        await storage._flush_task
+
+        assert batches == [["a.mp4", "b.mp4"]]
+        assert len(await storage.get_recordings_from_db()) == 2
+
+    @pytest.mark.asyncio
+    async def test_finished_clip_adapter(self, db, storage, monkeypatch):
+        """Test the recorder's completion callback saves the encoder's size without a stat."""
+        monkeypatch.setattr(storage_module, "SAVE_BATCH_WINDOW", 0.01)
+
+        stats = []
+        real_info = storage.get_file_info
+        monkeypatch.setattr(storage, "get_file_info", lambda filename: stats.append(filename) or real_info(filename))
+        await storage.save_finished_clip("a.mp4", 30, 2.004, 1234)
+        await storage._flush_task
+
+        assert stats == []
+        (row,) = await storage.get_recordings_from_db()
+        assert (row["filename"], row["duration_seconds"], row["file_size_bytes"]) == ("a.mp4", 2.0, 1234)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_flush_is_rescheduled(self, storage, monkeypatch):
+        """Test a flush cancelled while waiting does not block later saves."""
+        monkeypatch.setattr(storage, "save_recordings_bulk", lambda items: asyncio.sleep(0))
+        await storage.queue_recording_save("a.mp4")
+        task = storage._flush_task
+        await asyncio.sleep(0)  # Let the flush start waiting
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert storage._flush_task is None
+        await storage.queue_recording_save("b.mp4")
+        assert storage._flush_task is not None
+        storage._flush_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_listing_checks_files_against_one_scan(self, db, storage, tmp_path, monkeypatch):
+        """Test existence flags come from the directory snapshot, not a stat per row."""
+        await storage.save_recording_to_db("a.mp4")
+        await storage.save_recording_to_db("b.mp4")
+        (tmp_path / "b.mp4").unlink()
+        monkeypatch.setattr(storage, "file_exists", lambda name: pytest.fail("stat per row"))
+
+        recordings = await storage.get_recordings_from_db()
+
+        assert {r["filename"]: r["exists"] for r in recordings} == {"a.mp4": True, "b.mp4": False}
+
+    @pytest.mark.asyncio
+    async def test_large_file_sizes_round_trip(self, db, storage):
+        """Test sizes past 2 GB are stored without 32-bit truncation."""
+        saved = await storage.save_recording_to_db("a.mp4")
+        async with storage_module.get_db_context() as session:
+            (await session.get(RecordingModel, saved.id)).file_size_bytes = 5 << 30
+
+        assert (await storage.get_recording_by_id(saved.id))["file_size_bytes"] == 5 << 30
+
+    @pytest.mark.asyncio
+    async def test_listing_reads_created_at_index(self, db):
+        """Test the newest-first listing is served by an index instead of a sort."""
+        async with db.connect() as conn:
+            plan = await conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT * FROM recordings ORDER BY created_at DESC LIMIT 50"
+            )
+            details = " ".join(row[-1] for row in plan)
+
+        assert "ix_recordings_created_at_desc" in details
+        assert "TEMP B-TREE" not in details
+
+
+class TestVideoStreaming:
+    """Range-aware video streaming tests."""
+
+    @pytest.fixture
+    async def client(self, tmp_path, monkeypatch):
+        (tmp_path / "clip.mp4").write_bytes(bytes(range(256)) * 10)
+        storage = RecordingStorage(str(tmp_path))
+        monkeypatch.setattr(routes_module, "get_storage", lambda: storage)
+        monkeypatch.setattr(routes_module, "STREAM_CHUNK_SIZE", 100)
+        app = FastAPI()
+        app.include_router(routes_module.router)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+
+    @pytest.mark.asyncio
+    async def test_full_file(self, client):
+        """Test a plain GET streams the whole clip in chunks."""
+        response = await client.get("/api/recordings/file/clip.mp4")
+
+        assert response.status_code == 200
+        assert response.content == bytes(range(256)) * 10
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["content-length"] == "2560"
+
+    @pytest.mark.parametrize("header, expected", [
+        ("bytes=10-19", (10, 19)),
+        ("bytes=2500-", (2500, 2559)),
+        ("bytes=-5", (2555, 2559)),
+        ("bytes=2550-9999", (2550, 2559)),
+    ])
+    @pytest.mark.asyncio
+    async def test_byte_ranges(self, client, header, expected):
+        """Test single ranges are answered with 206 and the exact bytes."""
+        response = await client.get("/api/recordings/file/clip.mp4", headers={"Range": header})
+        start, end = expected
+
+        assert response.status_code == 206
+        assert response.content == (bytes(range(256)) * 10)[start:end + 1]
+        assert response.headers["content-range"] == f"bytes {start}-{end}/2560"
+
+    @pytest.mark.asyncio
+    async def test_unsatisfiable_range(self, client):
+        """Test ranges past the end of the file are rejected."""
+        response = await client.get("/api/recordings/file/clip.mp4", headers={"Range": "bytes=3000-"})
+
+        assert response.status_code == 416
+        assert response.headers["content-range"] == "bytes */2560"
+
+    @pytest.mark.asyncio
+    async def test_file_opened_only_while_streaming(self, tmp_path, monkeypatch):
+        """Test no descriptor is held before the body starts and it is closed after."""
+        path = tmp_path / "clip.mp4"
+        path.write_bytes(b"\0" * 10)
+        opened = []
+        monkeypatch.setattr(routes_module, "open", lambda *a: opened.append(open(*a)) or opened[-1], raising=False)
+        request = Request({"type": "http", "method": "GET", "headers": []})
+
+        response = await routes_module.stream_mp4(path, request, "clip.mp4")
+        assert opened == []
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        assert body == b"\0" * 10
+        assert len(opened) == 1 and opened[0].closed
@@ -0,0 +1,133 @@
+"""
+Tests for the ByteTrack ObjectTracker wrapper.
+"""
+import json
+
+import numpy as np
+
+from app.detection import BackendType, Detection, DetectionBatch, DetectionResult, Keypoint, ObjectTracker
+
+
+def make_result(detections: list[Detection]) -> DetectionResult:
+    return DetectionResult(
+        detections=detections,
+        inference_time_ms=1.0,
+        frame_width=640,
+        frame_height=480,
+        backend_type=BackendType.YOLO,
+    )
+
+
+def make_detection(class_id: int, bbox: tuple[int, int, int, int], confidence: float = 0.9) -> Detection:
+    return Detection(
+        class_id=class_id,
+        class_name=f"class_{class_id}",
+        class_name_es=f"clase_{class_id}",
+        confidence=confidence,
+        bbox=bbox,
+        backend_source=BackendType.YOLO,
+    )
+
+
+class TestObjectTracker:
+    """ObjectTracker update tests."""
+
+    def test_empty_frame(self):
+        """Test frames without detections produce no objects."""
+        result = ObjectTracker().update(make_result([]))
+        assert result.objects == []
+
+    def test_ids_persist_across_frames(self):
+        """Test the same boxes keep their tracker IDs."""
+        tracker = ObjectTracker()
+        frame = [make_detection(0, (10, 10, 50, 90)), make_detection(16, (200, 100, 300, 180))]
+
+        first = tracker.update(make_result(frame))
+        second = tracker.update(make_result(frame))
+
+        assert len(first.objects) == 2
+        assert sorted(o.tracker_id for o in first.objects) == sorted(o.tracker_id for o in second.objects)
+        assert {o.bbox for o in second.objects} == {(10, 10, 50, 90), (200, 100, 300, 180)}
+
+    def test_detection_batch_matches_detection_list(self):
+        """Test column batches track exactly like the equivalent Detection list."""
+        batch = DetectionBatch(
+            xyxy=np.array([[10, 10, 50, 90], [200, 100, 300, 180]], dtype=np.int32),
+            confidence=np.array([0.9, 0.8], dtype=np.float32),
+            class_id=np.array([0, 16], dtype=np.int32),
+            names={0: "class_0", 16: "class_16"},
+            names_es={0: "clase_0", 16: "clase_16"},
+            backend_source=BackendType.YOLO,
+        )
+        listed = [make_detection(0, (10, 10, 50, 90), 0.9), make_detection(16, (200, 100, 300, 180), 0.8)]
+
+        from_batch = ObjectTracker().update(make_result(batch))
+        from_list = ObjectTracker().update(make_result(listed))
+
+        assert from_batch.to_dict()["objects"] == from_list.to_dict()["objects"]
+        assert batch._rows == [None, None]
+        assert batch == batch and batch not in [listed]  # Identity, not elementwise
+
+    def test_keypoints_follow_their_own_instance(self):
+        """Test same-class objects keep their own keypoints."""
+        left = make_detection(0, (10, 10, 50, 90))
+        left.keypoints = [Keypoint(x=20, y=20, confidence=0.9, name="nose")]
+        right = make_detection(0, (300, 10, 340, 90))
+        right.keypoints = [Keypoint(x=310, y=20, confidence=0.9, name="nose")]
+
+        result = ObjectTracker().update(make_result([left, right]))
+
+        by_x = {o.bbox[0]: o for o in result.objects}
+        assert by_x[10].keypoints[0].x == 20
+        assert by_x[300].keypoints[0].x == 310
+
+    def test_scratch_buffer_grows(self):
+        """Test frames larger than the scratch buffer are handled."""
+        tracker = ObjectTracker()
+        crowd = [make_detection(0, (i * 10, 0, i * 10 + 8, 8)) for i in range(100)]
+
+        result = tracker.update(make_result(crowd))
+
+        assert len(result.objects) == 100
+        assert len(tracker._xyxy_buf) == 128
+
+    def test_lost_ids_leave_history(self):
+        """Test IDs unseen for longer than the track buffer are pruned."""
+        tracker = ObjectTracker()
+        old = make_result([make_detection(0, (10, 10, 50, 90))])
+        old.timestamp -= 10
+        tracker.update(old)
+        assert tracker.get_active_ids() == []
+
+        # ByteTrack confirms tracks born after the first frame on their second hit
+        for _ in range(2):
+            tracker.update(make_result([make_detection(16, (200, 100, 300, 180))]))
+
+        assert len(tracker._id_history) == 1
+        assert tracker.get_active_ids() == list(tracker._id_history)
+
+    def test_json_bytes_are_columnar(self):
+        """Test the columnar serialization matches the per-object dicts."""
+        tracker = ObjectTracker()
+        frame = [make_detection(0, (10, 10, 50, 90)), make_detection(16, (200, 100, 301, 180))]
+        result = tracker.update(make_result(frame))
+
+        payload = json.loads(result.to_json_bytes())
+        rows = result.to_dict()["objects"]
+
+        assert payload["objects_bbox"] == [o["bbox"] for o in rows]
+        assert payload["objects_center"] == [o["center"] for o in rows]
+        assert payload["tracker_ids"] == [o["tracker_id"] for o in rows]
+        assert payload["counts"] == result.to_dict()["counts"]
+
+    def test_reset_reuses_byte_tracker(self):
+        """Test reset clears tracks without replacing the ByteTrack instance."""
+        tracker = ObjectTracker()
+        byte_tracker = tracker.byte_tracker
+        tracker.update(make_result([make_detection(0, (10, 10, 50, 90))]))
+
+        tracker.reset()
+
+        assert tracker.byte_tracker is byte_tracker
+        assert tracker.get_active_ids() == []
+        assert tracker.update(make_result([make_detection(0, (10, 10, 50, 90))])).objects
@@ -0,0 +1,29 @@
+"""
+Tests for video helpers.
+"""
+import cv2
+import numpy as np
+
+import app.video.jpeg as jpeg_module
+from app.video import encode_jpeg
+
+
+class TestEncodeJpeg:
+    """JPEG encoding tests."""
+
+    def test_roundtrip(self):
+        """Test encoded frames decode back to the same size and content."""
+        frame = np.full((48, 64, 3), (40, 120, 200), dtype=np.uint8)
+
+        decoded = cv2.imdecode(np.frombuffer(encode_jpeg(frame), np.uint8), cv2.IMREAD_COLOR)
+
+        assert decoded.shape == frame.shape
+        assert np.abs(decoded.astype(int) - frame).max() <= 4
+
+    def test_opencv_fallback(self, monkeypatch):
+        """Test frames are still encoded without libturbojpeg."""
+        monkeypatch.setattr(jpeg_module, "_turbo", None)
+
+        data = encode_jpeg(np.zeros((8, 8, 3), dtype=np.uint8), quality=50)
+
+        assert data[:2] == b"\xff\xd8"
@@ -0,0 +1,334 @@
+"""
+Tests for the threaded IP camera source.
+"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import app.video.sources as sources_module
+from app.config import DetectionConfig, VideoSourceType
+from app.video.sources import IPCameraSource, create_video_source
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in yielding numbered frames."""
+
+    def __init__(self, url, frames: int = 1000, shape=(4, 6, 3)):
+        self.url = url
+        self.frames = frames
+        self.shape = shape
+        self.count = 0
+        self.opened = True
+
+    def isOpened(self) -> bool:
+        return self.opened
+
+    def read(self, image=None):
+        if self.count >= self.frames:
+            return False, None
+        self.count += 1
+        frame = np.full(self.shape, self.count % 256, dtype=np.uint8)
+        return True, frame
+
+    def grab(self) -> bool:
+        return self.read()[0]
+
+    def set(self, prop, value) -> bool:
+        return True
+
+    def get(self, prop) -> float:
+        return 0.0
+
+    def release(self) -> None:
+        self.opened = False
+
+
+@pytest.fixture
+def fake_cv2(monkeypatch):
+    captures = []
+
+    def factory(url, api=None):
+        captures.append(FakeCapture(url))
+        captures[-1].api = api
+        return captures[-1]
+
+    monkeypatch.setattr(sources_module.cv2, "VideoCapture", factory)
+    return captures
+
+
+class TestIPCameraSource:
+    """IPCameraSource producer/consumer tests."""
+
+    def test_read_returns_latest_frame(self):
+        """Test read hands out the newest published frame and then repeats it."""
+        source = IPCameraSource("http://cam")
+        first = np.zeros((2, 2, 3), dtype=np.uint8)
+        second = np.ones((2, 2, 3), dtype=np.uint8)
+
+        assert source.read() == (False, None)
+
+        source._latest_frame = first
+        source._latest_frame = second
+        source._frame_event.set()
+
+        ok, frame = source.read()
+        assert ok and frame.base is second
+        ok, again = source.read()
+        assert ok and again is frame  # Sin frame nuevo: se repite el último
+
+    def test_frames_are_read_only_views(self):
+        """Test consumers get a read-only view while the captured array stays writable."""
+        source = IPCameraSource("http://cam")
+        buffer = np.zeros((2, 2, 3), dtype=np.uint8)
+        source._latest_frame = buffer
+        source._frame_event.set()
+
+        ok, frame = source.read()
+
+        assert ok and not frame.flags.writeable
+        with pytest.raises(ValueError):
+            frame[0, 0, 0] = 255
+        assert buffer.flags.writeable
+        assert frame.copy().flags.writeable
+
+    def test_read_wakes_when_frame_lands(self):
+        """Test a waiting read returns as soon as a frame is published, not on the poll timeout."""
+        source = IPCameraSource("http://cam")
+        frame = np.zeros((2, 2, 3), dtype=np.uint8)
+
+        def publish():
+            time.sleep(0.02)
+            source._latest_frame = frame
+            source._frame_event.set()
+
+        threading.Thread(target=publish).start()
+        ok, got = source.read()
+
+        # Sin último frame, un read que agotara el timeout devolvería (False, None)
+        assert ok and got.base is frame
+        assert not source._frame_event.is_set()
+
+    def test_capture_thread_publishes_frames(self, fake_cv2):
+        """Test the background loop feeds read until stopped."""
+        source = IPCameraSource("http://cam")
+        assert source.start()
+        try:
+            ok, frame = source.read()
+            assert ok and frame.shape == (4, 6, 3)
+        finally:
+            source.stop()
+
+        assert not source.is_opened()
+        assert fake_cv2[0].url == "http://cam"
+
+    def test_captured_frames_are_not_recycled(self, monkeypatch):
+        """Test a read-only frame is a stable snapshot: later captures never rewrite it."""
+        class PacedCapture(FakeCapture):
+            def read(self, image=None):
+                time.sleep(0.005)
+                return super().read(image)
+
+        cap = PacedCapture("http://cam")
+        monkeypatch.setattr(sources_module.cv2, "VideoCapture", lambda url, api=None: cap)
+        source = IPCameraSource("http://cam")
+        assert source.start()
+        try:
+            ok, frame = source.read()
+            pixels, reads = frame.copy(), cap.count
+            time.sleep(0.1)
+        finally:
+            source.stop()
+
+        assert ok and cap.count > reads
+        assert not frame.flags.writeable and frame.base is not source._latest_frame
+        assert (frame == pixels).all()
+
+    def test_publish_interval_follows_drop_rate(self):
+        """Test publications are spaced out while the consumer drops frames and restored after."""
+        source = IPCameraSource("http://cam")
+        now = source._window_start
+
+        for step in range(1, 4):
+            source._window_published, source._window_dropped = 10, 8
+            source._update_shedding(now + step)
+        assert source._publish_interval == pytest.approx(sources_module.MIN_PUBLISH_INTERVAL * 1.5 ** 2)
+
+        source._window_published, source._window_dropped = 10, 5
+        source._update_shedding(now + 3.5)  # Ventana sin cerrar: sin cambios
+        assert source._window_published == 10
+
+        for step in range(4, 10):
+            source._window_published, source._window_dropped = 10, 0
+            source._update_shedding(now + step)
+        assert source._publish_interval == 0.0
+
+    def test_flapping_warnings_are_rate_limited(self, caplog):
+        """Test repeated capture failures log one warning per reconnect delay."""
+        source = IPCameraSource("http://cam")
+
+        with caplog.at_level("DEBUG", logger=sources_module.__name__):
+            for _ in range(5):
+                source._warn_throttled("Fallo lectura de frame, reconectando...")
+
+        levels = [r.levelname for r in caplog.records]
+        assert levels == ["WARNING"] + ["DEBUG"] * 4
+
+
+class TestGStreamer:
+    """GStreamer capture pipeline tests."""
+
+    def test_pipeline_per_scheme(self):
+        """Test MJPEG-over-HTTP and RTSP URLs get native pipelines ending in a dropping appsink."""
+        http = sources_module.gstreamer_pipeline("http://10.0.0.2:8080/video")
+        rtsp = sources_module.gstreamer_pipeline("rtsp://cam/stream")
+
+        assert http.startswith('souphttpsrc location="http://10.0.0.2:8080/video" ')
+        assert "multipartdemux ! jpegdec" in http
+        assert rtsp.startswith('rtspsrc location="rtsp://cam/stream" ')
+        assert all(p.endswith("appsink drop=1 max-buffers=1 sync=false") for p in (http, rtsp))
+        assert sources_module.gstreamer_pipeline("/dev/video0") is None
+
+    @pytest.mark.parametrize("url", [
+        "http://cam/video ! filesink location=/tmp/x",
+        "http://cam/video!fakesink",
+        'rtsp://cam/"stream',
+        "rtsp://cam/a\tb",
+        "http:///video",
+    ])
+    def test_unsafe_urls_get_no_pipeline(self, url):
+        """Test URLs that could break out of the location property fall back to plain capture."""
+        assert sources_module.gstreamer_pipeline(url) is None
+
+    def test_falls_back_when_pipeline_fails(self, fake_cv2, monkeypatch):
+        """Test a pipeline that does not open is released and the plain URL is used."""
+        monkeypatch.setattr(sources_module, "gstreamer_available", lambda: True)
+        source = IPCameraSource("http://cam/video")
+        original = sources_module.cv2.VideoCapture
+
+        def factory(url, api=None):
+            cap = original(url, api)
+            cap.opened = api is None
+            return cap
+
+        monkeypatch.setattr(sources_module.cv2, "VideoCapture", factory)
+
+        assert source._connect()
+        assert [c.api for c in fake_cv2] == [sources_module.cv2.CAP_GSTREAMER, None]
+        assert source.cap is fake_cv2[1]
+
+
+class TestFramePool:
+    """Reusable capture buffer tests."""
+
+    class IntoCapture(FakeCapture):
+        """Capture that honors the destination array like OpenCV does."""
+
+        def read(self, image=None):
+            ok, frame = super().read()
+            if image is not None and image.shape == frame.shape:
+                image[...] = frame
+                return ok, image
+            return ok, frame
+
+    def test_released_buffer_is_reused(self):
+        """Test a frame nobody references any more is read into again."""
+        pool = sources_module.FramePool(size=2)
+        cap = self.IntoCapture("cam")
+        ok, frame = pool.read(cap)
+        first = id(frame)
+        del frame
+
+        ok, frame = pool.read(cap)
+
+        assert ok and id(frame) == first and frame[0, 0, 0] == 2
+
+    def test_referenced_buffers_are_never_overwritten(self):
+        """Test frames and views still held by consumers keep their pixels."""
+        pool = sources_module.FramePool(size=2)
+        cap = self.IntoCapture("cam")
+        held = pool.read(cap)[1]
+        view = pool.read(cap)[1][1:, :]  # Solo sobrevive una vista
+
+        later = [pool.read(cap)[1] for _ in range(3)]
+
+        assert held[0, 0, 0] == 1 and view[0, 0, 0] == 2
+        assert all(f is not held and f is not view.base for f in later)
+        assert len(pool._buffers) == 2
+
+    def test_resolution_change_replaces_the_slot(self):
+        """Test a frame of a different size takes over the pooled slot."""
+        pool = sources_module.FramePool(size=1)
+        cap = self.IntoCapture("cam")
+        pool.read(cap)  # El frame se descarta: el slot queda libre
+        cap.shape = (8, 8, 3)
+
+        ok, frame = pool.read(cap)
+
+        assert ok and frame.shape == (8, 8, 3) and pool._buffers[0] is frame
+
+
+class TestCreateVideoSource:
+    """Shared source factory tests."""
+
+    @pytest.fixture(autouse=True)
+    def empty_cache(self, monkeypatch):
+        monkeypatch.setattr(sources_module, "_source_cache", {})
+
+    def test_open_source_is_shared_until_last_stop(self, fake_cv2):
+        """Test each consumer gets its own handle on one capture that only the last stop closes."""
+        config = DetectionConfig(video_source=VideoSourceType.IP_CAMERA, ip_camera_url="http://cam")
+        first = create_video_source(config)
+        assert first.start()
+
+        second = create_video_source(config)
+        assert second is not first and second._broadcast is first._broadcast
+        assert second.start()
+        assert len(fake_cv2) == 1
+
+        first.stop()
+        first.stop()  # Idempotente: no suelta la referencia del otro consumidor
+        assert not first.is_opened() and second.is_opened()
+        second.stop()
+        assert not second._broadcast.source.is_opened()
+
+        third = create_video_source(config)
+        assert third._broadcast is not first._broadcast
+        third.stop()
+
+    def test_other_config_gets_its_own_source(self, fake_cv2):
+        """Test a different camera never receives a cached source."""
+        ip = create_video_source(DetectionConfig(video_source=VideoSourceType.IP_CAMERA, ip_camera_url="http://a"))
+        ip.start()
+        try:
+            other = create_video_source(DetectionConfig(video_source=VideoSourceType.IP_CAMERA, ip_camera_url="http://b"))
+            assert other._broadcast is not ip._broadcast
+            other.stop()
+        finally:
+            ip.stop()
+
+    def test_every_consumer_sees_each_frame(self, fake_cv2):
+        """Test two handles get the same frame from a single capture read instead of stealing it."""
+        config = DetectionConfig(video_source=VideoSourceType.WEBCAM, webcam_index=0)
+        first, second = create_video_source(config), create_video_source(config)
+        first.start()
+        try:
+            ok_a, frame_a = first.read()
+            ok_b, frame_b = second.read()
+            assert ok_a and ok_b and frame_b is not frame_a  # Llegó después: espera el siguiente
+            assert first.read()[1] is frame_b
+            assert fake_cv2[0].count == 2
+            assert first.reuses_frames and second.reuses_frames
+        finally:
+            first.stop()
+            second.stop()
+
+    def test_sole_consumer_owns_fresh_frames(self, fake_cv2):
+        """Test a lone webcam consumer may draw on its frames in place."""
+        webcam = create_video_source(DetectionConfig(video_source=VideoSourceType.WEBCAM))
+        webcam.start()
+        try:
+            assert webcam.read()[0] and not webcam.reuses_frames
+        finally:
+            webcam.stop()
@@ -0,0 +1,153 @@
+"""
+Tests for the WebSocket detection streamer.
+"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import app.api.websocket as ws_module
+from app.api.websocket import DetectionStreamer, DrawStyle, _put_latest
+from app.config import DetectionConfig
+from app.detection import BackendType, DetectionResult, ObjectTracker, YOLODetector
+from app.detection.tracker import TrackedObject, TrackingResult
+
+
+class FakeWebSocket:
+    """Collects every JSON message sent to the client."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+class EmptyDetector(YOLODetector):
+    """YOLO detector without a model that returns no detections."""
+
+    def __init__(self):
+        super().__init__(DetectionConfig())
+        self.calls = 0
+
+    def detect(self, frame):
+        self.calls += 1
+        h, w = frame.shape[:2]
+        return DetectionResult([], 1.0, w, h, BackendType.YOLO)
+
+
+class FiniteSource:
+    """Video source that stops the streamer once its frames run out."""
+
+    frame_size = (16, 12)
+    reuses_frames = False
+
+    def __init__(self, streamer: DetectionStreamer, count: int):
+        self.streamer = streamer
+        self.count = count
+
+    def read(self):
+        if self.count == 0:
+            self.streamer.running = False
+            return False, None
+        self.count -= 1
+        return True, np.zeros((12, 16, 3), dtype=np.uint8)
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def streamer(monkeypatch) -> DetectionStreamer:
+    config = DetectionConfig(max_fps=60)
+    monkeypatch.setattr(ws_module, "get_current_config", lambda: config)
+    monkeypatch.setattr(ws_module, "get_mobile_frame", lambda: None)
+
+    streamer = DetectionStreamer(FakeWebSocket())
+    streamer.detector = EmptyDetector()
+    streamer.tracker = ObjectTracker()
+    streamer.video_source = FiniteSource(streamer, 3)
+    return streamer
+
+
+class TestDetectionStreamer:
+    """Staged detection loop tests."""
+
+    def test_full_queue_drops_oldest(self):
+        """Test a full stage queue keeps only the newest items."""
+        queue = asyncio.Queue(maxsize=2)
+        for item in range(3):
+            _put_latest(queue, item)
+
+        assert [queue.get_nowait(), queue.get_nowait()] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_pipeline_sends_every_frame(self, streamer):
+        """Test each captured frame is detected, encoded and sent in order."""
+        await asyncio.wait_for(streamer.run_detection_loop(include_frames=True), 5.0)
+
+        detections = [m for m in streamer.websocket.sent if m["type"] == "detection"]
+        assert streamer.detector.calls == 3
+        assert len(detections) == 3
+        assert all(m["frame"] for m in detections)
+        assert not streamer.running
+
+    @pytest.mark.asyncio
+    async def test_started_message_serializes_config(self, streamer):
+        """Test the started message carries the config as plain JSON."""
+        await asyncio.wait_for(streamer.run_detection_loop(include_frames=False), 5.0)
+
+        started = streamer.websocket.sent[0]
+        assert started["type"] == "started"
+        assert started["config"]["video_source"] == "webcam"
+        assert started["frame_size"] == {"width": 16, "height": 12}
+
+    @pytest.mark.asyncio
+    async def test_stage_error_is_reported(self, streamer):
+        """Test a failing inference stage ends the loop with an error message."""
+
+        def broken(frame):
+            raise RuntimeError("CUDA out of memory")
+
+        streamer.detector.detect = broken
+        await asyncio.wait_for(streamer.run_detection_loop(include_frames=False), 5.0)
+
+        assert streamer.websocket.sent[-1]["type"] == "error"
+        assert not streamer.running
+
+    @pytest.mark.asyncio
+    async def test_client_rendering_skips_server_draw(self, streamer, monkeypatch):
+        """Test render_on_server=False sends the raw frame without drawing."""
+        config = DetectionConfig(max_fps=60, render_on_server=False)
+        monkeypatch.setattr(ws_module, "get_current_config", lambda: config)
+
+        def fail_draw(*args, **kwargs):
+            raise AssertionError("server-side drawing is disabled")
+
+        monkeypatch.setattr(streamer, "draw_frame_with_zones", fail_draw)
+        await asyncio.wait_for(streamer.run_detection_loop(include_frames=True), 5.0)
+
+        detections = [m for m in streamer.websocket.sent if m["type"] == "detection"]
+        assert len(detections) == 3
+        assert all(m["frame"] for m in detections)
+
+
+class TestDrawStyle:
+    """Draw settings snapshot tests."""
+
+    def test_drawing_uses_the_queued_snapshot(self, streamer):
+        """Test a config change after a frame is queued does not leak into its drawing."""
+        config = DetectionConfig(show_labels=False)
+        streamer.detector.update_config(config)
+        style = DrawStyle.capture(streamer.detector, config)
+        streamer.detector.update_config(config.model_copy(update={"box_color": "#0000ff", "show_labels": True}))
+
+        obj = TrackedObject(1, 0, "person", "persona", 0.9, (2, 2, 12, 10), (7, 6), (7, 10))
+        result = TrackingResult([obj], 1.0, 16, 12, 0.0)
+        frame = streamer.draw_frame_with_zones(np.zeros((12, 16, 3), np.uint8), result, [], style=style)
+
+        assert tuple(frame[2, 2]) == style.color_bgr != streamer.detector.color_bgr
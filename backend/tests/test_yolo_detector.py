@@ -0,0 +1,290 @@
+"""
+Tests for the YOLO detector wrapper.
+"""
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+import app.detection.tensorrt_engine as trt_module
+import app.detection.yolo_detector as yolo_module
+from app.config import DetectionConfig
+from app.detection import DetectionBatch, YOLODetector
+
+
+NAMES = {0: "person", 16: "dog"}
+
+
+class FakeModel:
+    """Stands in for an Ultralytics model: one Results per input frame."""
+
+    def __init__(self, rows: list[list[float]], keypoints: np.ndarray | None = None):
+        self.rows = rows
+        self.keypoints = keypoints
+        self.batches = []
+
+    def __call__(self, frames, **kwargs):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        self.batches.append(len(frames))
+        keypoints = torch.from_numpy(self.keypoints) if self.keypoints is not None else None
+        return [
+            Results(frame, path="", names=NAMES, boxes=torch.tensor(self.rows).reshape(-1, 6), keypoints=keypoints)
+            for frame in frames
+        ]
+
+
+def make_detector(rows: list[list[float]], **config) -> YOLODetector:
+    detector = YOLODetector(DetectionConfig(**config))
+    detector.model = FakeModel(rows)
+    return detector
+
+
+class TestTensorRTWeights:
+    """TensorRT engine resolution tests."""
+
+    def test_pytorch_weights_without_flag(self):
+        """Test .pt weights are used unless TensorRT is requested."""
+        detector = YOLODetector(DetectionConfig())
+        assert detector._resolve_weights("yolo11n.pt") == "yolo11n.pt"
+
+    def test_cached_engine_is_reused(self, tmp_path, monkeypatch):
+        """Test an engine exported earlier is loaded instead of re-exporting."""
+        monkeypatch.setattr(yolo_module, "ENGINE_DIR", tmp_path)
+        monkeypatch.setattr(trt_module, "engine_tag", lambda: "trt10.3_rtx-4090-sm89")
+        detector = YOLODetector(DetectionConfig(use_tensorrt=True, imgsz=320))
+        engine = detector._engine_path("yolo11n.pt")
+        engine.touch()
+
+        assert engine.name == f"yolo11n_320_b{yolo_module.YOLO_MAX_BATCH}_fp16.trt10.3_rtx-4090-sm89.engine"
+        assert detector._resolve_weights("yolo11n.pt") == str(engine)
+
+    def test_falls_back_without_tensorrt(self, tmp_path, monkeypatch):
+        """Test machines without TensorRT/CUDA keep the PyTorch weights."""
+        monkeypatch.setattr(yolo_module, "ENGINE_DIR", tmp_path)
+        monkeypatch.setattr(yolo_module, "_tensorrt_export_available", lambda: False)
+        detector = YOLODetector(DetectionConfig(use_tensorrt=True))
+
+        assert detector._resolve_weights("yolo11n-pose.pt") == "yolo11n-pose.pt"
+
+
+class TestCompile:
+    """torch.compile integration tests."""
+
+    def test_compiles_pytorch_graph_on_cuda(self, monkeypatch):
+        """Test the network is wrapped with reduce-overhead compilation when enabled."""
+        calls = []
+        monkeypatch.setattr(torch, "compile", lambda module, **kwargs: calls.append(kwargs) or "compiled")
+        detector = YOLODetector(DetectionConfig(torch_compile=True))
+        detector.device = "cuda"
+        model = FakeModel([])
+        model.model = torch.nn.Linear(2, 2)
+
+        detector._compile(model)
+
+        assert model.model == "compiled"
+        assert calls == [{"mode": "reduce-overhead", "fullgraph": False}]
+
+    def test_skipped_on_cpu_and_engines(self, monkeypatch):
+        """Test CPU runs and TensorRT engines stay uncompiled."""
+        monkeypatch.setattr(torch, "compile", lambda module, **kwargs: "compiled")
+        detector = YOLODetector(DetectionConfig(torch_compile=True))
+        model = FakeModel([])
+        model.model = torch.nn.Linear(2, 2)
+
+        detector.device = "cpu"
+        detector._compile(model)
+        assert isinstance(model.model, torch.nn.Linear)
+
+        detector.device = "cuda"
+        model.model = "yolo11n.engine"
+        detector._compile(model)
+        assert model.model == "yolo11n.engine"
+
+
+class TestWarmup:
+    """Model warmup tests."""
+
+    def test_warmup_runs_configured_iterations(self):
+        """Test warmup feeds warmup_iters dummy frames at the model input size."""
+        calls = []
+        detector = YOLODetector(DetectionConfig(warmup_iters=2, imgsz=320))
+
+        detector.warmup(lambda frame, **kwargs: calls.append((frame.shape, kwargs["imgsz"])))
+
+        assert calls == [((320, 320, 3), 320)] * 2
+
+    def test_warmup_failure_is_not_fatal(self):
+        """Test a failing warmup leaves the detector usable."""
+
+        def broken(frame, **kwargs):
+            raise RuntimeError("no GPU")
+
+        YOLODetector(DetectionConfig()).warmup(broken)
+
+    def test_startup_detector_goes_to_first_session(self, monkeypatch):
+        """Test the detector warmed at startup is handed out once, then sessions load their own."""
+        loads = []
+        monkeypatch.setattr(YOLODetector, "load_model", lambda self, *args: loads.append(self))
+        config = DetectionConfig()
+
+        yolo_module.warmup_models(config)
+        warmed = loads[0]
+
+        assert yolo_module.take_warm_detector(config) is warmed
+        fresh = yolo_module.take_warm_detector(config)
+        assert fresh is not warmed and loads == [warmed, fresh]
+
+
+class TestDetectBatch:
+    """Batched inference tests."""
+
+    def test_batch_runs_one_forward_pass_per_chunk(self):
+        """Test frames share forward passes, split at YOLO_MAX_BATCH."""
+        detector = make_detector([[10, 20, 50, 80, 0.9, 16]])
+        frames = [np.zeros((120, 160, 3), dtype=np.uint8)] * (yolo_module.YOLO_MAX_BATCH + 2)
+
+        results = detector.detect_batch(frames)
+
+        assert detector.model.batches == [yolo_module.YOLO_MAX_BATCH, 2]
+        assert len(results) == len(frames)
+        det = results[-1].detections[0]
+        assert (det.class_id, det.class_name, det.bbox) == (16, "dog", (10, 20, 50, 80))
+        assert det.confidence == pytest.approx(0.9)
+        assert results[0].frame_width == 160
+
+    def test_detections_are_columns_until_read(self):
+        """Test detect returns a DetectionBatch that serializes without building rows."""
+        detector = make_detector([[10, 20, 50, 80, 0.9, 16], [0, 0, 8, 8, 0.5, 16], [1, 1, 9, 9, 0.7, 0]])
+
+        result = detector.detect(np.zeros((100, 100, 3), dtype=np.uint8))
+        payload = result.to_dict()
+
+        assert isinstance(result.detections, DetectionBatch)
+        assert result.detections._rows == [None] * 3
+        assert payload["counts"] == {"perro": 2, "persona": 1}
+        assert payload["detections"][0] == {
+            "class_id": 16, "class_name": "dog", "class_name_es": "perro",
+            "confidence": 0.9, "bbox": [10, 20, 50, 80], "backend_source": "yolo",
+        }
+        assert payload["detections"] == [d.to_dict() for d in result.detections]
+
+    def test_counting_region_filters_by_center(self):
+        """Test only boxes centered inside the counting region are kept."""
+        detector = make_detector(
+            [[0, 0, 20, 20, 0.8, 0], [100, 100, 140, 140, 0.7, 0]],
+            counting_region={"x": 90, "y": 90, "width": 60, "height": 60},
+        )
+
+        result = detector.detect(np.zeros((200, 200, 3), dtype=np.uint8))
+
+        assert [d.bbox for d in result.detections] == [(100, 100, 140, 140)]
+
+    def test_counting_region_follows_config_updates(self):
+        """Test region bounds are recomputed when the config changes."""
+        detector = make_detector([[0, 0, 20, 20, 0.8, 0], [100, 100, 140, 140, 0.7, 0]])
+        detector.update_config(DetectionConfig(counting_region={"x": 0, "y": 0, "width": 30, "height": 30}))
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+
+        assert [d.bbox for d in detector.detect(frame).detections] == [(0, 0, 20, 20)]
+
+        detector.update_config(DetectionConfig())
+        assert len(detector.detect(frame).detections) == 2
+
+
+class TestGPUPreprocess:
+    """Pinned upload and on-device letterbox tests (run on CPU)."""
+
+    def test_upload_letterboxes_rgb_batch(self):
+        """Test frames become a padded RGB NCHW batch in [0, 1]."""
+        uploader = yolo_module._FrameUploader("cpu", half=False, imgsz=64)
+        frame = np.zeros((32, 64, 3), dtype=np.uint8)
+        frame[..., 0] = 255  # Blue channel in BGR
+
+        batch, (r, pad_x, pad_y) = uploader.upload([frame, frame])
+
+        assert batch.shape == (2, 3, 64, 64)
+        assert (r, pad_x, pad_y) == (1.0, 0, 16)
+        assert batch[0, 2, 32, 32] == 1.0 and batch[0, 0, 32, 32] == 0.0
+        assert batch[0, 0, 0, 0] == pytest.approx(114 / 255)
+
+    def test_input_size_is_rounded_to_stride(self):
+        """Test an imgsz that is not a multiple of 32 letterboxes to the next multiple."""
+        uploader = yolo_module._FrameUploader("cpu", half=False, imgsz=300)
+
+        batch, _ = uploader.upload([np.zeros((30, 40, 3), dtype=np.uint8)])
+
+        assert uploader.imgsz == 320 and batch.shape == (1, 3, 320, 320)
+        assert yolo_module._FrameUploader("cpu", half=False, imgsz=320).imgsz == 320
+
+    def test_host_buffer_is_reused(self):
+        """Test the upload buffer is only reallocated when the batch outgrows it."""
+        uploader = yolo_module._FrameUploader("cpu", half=False, imgsz=32)
+        frames = [np.zeros((16, 16, 3), dtype=np.uint8)] * 3
+
+        uploader.upload(frames)
+        host = uploader._host
+        uploader.upload(frames[:2])
+
+        assert uploader._host is host
+
+    def test_boxes_are_mapped_back_to_frame(self):
+        """Test letterboxed boxes are unscaled, unpadded and clipped to the frame."""
+        boxes = Results(
+            np.zeros((10, 10, 3), dtype=np.uint8), path="", names=NAMES,
+            boxes=torch.tensor([[10, 26, 50, 90, 0.9, 0]], dtype=torch.float32),
+        ).boxes
+
+        xyxy, _, _ = YOLODetector._box_arrays(boxes, (0.5, 0, 16, 100, 100))
+
+        assert xyxy.tolist() == [[20, 20, 100, 100]]
+
+
+class TestDraw:
+    """Annotation drawing tests."""
+
+    def test_inplace_draws_on_input_frame(self):
+        """Test inplace drawing reuses the caller's buffer and leaves copies alone otherwise."""
+        detector = make_detector([[10, 20, 50, 80, 0.9, 16]])
+        frame = np.zeros((100, 100, 3), dtype=np.uint8)
+        result = detector.detect(frame)
+
+        copied = detector.draw_detections(frame, result)
+        assert copied is not frame and not frame.any() and copied.any()
+
+        drawn = detector.draw_detections(frame, result, inplace=True)
+        assert drawn is frame and frame.any()
+
+    def test_draw_style_follows_config(self):
+        """Test color and text metrics are parsed once and reset on config change."""
+        detector = YOLODetector(DetectionConfig(box_color="#102030"))
+        assert detector.color_bgr == (0x30, 0x20, 0x10)
+
+        small = detector.text_size("perro 90%")
+        assert detector._text_size_cache == {"perro 90%": small}
+
+        detector.update_config(DetectionConfig(box_color="#FF0000", font_size=32))
+        assert detector.color_bgr == (0, 0, 255)
+        assert detector._text_size_cache == {}
+        assert detector.text_size("perro 90%")[0] > small[0]
+
+
+class TestPose:
+    """Pose postprocessing tests."""
+
+    def test_low_confidence_keypoints_are_dropped(self):
+        """Test only confident keypoints survive, with their COCO names."""
+        kps = np.zeros((1, 17, 3), dtype=np.float32)
+        kps[0, :, 0] = np.arange(17) + 0.7
+        kps[0, :, 1] = 40.2
+        kps[0, [0, 5, 16], 2] = [0.9, 0.5, 0.31]
+        detector = YOLODetector(DetectionConfig())
+        detector.pose_model = FakeModel([[10, 20, 50, 80, 0.9, 0]], kps)
+
+        det = detector.detect_pose(np.zeros((100, 100, 3), dtype=np.uint8)).detections[0]
+
+        assert [(kp.name, kp.x, kp.y) for kp in det.keypoints] == [
+            ("nariz", 0, 40), ("hombro_izq", 5, 40), ("tobillo_der", 16, 40),
+        ]
+        assert det.keypoints[0].confidence == pytest.approx(0.9)
+        assert det.class_name_es == "persona"
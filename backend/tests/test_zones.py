@@ -0,0 +1,195 @@
+"""
+Tests for zone geometry and enter/exit tracking.
+"""
+import numpy as np
+import pytest
+import shapely
+
+from app.zones.geometry import Zone, ZoneManager, ZoneType
+
+
+SQUARE = [(0.2, 0.2), (0.6, 0.2), (0.6, 0.6), (0.2, 0.6)]
+TRIANGLE = [(0.5, 0.1), (0.9, 0.9), (0.1, 0.9)]
+
+
+def make_object(tracker_id: int, x: float, y: float) -> dict:
+    return {"tracker_id": tracker_id, "bottom_center": [x, y], "class_name_es": "persona"}
+
+
+@pytest.fixture
+def manager() -> ZoneManager:
+    manager = ZoneManager()
+    manager.add_zone(Zone("square", "Cuadrado", ZoneType.WARNING, SQUARE))
+    manager.add_zone(Zone("triangle", "Triángulo", ZoneType.DANGER, TRIANGLE))
+    return manager
+
+
+class TestZoneManager:
+    """ZoneManager containment and event tests."""
+
+    def test_check_point_uses_normalized_coordinates(self, manager):
+        """Test pixel coordinates are scaled by the frame size before testing."""
+        assert [z.id for z in manager.check_point(100, 50, 400, 200)] == ["square"]
+        assert [z.id for z in manager.check_point(200, 100, 400, 200)] == ["square", "triangle"]
+        assert manager.check_point(10, 10, 400, 200) == []
+        assert [z.id for z in manager.check_normalized_point(0.5, 0.5)] == ["square", "triangle"]
+
+    def test_batch_matches_single_point_checks(self, manager):
+        """Test the vectorized check assigns every object the same zones as check_point."""
+        points = [(x, y) for x in range(0, 500, 23) for y in range(0, 250, 17)]
+        objects = [make_object(i, x, y) for i, (x, y) in enumerate(points)]
+
+        events = manager.check_objects(objects, 500, 250, 1.0)
+
+        got = {(e.tracker_id, e.zone_id) for e in events}
+        expected = {
+            (i, z.id) for i, (x, y) in enumerate(points) for z in manager.check_point(x, y, 500, 250)
+        }
+        assert got == expected
+        assert {e.event_type for e in events} == {"enter"}
+
+    def test_enter_inside_exit_sequence(self, manager):
+        """Test an object walking through a zone emits enter, inside and exit."""
+        inside = [make_object(1, 25, 25)]
+        outside = [make_object(1, 95, 5)]
+
+        assert manager.check_objects(outside, 100, 100, 0.0) == []
+        assert [e.event_type for e in manager.check_objects(inside, 100, 100, 1.0)] == ["enter"]
+        assert [e.event_type for e in manager.check_objects(inside, 100, 100, 2.0)] == ["inside"]
+
+        exited = manager.check_objects(outside, 100, 100, 3.0)
+        assert [(e.event_type, e.zone_id, e.timestamp) for e in exited] == [("exit", "square", 3.0)]
+
+    def test_disabled_zones_are_ignored(self, manager):
+        """Test disabled zones neither contain points nor emit events."""
+        manager.zones["square"].enabled = False
+
+        events = manager.check_objects([make_object(1, 30, 30)], 100, 100, 0.0)
+
+        assert events == []
+        assert manager.check_point(30, 30, 100, 100) == []
+
+    def test_removed_zone_emits_no_exit(self, manager):
+        """Test objects inside a deleted zone are forgotten silently."""
+        manager.check_objects([make_object(1, 30, 30)], 100, 100, 0.0)
+        manager.remove_zone("square")
+
+        assert manager.check_objects([make_object(1, 30, 30)], 100, 100, 1.0) == []
+
+    def test_vanished_tracks_are_dropped(self, manager):
+        """Test tracks that vanish are forgotten without exit events."""
+        manager.check_objects([make_object(1, 30, 30)], 100, 100, 0.0)
+
+        assert manager.check_objects([], 100, 100, 1.0) == []
+        assert manager._object_zones == {}
+
+    def test_events_are_immutable(self, manager):
+        """Test zone events are frozen slotted records."""
+        event = manager.check_objects([make_object(1, 30, 30)], 100, 100, 0.0)[0]
+
+        with pytest.raises(AttributeError):
+            event.event_type = "exit"
+        assert not hasattr(event, "__dict__")
+        assert event.to_dict()["zone_type"] == "warning"
+
+    def test_bbox_survivors_get_exact_test(self):
+        """Test points inside a concave zone's bounding box but outside the zone are rejected."""
+        manager = ZoneManager()
+        manager.add_zone(Zone("l", "L", ZoneType.WARNING, [(0, 0), (1, 0), (1, 0.5), (0.5, 0.5), (0.5, 1), (0, 1)]))
+
+        assert manager.check_point(25, 75, 100, 100)
+        assert manager.check_point(75, 75, 100, 100) == []
+
+    def test_unchanged_polygon_is_not_reprepared(self, manager):
+        """Test re-adding a zone with the same vertices keeps its prepared geometry."""
+        arrays = manager._poly_arrays["square"]
+
+        manager.add_zone(Zone("square", "Cuadrado", ZoneType.WARNING, [list(p) for p in SQUARE], enabled=False))
+        assert manager._poly_arrays["square"] is arrays
+        assert manager.check_point(30, 30, 100, 100) == []
+
+        manager.add_zone(Zone("square", "Cuadrado", ZoneType.WARNING, TRIANGLE))
+        assert manager._poly_arrays["square"] is not arrays
+        assert [z.id for z in manager.check_point(50, 50, 100, 100)] == ["square", "triangle"]
+
+    def test_bbox_matrix_follows_zone_changes(self, manager):
+        """Test the packed bounding boxes track adds and removals and never shrink."""
+        assert manager._zone_order == ["square", "triangle"]
+        assert manager._bbox_array.dtype == np.float32
+        assert (manager._bbox_array[0, :2] <= 0.2).all() and (manager._bbox_array[0, 2:] >= 0.6).all()
+
+        manager.remove_zone("square")
+        assert manager._zone_order == ["triangle"]
+        assert manager._bbox_array.shape == (1, 4)
+
+        manager.clear_zones()
+        assert manager._bbox_array.shape == (0, 4)
+        assert manager.check_objects([make_object(1, 30, 30)], 100, 100, 0.0) == []
+
+    def test_numpy_columns_match_dict_objects(self, manager):
+        """Test the column API yields the same events as the dict adapter, without touching its inputs."""
+        reference = ZoneManager()
+        for zone in manager.get_zones():
+            reference.add_zone(zone)
+        ids = np.array([3, 4, 5], dtype=np.int64)
+        xs = np.array([30, 50, 95], dtype=np.int32)
+        ys = np.array([30, 70, 5], dtype=np.int32)
+
+        events = manager.check_objects_numpy(ids, xs, ys, ["persona"] * 3, 100, 100, 1.0)
+        expected = reference.check_objects(
+            [make_object(int(i), int(x), int(y)) for i, x, y in zip(ids, xs, ys)], 100, 100, 1.0,
+        )
+
+        assert events == expected
+        assert all(type(e.tracker_id) is int for e in events)
+        assert xs.tolist() == [30, 50, 95]
+
+    def test_memberships_are_interned(self, manager):
+        """Test trackers in the same zones share one frozenset and stay 'inside' on repeat frames."""
+        objects = [make_object(1, 50, 50), make_object(2, 52, 52), make_object(3, 25, 25)]
+
+        manager.check_objects(objects, 100, 100, 0.0)
+        zones = manager._object_zones
+        assert zones[1] is zones[2] and zones[1] == {"square", "triangle"}
+        assert zones[3] == {"square"}
+
+        events = manager.check_objects(objects, 100, 100, 1.0)
+        assert sorted((e.tracker_id, e.zone_id, e.event_type) for e in events) == [
+            (1, "square", "inside"), (1, "triangle", "inside"),
+            (2, "square", "inside"), (2, "triangle", "inside"),
+            (3, "square", "inside"),
+        ]
+
+        manager.remove_zone("triangle")
+        events = manager.check_objects(objects, 100, 100, 2.0)
+        assert {e.event_type for e in events} == {"inside"}
+        assert manager._object_zones[1] == {"square"}
+
+
+class TestRayCast:
+    """numba point-in-polygon kernel tests."""
+
+    def test_matches_shapely(self):
+        """Test the jitted crossing-number test agrees with shapely on random points."""
+        pytest.importorskip("numba")
+        from app.zones.geometry import _points_in_polygon
+
+        rng = np.random.default_rng(0)
+        xs, ys = rng.random(500), rng.random(500)
+        px, py = np.array(TRIANGLE, dtype=np.float64).T.copy()
+
+        expected = shapely.contains_xy(shapely.Polygon(TRIANGLE), xs, ys)
+        assert (_points_in_polygon(xs, ys, px, py) == expected).all()
+
+    def test_boundary_points_are_outside(self):
+        """Test points on every side and vertex are excluded, like contains_xy."""
+        pytest.importorskip("numba")
+        from app.zones.geometry import _points_in_polygon
+
+        xs = np.array([0.2, 0.4, 0.6, 0.4, 0.2, 0.6, 0.4])
+        ys = np.array([0.4, 0.2, 0.4, 0.6, 0.2, 0.6, 0.4])
+        px, py = np.array(SQUARE, dtype=np.float64).T.copy()
+
+        expected = shapely.contains_xy(shapely.Polygon(SQUARE), xs, ys)
+        assert expected.tolist() == [False] * 6 + [True]
+        assert (_points_in_polygon(xs, ys, px, py) == expected).all()
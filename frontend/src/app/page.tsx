@@ -285,6 +285,9 @@ export default function Home() {
             statusMessage={streamStatus}
             hasNoCameras={hasNoCameras}
             onOpenSettings={() => setActiveDrawer('menu')}
+            objects={config && !config.render_on_server ? trackingData?.objects : null}
+            overlay={overlays}
+            boxColor={config?.box_color}
           />
 
           {/* Zone Editor Overlay */}
@@ -1,5 +1,14 @@
 'use client';
 
+import type { TrackedObject } from '@/lib/api';
+
+interface DetectionOverlayOptions {
+    boxes: boolean;
+    labels: boolean;
+    confidence: boolean;
+    trackerIds: boolean;
+}
+
 interface VideoCanvasProps {
     frame: string | null;
     frameSize: { width: number; height: number } | null;
@@ -7,6 +16,75 @@ interface VideoCanvasProps {
     statusMessage?: string | null;
     hasNoCameras?: boolean;
     onOpenSettings?: () => void;
+    /** Objects to draw over the raw frame when the server does not render them */
+    objects?: TrackedObject[] | null;
+    overlay?: DetectionOverlayOptions;
+    boxColor?: string;
+}
+
+/**
+ * Bounding boxes and labels drawn in frame coordinates; the SVG viewBox
+ * scales them exactly like the object-contain image underneath
+ */
+function DetectionOverlay({
+    objects,
+    frameSize,
+    overlay,
+    boxColor,
+}: {
+    objects: TrackedObject[];
+    frameSize: { width: number; height: number };
+    overlay: DetectionOverlayOptions;
+    boxColor: string;
+}) {
+    const fontSize = Math.max(12, Math.round(frameSize.height / 40));
+
+    return (
+        <svg
+            className="absolute inset-0 w-full h-full pointer-events-none"
+            viewBox={`0 0 ${frameSize.width} ${frameSize.height}`}
+            preserveAspectRatio="xMidYMid meet"
+        >
+            {objects.map((obj) => {
+                const [x1, y1, x2, y2] = obj.bbox;
+                const parts = [];
+                if (overlay.trackerIds) parts.push(`#${obj.tracker_id}`);
+                if (overlay.labels) parts.push(obj.class_name_es);
+                if (overlay.confidence) parts.push(`${Math.round(obj.confidence * 100)}%`);
+                const label = parts.join(' ');
+
+                return (
+                    <g key={obj.tracker_id}>
+                        {overlay.boxes && (
+                            <rect
+                                x={x1}
+                                y={y1}
+                                width={x2 - x1}
+                                height={y2 - y1}
+                                fill="none"
+                                stroke={boxColor}
+                                strokeWidth={Math.max(2, fontSize / 6)}
+                            />
+                        )}
+                        {label && (
+                            <text
+                                x={x1 + 2}
+                                y={y1 - 5}
+                                fill="#ffffff"
+                                stroke={boxColor}
+                                strokeWidth={fontSize / 4}
+                                paintOrder="stroke"
+                                fontSize={fontSize}
+                                fontFamily="sans-serif"
+                            >
+                                {label}
+                            </text>
+                        )}
+                    </g>
+                );
+            })}
+        </svg>
+    );
 }
 
 /**
@@ -18,7 +96,10 @@ export function VideoCanvas({
     isConnected,
     statusMessage,
     hasNoCameras = false,
-    onOpenSettings
+    onOpenSettings,
+    objects,
+    overlay = { boxes: true, labels: true, confidence: true, trackerIds: false },
+    boxColor = '#00FF00',
 }: VideoCanvasProps) {
     // Show setup instructions when no cameras are available
     if (hasNoCameras) {
@@ -66,13 +147,23 @@ export function VideoCanvas({
     }
 
     return (
-        <div className="w-full h-full bg-black flex items-center justify-center">
+        <div className="relative w-full h-full bg-black flex items-center justify-center">
             {frame && isConnected ? (
-                <img
-                    src={frame}
-                    alt="Detection stream"
-                    className="max-w-full max-h-full object-contain"
-                />
+                <>
+                    <img
+                        src={frame}
+                        alt="Detection stream"
+                        className={objects ? 'w-full h-full object-contain' : 'max-w-full max-h-full object-contain'}
+                    />
+                    {objects && frameSize && (
+                        <DetectionOverlay
+                            objects={objects}
+                            frameSize={frameSize}
+                            overlay={overlay}
+                            boxColor={boxColor}
+                        />
+                    )}
+                </>
             ) : (
                 <div className="flex flex-col items-center justify-center gap-4 text-muted-foreground">
                     <svg
@@ -55,6 +55,7 @@ export interface DetectionConfig {
     show_labels: boolean;
     box_color: string;
     font_size: number;
+    render_on_server: boolean;
     max_fps: number;
     frame_skip: number;
 }